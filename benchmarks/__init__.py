@@ -0,0 +1 @@
+"""Benchmarks for modbus_base."""
@@ -0,0 +1,338 @@
+"""Benchmark the polling of ModbusHub and BaseModbusUpdateCoordinator.
+
+Every scenario polls a SimulatedModbusDevice with a number of sensor entities
+laid out in a given way, and reports:
+
+- plan_ms: time to compile the read plan of all entities
+- polls_s: polls per second
+- p50_ms / p95_ms: end-to-end latency of a poll
+- cpu_ms: CPU time of the event loop thread per poll
+- requests: Modbus requests per poll
+- decode_ms / dispatch_ms: time to decode the values and update the entities
+
+Run it from a Home Assistant development environment in which modbus_base is
+available as homeassistant.components.modbus_base:
+
+    python -m benchmarks.benchmark --entities 10 100 1000 --json bench_output.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, dataclass
+import json
+import logging
+import random
+import statistics
+import tempfile
+import threading
+import time
+from typing import Any
+
+from pymodbus.client import AsyncModbusTcpClient
+
+from homeassistant.components.modbus_base import (
+    BaseModbusUpdateCoordinator,
+    ModbusHub,
+    PipelinedModbusTcpClient,
+    SerialLine,
+)
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.entity import SimpleModbusRegisterType
+from homeassistant.components.modbus_base.sensor import (
+    SimpleModbusSensorEntity,
+    SimpleModbusSensorEntityDescription,
+)
+from homeassistant.core import HomeAssistant
+
+from .simulator import SimulatedModbusClient, SimulatedModbusDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+type Layout = Callable[[int], Iterator[SimpleModbusSensorEntityDescription]]
+
+
+def _contiguous(count: int) -> Iterator[SimpleModbusSensorEntityDescription]:
+    """Yield UINT16 sensors at consecutive addresses."""
+    for idx in range(count):
+        yield SimpleModbusSensorEntityDescription(
+            key=f"sensor_{idx}",
+            modbus_address=idx,
+            modbus_register_type=SimpleModbusRegisterType.UINT16,
+        )
+
+
+def _sparse(count: int) -> Iterator[SimpleModbusSensorEntityDescription]:
+    """Yield 32-bit sensors with gaps of a few unused registers between them."""
+    for idx in range(count):
+        yield SimpleModbusSensorEntityDescription(
+            key=f"sensor_{idx}",
+            modbus_address=idx * 7,
+            modbus_register_type=SimpleModbusRegisterType.UINT32,
+            scale=10,
+        )
+
+
+def _mixed(count: int) -> Iterator[SimpleModbusSensorEntityDescription]:
+    """Yield sensors of several types, tables and units."""
+    tables = (
+        ModbusTable.HOLDING_REGISTER,
+        ModbusTable.INPUT_REGISTER,
+        ModbusTable.COIL,
+    )
+    register_types = (
+        SimpleModbusRegisterType.UINT16,
+        SimpleModbusRegisterType.INT32,
+        SimpleModbusRegisterType.FLOAT32,
+    )
+    for idx in range(count):
+        table = tables[idx % len(tables)]
+        yield SimpleModbusSensorEntityDescription(
+            key=f"sensor_{idx}",
+            modbus_address=idx * 3,
+            modbus_register_type=None
+            if table.is_bit_table
+            else register_types[idx % len(register_types)],
+            modbus_table=table,
+            modbus_unit=1 + idx % 4,
+        )
+
+
+LAYOUTS: dict[str, Layout] = {
+    "contiguous": _contiguous,
+    "sparse": _sparse,
+    "mixed": _mixed,
+}
+
+
+class _BenchmarkSensor(SimpleModbusSensorEntity):
+    """Sensor which counts its state writes instead of writing them."""
+
+    state_writes = 0
+
+    def async_write_ha_state(self) -> None:
+        """Count the state write."""
+        self.state_writes += 1
+
+
+@dataclass
+class Result:
+    """Result of a benchmark scenario."""
+
+    transport: str
+    layout: str
+    entities: int
+    plan_ms: float
+    polls_s: float
+    p50_ms: float
+    p95_ms: float
+    cpu_ms: float
+    requests: float
+    decode_ms: float
+    dispatch_ms: float
+
+
+class _ServerThread(threading.Thread):
+    """Thread running the TCP server of a simulated device in its own loop."""
+
+    def __init__(self, device: SimulatedModbusDevice) -> None:
+        super().__init__(daemon=True)
+        self.device = device
+        self.loop = asyncio.new_event_loop()
+        self.port: int | None = None
+        self._listening = threading.Event()
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.port = self.loop.run_until_complete(self.device.start_server())
+        self._listening.set()
+        self.loop.run_forever()
+
+    def start_and_wait(self) -> int:
+        self.start()
+        self._listening.wait()
+        assert self.port is not None
+        return self.port
+
+    async def async_stop(self) -> None:
+        await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(self.device.stop_server(), self.loop)
+        )
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.join()
+
+
+async def run_scenario(
+    hass: HomeAssistant,
+    transport: str,
+    layout: str,
+    entities: int,
+    *,
+    polls: int,
+    latency: float,
+    change_fraction: float,
+    pipeline_window: int,
+    baudrate: int,
+) -> Result:
+    """Run a single benchmark scenario."""
+    device = SimulatedModbusDevice(latency=latency, seed=entities)
+    server: _ServerThread | None = None
+    line = SerialLine(baudrate=baudrate, turnaround=latency)
+
+    if transport == "inprocess":
+        client: Any = SimulatedModbusClient(device)
+    elif transport == "serial":
+        client = SimulatedModbusClient(device, character_time=line.character_time)
+    else:
+        server = _ServerThread(device)
+        port = server.start_and_wait()
+        if transport == "pipelined":
+            client = PipelinedModbusTcpClient("127.0.0.1", port)
+        else:
+            client = AsyncModbusTcpClient("127.0.0.1", port=port)
+    await client.connect()
+
+    if transport == "serial":
+        hub = ModbusHub.for_serial_line(hass, client, line)
+    else:
+        hub = ModbusHub(
+            hass,
+            client,
+            pipeline_window=pipeline_window if transport == "pipelined" else 1,
+        )
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, hub, f"{layout}-{entities}", force_update_interval=None
+    )
+    sensors = [
+        _BenchmarkSensor(coordinator, description)
+        for description in LAYOUTS[layout](entities)
+    ]
+    for sensor in sensors:
+        coordinator.async_add_listener(
+            sensor._handle_coordinator_update,  # noqa: SLF001
+            sensor.coordinator_context,
+        )
+
+    blocks = [sensor._modbus_block for sensor in sensors]  # noqa: SLF001
+    plan_started_at = time.perf_counter()
+    for _ in range(10):
+        hub.compile_read_plan(blocks)
+    plan_ms = (time.perf_counter() - plan_started_at) * 100
+
+    rnd = random.Random(entities)
+    await coordinator.async_refresh()
+    requests_before = device.requests
+    latencies: list[float] = []
+    cpu_started_at = time.thread_time()
+    wall_started_at = time.perf_counter()
+    for _ in range(polls):
+        for block in rnd.sample(blocks, int(len(blocks) * change_fraction)):
+            device.set(block.unit, block.table, block.registers.start, rnd.randrange(2))
+        poll_started_at = time.perf_counter()
+        await coordinator.async_refresh()
+        latencies.append(time.perf_counter() - poll_started_at)
+    wall = time.perf_counter() - wall_started_at
+    cpu = time.thread_time() - cpu_started_at
+
+    await coordinator.async_shutdown()
+    client.close()
+    if transport == "serial" and client.frame_gap_violations:
+        _LOGGER.warning(
+            "%d requests were sent before the end of the inter-frame gap",
+            client.frame_gap_violations,
+        )
+    if server is not None:
+        await server.async_stop()
+
+    quantiles = statistics.quantiles(latencies, n=20)
+    stats = coordinator.stats
+    return Result(
+        transport=transport,
+        layout=layout,
+        entities=entities,
+        plan_ms=round(plan_ms, 3),
+        polls_s=round(polls / wall, 1),
+        p50_ms=round(statistics.median(latencies) * 1000, 3),
+        p95_ms=round(quantiles[-1] * 1000, 3),
+        cpu_ms=round(cpu / polls * 1000, 3),
+        requests=round((device.requests - requests_before) / polls, 1),
+        decode_ms=round((stats.decode_duration.mean or 0) * 1000, 3),
+        dispatch_ms=round((stats.dispatch_duration.mean or 0) * 1000, 3),
+    )
+
+
+async def run_benchmarks(args: argparse.Namespace) -> list[Result]:
+    """Run all requested scenarios."""
+    hass = HomeAssistant(tempfile.mkdtemp())
+    results: list[Result] = []
+    try:
+        for transport in args.transports:
+            for layout in args.layouts:
+                for entities in args.entities:
+                    result = await run_scenario(
+                        hass,
+                        transport,
+                        layout,
+                        entities,
+                        polls=args.polls,
+                        latency=args.latency,
+                        change_fraction=args.change_fraction,
+                        pipeline_window=args.pipeline_window,
+                        baudrate=args.baudrate,
+                    )
+                    results.append(result)
+                    print(_format_row(asdict(result)))  # noqa: T201
+    finally:
+        await hass.async_stop(force=True)
+    return results
+
+
+def _format_row(row: dict[str, Any]) -> str:
+    """Format a result as a fixed width table row."""
+    return "  ".join(f"{value!s:>10}" for value in row.values())
+
+
+def main() -> None:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--entities", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument(
+        "--layouts", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS)
+    )
+    parser.add_argument(
+        "--transports",
+        nargs="+",
+        choices=["inprocess", "tcp", "pipelined", "serial"],
+        default=["inprocess", "tcp"],
+    )
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="device latency in seconds"
+    )
+    parser.add_argument(
+        "--change-fraction",
+        type=float,
+        default=0.1,
+        help="fraction of the entities whose value changes before every poll",
+    )
+    parser.add_argument("--pipeline-window", type=int, default=4)
+    parser.add_argument(
+        "--baudrate",
+        type=int,
+        default=9600,
+        help="baud rate of the simulated serial line",
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    print(_format_row({field: field for field in Result.__dataclass_fields__}))  # noqa: T201
+    results = asyncio.run(run_benchmarks(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
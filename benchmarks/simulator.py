@@ -0,0 +1,391 @@
+"""Simulated Modbus device, reachable in process or over Modbus TCP.
+
+The device answers the read and write function codes used by ModbusHub, with
+configurable register values, latency, jitter, PDU limits, illegal ranges and
+injected errors. It is meant for benchmarks and manual experiments, and has no
+dependency on Home Assistant.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Iterable, Mapping
+import logging
+import random
+import struct
+from typing import Any
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.pdu import DecodePDU, ExceptionResponse, ModbusPDU
+from pymodbus.pdu.bit_message import (
+    ReadCoilsRequest,
+    ReadDiscreteInputsRequest,
+    WriteMultipleCoilsRequest,
+    WriteSingleCoilRequest,
+)
+from pymodbus.pdu.register_message import (
+    ReadHoldingRegistersRequest,
+    ReadInputRegistersRequest,
+    WriteMultipleRegistersRequest,
+    WriteSingleRegisterRequest,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+COIL = "coil"
+DISCRETE_INPUT = "discrete_input"
+HOLDING_REGISTER = "holding_register"
+INPUT_REGISTER = "input_register"
+
+_READ_TABLES = {
+    0x01: COIL,
+    0x02: DISCRETE_INPUT,
+    0x03: HOLDING_REGISTER,
+    0x04: INPUT_REGISTER,
+}
+_BIT_TABLES = (COIL, DISCRETE_INPUT)
+
+MBAP_HEADER = struct.Struct(">HHHB")
+"""Transaction ID, protocol ID, length and unit ID of a Modbus TCP frame."""
+
+type TableKey = tuple[int, str]
+"""Unit ID and table name."""
+
+
+def default_value(unit: int, table: str, address: int) -> int:
+    """Return a deterministic value for an address without an explicit value."""
+    if table in _BIT_TABLES:
+        return (address + unit) % 2
+    return (unit * 1000 + address) & 0xFFFF
+
+
+class SimulatedModbusDevice:
+    """Simulated Modbus device, possibly with several unit IDs.
+
+    Register values are kept per (unit, table) and can be changed while the
+    device runs. Addresses without a value get default_value(), so that any
+    register map can be read without configuring it first.
+    """
+
+    def __init__(
+        self,
+        values: Mapping[TableKey, Mapping[int, int]] | None = None,
+        *,
+        value_fn: Callable[[int, str, int], int] = default_value,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        max_read_count: int = 125,
+        max_bit_read_count: int = 2000,
+        max_write_count: int = 123,
+        illegal_ranges: Mapping[TableKey, Iterable[range]] | None = None,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        """Initialize the device.
+
+        latency and jitter (in seconds) delay every response by latency plus a
+        random duration of up to jitter. Reads of more than max_read_count
+        registers or max_bit_read_count bits are answered with an illegal value
+        exception, and reads or writes touching illegal_ranges with an illegal
+        address exception. A fraction error_rate of the requests is answered
+        with a device failure exception, and a fraction timeout_rate is never
+        answered.
+        """
+        self.values: dict[TableKey, dict[int, int]] = {
+            key: dict(table_values) for key, table_values in (values or {}).items()
+        }
+        self.value_fn = value_fn
+        self.latency = latency
+        self.jitter = jitter
+        self.max_read_count = max_read_count
+        self.max_bit_read_count = max_bit_read_count
+        self.max_write_count = max_write_count
+        self.illegal_ranges: dict[TableKey, list[range]] = {
+            key: list(ranges) for key, ranges in (illegal_ranges or {}).items()
+        }
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.requests = 0
+        """Number of requests received."""
+
+        self._random = random.Random(seed)
+        self._server: asyncio.Server | None = None
+        self._connections: set[asyncio.StreamWriter] = set()
+
+    def get(self, unit: int, table: str, address: int) -> int:
+        """Return the value of an address."""
+        if (value := self.values.get((unit, table), {}).get(address)) is not None:
+            return value
+        return self.value_fn(unit, table, address)
+
+    def set(self, unit: int, table: str, address: int, value: int) -> None:
+        """Change the value of an address."""
+        self.values.setdefault((unit, table), {})[address] = value
+
+    def _is_illegal(self, unit: int, table: str, address: int, count: int) -> bool:
+        """Return whether a request touches an illegal address."""
+        if address + count > 0x10000:
+            return True
+        return any(
+            illegal.start < address + count and address < illegal.stop
+            for illegal in self.illegal_ranges.get((unit, table), ())
+        )
+
+    async def handle(self, unit: int, pdu: bytes) -> bytes | None:
+        """Return the response to a request PDU, or None when not answered."""
+        self.requests += 1
+        if delay := self.latency + self._random.uniform(0, self.jitter):
+            await asyncio.sleep(delay)
+
+        roll = self._random.random()
+        if roll < self.timeout_rate:
+            return None
+        function_code = pdu[0]
+        if roll < self.timeout_rate + self.error_rate:
+            return _exception(function_code, ExceptionResponse.SLAVE_FAILURE)
+
+        try:
+            return self._respond(unit, function_code, pdu[1:])
+        except struct.error:
+            return _exception(function_code, ExceptionResponse.ILLEGAL_VALUE)
+
+    def _respond(self, unit: int, function_code: int, data: bytes) -> bytes:
+        """Perform a request and return its response PDU."""
+        if (table := _READ_TABLES.get(function_code)) is not None:
+            address, count = struct.unpack_from(">HH", data)
+            max_count = (
+                self.max_bit_read_count if table in _BIT_TABLES else self.max_read_count
+            )
+            if not 1 <= count <= max_count:
+                return _exception(function_code, ExceptionResponse.ILLEGAL_VALUE)
+            if self._is_illegal(unit, table, address, count):
+                return _exception(function_code, ExceptionResponse.ILLEGAL_ADDRESS)
+
+            values = [self.get(unit, table, address + i) for i in range(count)]
+            if table in _BIT_TABLES:
+                payload = _pack_bits(values)
+            else:
+                payload = struct.pack(f">{count}H", *values)
+            return bytes([function_code, len(payload)]) + payload
+
+        if function_code in (0x05, 0x06):
+            address, value = struct.unpack_from(">HH", data)
+            table = COIL if function_code == 0x05 else HOLDING_REGISTER
+            if self._is_illegal(unit, table, address, 1):
+                return _exception(function_code, ExceptionResponse.ILLEGAL_ADDRESS)
+            self.set(
+                unit, table, address, int(value == 0xFF00) if table == COIL else value
+            )
+            return bytes([function_code]) + data[:4]
+
+        if function_code in (0x0F, 0x10):
+            address, count, _ = struct.unpack_from(">HHB", data)
+            table = COIL if function_code == 0x0F else HOLDING_REGISTER
+            if not 1 <= count <= self.max_write_count:
+                return _exception(function_code, ExceptionResponse.ILLEGAL_VALUE)
+            if self._is_illegal(unit, table, address, count):
+                return _exception(function_code, ExceptionResponse.ILLEGAL_ADDRESS)
+            if table == COIL:
+                values = _unpack_bits(data[5:], count)
+            else:
+                values = list(struct.unpack_from(f">{count}H", data, 5))
+            for offset, value in enumerate(values):
+                self.set(unit, table, address + offset, value)
+            return bytes([function_code]) + data[:4]
+
+        return _exception(function_code, ExceptionResponse.ILLEGAL_FUNCTION)
+
+    @property
+    def port(self) -> int | None:
+        """Return the TCP port of the running server."""
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Serve the device over Modbus TCP, and return the port it listens on."""
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        assert self.port is not None
+        return self.port
+
+    async def stop_server(self) -> None:
+        """Stop serving the device over Modbus TCP."""
+        if self._server is not None:
+            self._server.close()
+            for writer in self._connections:
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer the requests of a connection, one after the other."""
+        self._connections.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER.size)
+                transaction_id, protocol_id, length, unit = MBAP_HEADER.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                if (response := await self.handle(unit, pdu)) is None:
+                    continue
+                writer.write(
+                    MBAP_HEADER.pack(
+                        transaction_id, protocol_id, len(response) + 1, unit
+                    )
+                    + response
+                )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+
+class SimulatedModbusClient:
+    """In-process client for a SimulatedModbusDevice.
+
+    It implements the subset of the pymodbus client API used by ModbusHub,
+    and returns regular pymodbus PDUs, without any socket in between.
+    """
+
+    def __init__(
+        self,
+        device: SimulatedModbusDevice,
+        *,
+        timeout: float = 3.0,
+        character_time: float = 0.0,
+    ) -> None:
+        """Initialize the client.
+
+        With a character_time, the client behaves like a Modbus RTU client on a
+        serial line: every frame takes its size in bytes times character_time,
+        and requests sent less than 3.5 character times after the previous
+        response are counted in frame_gap_violations.
+        """
+        self.device = device
+        self.timeout = timeout
+        self.character_time = character_time
+        self.frame_gap_violations = 0
+        self.connected = False
+        self._decoder = DecodePDU(is_server=False)
+        self._bus_idle_at: float | None = None
+
+    async def connect(self) -> bool:
+        """Connect to the device."""
+        self.connected = True
+        return True
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.connected = False
+
+    async def execute(self, request: ModbusPDU) -> ModbusPDU:
+        """Send a request and return its response."""
+        if not self.connected:
+            raise ConnectionException("Not connected to the simulated device")
+        pdu = bytes([request.function_code]) + request.encode()
+        if self.character_time:
+            await self._transfer(pdu)
+        response = await self.device.handle(request.dev_id, pdu)
+        if response is not None and self.character_time:
+            await self._transfer(response)
+            self._bus_idle_at = asyncio.get_running_loop().time()
+        if response is None:
+            await asyncio.sleep(self.timeout)
+            raise ModbusIOException("No response received from the simulated device")
+        response_pdu = self._decoder.decode(response)
+        assert response_pdu is not None
+        response_pdu.dev_id = request.dev_id
+        return response_pdu
+
+    async def _transfer(self, pdu: bytes) -> None:
+        """Wait for an RTU frame with the PDU to be sent over the serial line."""
+        loop = asyncio.get_running_loop()
+        if (
+            self._bus_idle_at is not None
+            and loop.time() - self._bus_idle_at < 3.5 * self.character_time
+        ):
+            self.frame_gap_violations += 1
+        # unit ID and CRC around the PDU
+        await asyncio.sleep((len(pdu) + 3) * self.character_time)
+
+    async def read_coils(self, address: int, *, count: int = 1, slave: int = 1) -> Any:
+        """Read coils (code 0x01)."""
+        return await self.execute(
+            ReadCoilsRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def read_discrete_inputs(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read discrete inputs (code 0x02)."""
+        return await self.execute(
+            ReadDiscreteInputsRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read holding registers (code 0x03)."""
+        return await self.execute(
+            ReadHoldingRegistersRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def read_input_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read input registers (code 0x04)."""
+        return await self.execute(
+            ReadInputRegistersRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def write_coil(self, address: int, value: bool, *, slave: int = 1) -> Any:
+        """Write a single coil (code 0x05)."""
+        return await self.execute(
+            WriteSingleCoilRequest(address=address, bits=[value], dev_id=slave)
+        )
+
+    async def write_register(self, address: int, value: int, *, slave: int = 1) -> Any:
+        """Write a single register (code 0x06)."""
+        return await self.execute(
+            WriteSingleRegisterRequest(address=address, registers=[value], dev_id=slave)
+        )
+
+    async def write_coils(
+        self, address: int, values: list[bool], *, slave: int = 1
+    ) -> Any:
+        """Write multiple coils (code 0x0F)."""
+        return await self.execute(
+            WriteMultipleCoilsRequest(address=address, bits=values, dev_id=slave)
+        )
+
+    async def write_registers(
+        self, address: int, values: list[int], *, slave: int = 1
+    ) -> Any:
+        """Write multiple registers (code 0x10)."""
+        return await self.execute(
+            WriteMultipleRegistersRequest(
+                address=address, registers=values, dev_id=slave
+            )
+        )
+
+
+def _exception(function_code: int, exception_code: int) -> bytes:
+    """Return an exception response PDU."""
+    return bytes([function_code | 0x80, exception_code])
+
+
+def _pack_bits(values: list[int]) -> bytes:
+    """Pack bits, least significant bit of each byte first."""
+    packed = bytearray((len(values) + 7) // 8)
+    for idx, value in enumerate(values):
+        if value:
+            packed[idx // 8] |= 1 << (idx % 8)
+    return bytes(packed)
+
+
+def _unpack_bits(data: bytes, count: int) -> list[int]:
+    """Unpack bits, least significant bit of each byte first."""
+    return [data[idx // 8] >> (idx % 8) & 1 for idx in range(count)]
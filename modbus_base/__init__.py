@@ -2,5 +2,38 @@
 
 from .coordinator import BaseModbusUpdateCoordinator
 from .modbus import ModbusHub
+from .pacing import AdaptivePacing
+from .pipeline import PipelinedModbusTcpClient
+from .profile import DeviceProfile, ModbusDeviceProfileStore, async_get_profile_store
+from .registry import (
+    ModbusHubRegistry,
+    async_acquire_shared_hub,
+    async_release_shared_hub,
+    serial_endpoint,
+    tcp_endpoint,
+)
+from .rtu import SerialLine
+from .scheduler import ModbusPollScheduler, get_poll_scheduler
+from .stream import ModbusStreamer
+from .trace import ModbusTrace, ReplayModbusClient
 
-__all__ = ["BaseModbusUpdateCoordinator", "ModbusHub"]
+__all__ = [
+    "AdaptivePacing",
+    "BaseModbusUpdateCoordinator",
+    "DeviceProfile",
+    "ModbusDeviceProfileStore",
+    "ModbusHub",
+    "ModbusHubRegistry",
+    "ModbusPollScheduler",
+    "ModbusStreamer",
+    "ModbusTrace",
+    "PipelinedModbusTcpClient",
+    "ReplayModbusClient",
+    "SerialLine",
+    "async_acquire_shared_hub",
+    "async_get_profile_store",
+    "async_release_shared_hub",
+    "get_poll_scheduler",
+    "serial_endpoint",
+    "tcp_endpoint",
+]
@@ -1,3 +1,89 @@
 """Constants."""
 
+from datetime import timedelta
+from enum import StrEnum
+
+DOMAIN = "modbus_base"
+
 MODBUS_REGISTERS = "modbus_registers"
+MODBUS_POLL_INTERVAL = "modbus_poll_interval"
+MODBUS_DECODER = "modbus_decoder"
+
+DEFAULT_UNIT_ID = 1
+"""Default unit ID (slave address) of a Modbus device."""
+
+DEFAULT_MAX_READ_COUNT = 64
+"""Default maximum number of registers read in a single request."""
+DEFAULT_MAX_BIT_READ_COUNT = 2000
+"""Default maximum number of coils or discrete inputs read in a single request."""
+PROTOCOL_MAX_READ_COUNT = 125
+"""Maximum number of registers the Modbus protocol allows in a single read."""
+PROTOCOL_MAX_BIT_READ_COUNT = 2000
+"""Maximum number of coils or discrete inputs the Modbus protocol allows in a single read."""
+DEFAULT_MAX_WRITE_COUNT = 123
+"""Default maximum number of registers or coils written in a single request."""
+DEFAULT_REQUEST_COST = 0.03
+"""Default cost (in seconds) of a request/response round trip."""
+DEFAULT_REGISTER_COST = 0.002
+"""Default cost (in seconds) of transferring a single register."""
+
+DEFAULT_MIN_PACING_WAIT = 0.0
+"""Default minimum wait (in seconds) between requests with adaptive pacing."""
+DEFAULT_MAX_PACING_WAIT = 2.0
+"""Default maximum wait (in seconds) between requests with adaptive pacing."""
+DEFAULT_PACING_DECREASE = 0.005
+"""Default decrease (in seconds) of the wait between requests after every response."""
+DEFAULT_PACING_INCREASE_FACTOR = 2.0
+"""Default factor by which the wait between requests grows after a timeout."""
+
+DEFAULT_FORCE_UPDATE_INTERVAL = timedelta(minutes=5)
+"""Default interval at which entities are updated even if their registers didn't change."""
+
+DEFAULT_MAX_CONCURRENT_POLLS = 4
+"""Default maximum number of coordinators polling at the same time."""
+
+DEFAULT_READ_CACHE_TTL = 5.0
+"""Default time (in seconds) for which read values answer ad-hoc reads."""
+
+DEFAULT_RTU_TURNAROUND = 0.01
+"""Default time (in seconds) a Modbus RTU device needs before responding to a request."""
+
+DEFAULT_STREAM_INTERVAL = timedelta(milliseconds=100)
+"""Default interval between two samples of a streamer."""
+DEFAULT_STREAM_WINDOW = timedelta(seconds=10)
+"""Default window over which a streamer aggregates its samples."""
+DEFAULT_STREAM_CAPACITY = 6000
+"""Default number of samples a streamer keeps, i.e. 10 minutes at the default interval."""
+MIN_STREAM_INTERVAL = timedelta(milliseconds=1)
+"""Minimum interval between two samples of a streamer."""
+
+
+class ModbusTable(StrEnum):
+    """Modbus data table in which a register lives."""
+
+    COIL = "coil"
+    DISCRETE_INPUT = "discrete_input"
+    HOLDING_REGISTER = "holding_register"
+    INPUT_REGISTER = "input_register"
+
+    @property
+    def is_bit_table(self) -> bool:
+        """Return whether the table contains single-bit values."""
+        return self in (ModbusTable.COIL, ModbusTable.DISCRETE_INPUT)
+
+
+class OverrunPolicy(StrEnum):
+    """What to do when a scheduled poll could not start before the next one was due."""
+
+    SKIP = "skip"
+    """Drop the polls which were missed, and wait for the next one on schedule."""
+    MERGE = "merge"
+    """Poll right away, once for all missed polls."""
+
+
+class StreamStatistic(StrEnum):
+    """Aggregate of the samples of a streamed field over a window."""
+
+    MIN = "minimum"
+    MAX = "maximum"
+    MEAN = "mean"
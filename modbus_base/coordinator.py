@@ -1,26 +1,48 @@
 """Base Modbus DataUpdateCoordinator."""
 
+from collections.abc import Callable, Iterable, Iterator
 from datetime import timedelta
-from itertools import chain
 import logging
+import time
 from typing import Any
 
 from pymodbus.exceptions import ModbusException
 
-from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.typing import UNDEFINED, UndefinedType
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .const import MODBUS_REGISTERS
+from .const import (
+    DEFAULT_FORCE_UPDATE_INTERVAL,
+    MODBUS_DECODER,
+    MODBUS_POLL_INTERVAL,
+    MODBUS_REGISTERS,
+)
+from .decoder import ModbusDecoder
 from .modbus import ModbusHub
+from .planner import ReadPlan, RegisterBlock, RegisterKey
+from .scheduler import ModbusPollScheduler
+from .snapshot import RegisterSnapshot, SnapshotLayer
+from .stats import CoordinatorStats
+
+type PollTier = timedelta | None
+"""Poll interval of a group of registers. None means every refresh."""
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class BaseModbusUpdateCoordinator(DataUpdateCoordinator[dict[int, Any]]):
+class BaseModbusUpdateCoordinator(DataUpdateCoordinator[RegisterSnapshot]):
     """A specialised DataUpdateCoordinator for Huawei Solar entities."""
 
     _modbus_hub: ModbusHub
+    _poll_tiers: dict[PollTier, frozenset[RegisterBlock]] | None = None
+    _tier_decoders: dict[PollTier, frozenset[tuple[RegisterBlock, ModbusDecoder]]]
+    _refreshed_tiers: frozenset[PollTier] | None = None
+    _forced_tiers: frozenset[PollTier] = frozenset()
+    _changed_registers: set[RegisterKey] | None = None
+    _listener_index: dict[RegisterKey, list[int]] | None = None
 
     def __init__(
         self,
@@ -30,8 +52,29 @@ class BaseModbusUpdateCoordinator(DataUpdateCoordinator[dict[int, Any]]):
         name: str,
         update_interval: timedelta | None = None,
         request_refresh_debouncer: Debouncer | None = None,
+        force_update_interval: timedelta | None = DEFAULT_FORCE_UPDATE_INTERVAL,
+        scheduler: ModbusPollScheduler | None = None,
+        config_entry: ConfigEntry | None | UndefinedType = UNDEFINED,
     ) -> None:
-        """Create a HuaweiSolarUpdateCoordinator."""
+        """Create a HuaweiSolarUpdateCoordinator.
+
+        update_interval is the poll interval of every entity without a poll
+        interval of its own. When some entities need to be polled faster, the
+        coordinator ticks at that faster rate and only reads the registers
+        which are due on every tick.
+
+        After a refresh, only the entities whose registers changed are
+        updated. Every force_update_interval, all entities of a refreshed poll
+        interval are updated regardless, so that their state stays current.
+        Use a zero interval to update all entities on every refresh, or None
+        to only update them on changes.
+
+        With a scheduler, the polls are started by the scheduler, which spreads
+        the polls of all its coordinators over their interval and limits how
+        many of them run at once.
+
+        config_entry defaults to the config entry being set up, if any.
+        """
         super().__init__(
             hass,
             logger,
@@ -39,17 +82,462 @@ class BaseModbusUpdateCoordinator(DataUpdateCoordinator[dict[int, Any]]):
             update_interval=update_interval,
             update_method=None,
             request_refresh_debouncer=request_refresh_debouncer,
+            config_entry=config_entry,
         )
         self._modbus_hub = modbus_hub
+        self._base_update_interval = update_interval
+        self._read_plans: dict[frozenset[PollTier], ReadPlan] = {}
+        self._read_plans_version = modbus_hub.read_plan_version
+        self._used_register_counts: dict[frozenset[PollTier], int] = {}
+        self._tier_polled_at: dict[PollTier, float] = {}
+        self._tier_layers: dict[PollTier, SnapshotLayer] = {}
+        self._read_back_layers: list[tuple[float, SnapshotLayer]] = []
+        self._tier_decoders = {}
+        self._force_update_interval = force_update_interval
+        self._tier_forced_at: dict[PollTier, float] = {}
+        self._new_listeners: set[int] = set()
+        self._scheduler = scheduler
+        self._poll_phase = scheduler.allocate_phase() if scheduler else 0.0
+        self._poll_at: float | None = None
+        self.stats = CoordinatorStats()
 
-    async def _async_update_data(self):
-        modbus_registers = set(
-            chain.from_iterable(ctx[MODBUS_REGISTERS] for ctx in self.async_contexts())
+    @property
+    def modbus_hub(self) -> ModbusHub:
+        """Return the Modbus hub used by the coordinator."""
+        return self._modbus_hub
+
+    @callback
+    def async_add_listener(
+        self, update_callback: CALLBACK_TYPE, context: Any = None
+    ) -> Callable[[], None]:
+        """Listen for data updates and invalidate the read plan if needed."""
+        if not _has_modbus_registers(context):
+            return super().async_add_listener(update_callback, context)
+
+        # make sure the first refresh is already scheduled at the right rate
+        if (tier := self._poll_tier(context)) is not None and (
+            self.update_interval is None or tier < self.update_interval
+        ):
+            self.update_interval = tier
+
+        remove_listener = super().async_add_listener(update_callback, context)
+        # a new listener is updated after the next refresh, changed or not
+        listener_id = self._last_listener_id
+        self._new_listeners.add(listener_id)
+        self._invalidate_read_plans()
+
+        @callback
+        def _remove_listener() -> None:
+            remove_listener()
+            self._new_listeners.discard(listener_id)
+            self._invalidate_read_plans()
+
+        return _remove_listener
+
+    @callback
+    def _schedule_refresh(self) -> None:
+        """Schedule the next poll, on the grid of the scheduler if any.
+
+        This replaces the scheduling of DataUpdateCoordinator, and relies on
+        its _unsub_refresh and _handle_refresh_interval like it does.
+        """
+        if self._scheduler is None:
+            super()._schedule_refresh()
+            return
+
+        if self.update_interval is None:
+            return
+        if self.config_entry and self.config_entry.pref_disable_polling:
+            return
+
+        self._async_unsub_refresh()
+        poll_at = self._scheduler.next_poll_at(
+            self._poll_phase, self.update_interval.total_seconds(), self._poll_at
+        )
+        self._unsub_refresh = self.hass.loop.call_at(
+            poll_at, self._async_start_scheduled_poll, poll_at
+        ).cancel
+
+    @callback
+    def _async_start_scheduled_poll(self, poll_at: float) -> None:
+        """Start a poll scheduled at poll_at, once the scheduler allows it."""
+        assert self._scheduler is not None
+        self._poll_at = poll_at
+        poll = self._scheduler.async_run_poll(poll_at, self._handle_refresh_interval)
+        if self.config_entry:
+            self.config_entry.async_create_background_task(
+                self.hass, poll, name=f"{self.name} - scheduled poll"
+            )
+        else:
+            self.hass.async_create_background_task(
+                poll, name=f"{self.name} - scheduled poll"
+            )
+
+    @callback
+    def _invalidate_read_plans(self) -> None:
+        """Drop the cached poll tiers and read plans."""
+        self._poll_tiers = None
+        self._listener_index = None
+        self._read_plans.clear()
+        self._used_register_counts.clear()
+
+    def _poll_tier(self, context: dict[str, Any]) -> PollTier:
+        """Return the poll tier of a listener context."""
+        return context.get(MODBUS_POLL_INTERVAL) or self._base_update_interval
+
+    @property
+    def poll_tiers(self) -> dict[PollTier, frozenset[RegisterBlock]]:
+        """Return the register blocks of all listeners, grouped by poll interval.
+
+        The coordinator ticks at the fastest poll interval of all tiers.
+        """
+        if self._poll_tiers is None:
+            tiers: dict[PollTier, set[RegisterBlock]] = {}
+            decoders: dict[PollTier, set[tuple[RegisterBlock, ModbusDecoder]]] = {}
+            for ctx in self.async_contexts():
+                if _has_modbus_registers(ctx):
+                    tier = self._poll_tier(ctx)
+                    for block, decoder in _context_registers(ctx):
+                        tiers.setdefault(tier, set()).add(block)
+                        if decoder is not None:
+                            decoders.setdefault(tier, set()).add((block, decoder))
+            self._poll_tiers = {
+                tier: frozenset(blocks) for tier, blocks in tiers.items()
+            }
+            self._tier_decoders = {
+                tier: frozenset(items) for tier, items in decoders.items()
+            }
+            self._tier_polled_at = {
+                tier: polled_at
+                for tier, polled_at in self._tier_polled_at.items()
+                if tier in self._poll_tiers
+            }
+            self._tier_layers = {
+                tier: layer
+                for tier, layer in self._tier_layers.items()
+                if tier in self._poll_tiers
+            }
+            self._tier_forced_at = {
+                tier: forced_at
+                for tier, forced_at in self._tier_forced_at.items()
+                if tier in self._poll_tiers
+            }
+
+            intervals = [tier for tier in self._poll_tiers if tier is not None]
+            if self._base_update_interval is not None:
+                intervals.append(self._base_update_interval)
+            self.update_interval = min(intervals, default=None)
+
+        return self._poll_tiers
+
+    @property
+    def listener_index(self) -> dict[RegisterKey, list[int]]:
+        """Return the IDs of the listeners reading every register."""
+        if self._listener_index is None:
+            index: dict[RegisterKey, list[int]] = {}
+            for listener_id, (_, context) in self._listeners.items():
+                if _has_modbus_registers(context):
+                    keys = {
+                        (block.unit, block.table, address)
+                        for block, _ in _context_registers(context)
+                        for address in block.registers
+                    }
+                    for key in keys:
+                        index.setdefault(key, []).append(listener_id)
+            self._listener_index = index
+        return self._listener_index
+
+    def _read_plan_for(self, tiers: frozenset[PollTier]) -> ReadPlan:
+        """Return the read plan for a combination of poll tiers.
+
+        Tiers which are due at the same time are read with a single plan, so
+        that their registers are batched together.
+        """
+        if self._read_plans_version != self._modbus_hub.read_plan_version:
+            # the hub learned addresses which must not be read anymore
+            self._read_plans.clear()
+            self._used_register_counts.clear()
+            self._read_plans_version = self._modbus_hub.read_plan_version
+
+        if (read_plan := self._read_plans.get(tiers)) is None:
+            poll_tiers = self.poll_tiers
+            read_plan = self._read_plans[tiers] = self._modbus_hub.compile_read_plan(
+                block for tier in tiers for block in poll_tiers[tier]
+            )
+            register_index = read_plan.register_index
+            self._used_register_counts[tiers] = len(
+                {
+                    key
+                    for tier in tiers
+                    for block in poll_tiers[tier]
+                    for address in block.registers
+                    if (key := (block.unit, block.table, address)) in register_index
+                }
+            )
+        return read_plan
+
+    @property
+    def read_plan(self) -> ReadPlan:
+        """Return the read plan for the registers of all listeners.
+
+        The plan is compiled on first use, and cached until a listener with
+        Modbus registers is added or removed, or until the hub learns addresses
+        which must not be read.
+        """
+        return self._read_plan_for(frozenset(self.poll_tiers))
+
+    def _due_poll_tiers(self, now: float) -> frozenset[PollTier]:
+        """Return the poll tiers which must be read on this tick."""
+        poll_tiers = self.poll_tiers
+        if self.data is None:
+            return frozenset(poll_tiers)
+
+        # allow a tick to be a bit early, so that the slower tiers don't slip
+        # a full tick because of scheduling jitter
+        tolerance = (
+            self.update_interval.total_seconds() / 2 if self.update_interval else 0
+        )
+        return frozenset(
+            tier
+            for tier in poll_tiers
+            if tier is None
+            or (polled_at := self._tier_polled_at.get(tier)) is None
+            or now - polled_at + tolerance >= tier.total_seconds()
+        )
+
+    def _forced_poll_tiers(
+        self, due_tiers: frozenset[PollTier], now: float
+    ) -> frozenset[PollTier]:
+        """Return the due poll tiers whose listeners must be updated regardless."""
+        if self._force_update_interval is None:
+            return frozenset()
+
+        forced_tiers = frozenset(
+            tier
+            for tier in due_tiers
+            if (forced_at := self._tier_forced_at.get(tier)) is None
+            or now - forced_at >= self._force_update_interval.total_seconds()
         )
-        if not len(modbus_registers):
+        for tier in forced_tiers:
+            self._tier_forced_at[tier] = now
+        return forced_tiers
+
+    async def _async_update_data(self):
+        now = time.monotonic()
+        due_tiers = self._due_poll_tiers(now)
+        read_plan = self._read_plan_for(due_tiers)
+        if not read_plan.batches:
             _LOGGER.debug("No Modbus registers to update")
 
         try:
-            return await self._modbus_hub.batch_read(modbus_registers)
+            snapshot = await self._modbus_hub.execute_read_plan(read_plan)
         except ModbusException as err:
             raise UpdateFailed(f"Could not update values: {err}") from err
+
+        self.stats.refreshes += 1
+        self.stats.refresh_duration.record(time.monotonic() - now)
+        self.stats.registers_read += read_plan.register_count
+        self.stats.registers_used += self._used_register_counts.get(due_tiers, 0)
+
+        previous = self.data
+        self._refreshed_tiers = due_tiers
+        self._forced_tiers = self._forced_poll_tiers(due_tiers, now)
+        if not snapshot.layers:
+            self._tier_layers.clear()
+            self._read_back_layers.clear()
+            self._changed_registers = None
+            return snapshot
+
+        for tier in due_tiers:
+            self._tier_polled_at[tier] = now
+            # the tiers which were not due keep the values of their last read
+            self._tier_layers[tier] = snapshot.layers[0]
+        snapshot = self._layered_snapshot()
+
+        # after a failed refresh, all entities must become available again
+        self._changed_registers = (
+            snapshot.changed_registers(previous)
+            if previous is not None and self.last_update_success
+            else None
+        )
+
+        # decode the values of the refreshed entities in one pass, so that
+        # entities sharing registers don't decode them again
+        decode_started_at = time.monotonic()
+        snapshot.decode_all(
+            item
+            for tier in due_tiers
+            for item in self._tier_decoders.get(tier, frozenset())
+        )
+        self.stats.decode_duration.record(time.monotonic() - decode_started_at)
+        return snapshot
+
+    def _layered_snapshot(self) -> RegisterSnapshot:
+        """Return a snapshot of the last layers of all tiers and read-backs.
+
+        The layers are ordered by the time their read started, newest first. A
+        read-back is dropped once all tiers were read again after it.
+        """
+        timed_layers = [
+            (self._tier_polled_at[tier], layer)
+            for tier, layer in self._tier_layers.items()
+        ]
+        if timed_layers:
+            oldest = min(read_at for read_at, _ in timed_layers)
+            self._read_back_layers = [
+                (read_at, layer)
+                for read_at, layer in self._read_back_layers
+                if read_at > oldest
+            ]
+        timed_layers.extend(self._read_back_layers)
+        timed_layers.sort(key=lambda item: item[0], reverse=True)
+
+        # a layer can hold the values of several tiers
+        layers: list[SnapshotLayer] = []
+        for _, layer in timed_layers:
+            if not any(layer is known for known in layers):
+                layers.append(layer)
+        return RegisterSnapshot(layers)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the listeners whose registers were refreshed and changed.
+
+        Listeners without Modbus registers are always updated, as are all
+        listeners when the update failed, when the values can't be compared
+        with the previous refresh (after a failure, all entities must become
+        available again, including those of the tiers which were not
+        refreshed), or when called outside a refresh. Listeners of a refreshed
+        poll tier are updated when it is forced, or when they were added since
+        the last update.
+        """
+        refreshed_tiers, self._refreshed_tiers = self._refreshed_tiers, None
+        changed_registers, self._changed_registers = self._changed_registers, None
+        forced_tiers, self._forced_tiers = self._forced_tiers, frozenset()
+        if refreshed_tiers is None or not self.last_update_success:
+            self._new_listeners.clear()
+            super().async_update_listeners()
+            return
+
+        started_at = time.monotonic()
+        update_all = changed_registers is None
+        changed_listeners: set[int] = set()
+        if changed_registers is not None:
+            listener_index = self.listener_index
+            changed_listeners = {
+                listener_id
+                for key in changed_registers
+                for listener_id in listener_index.get(key, ())
+            }
+
+        for listener_id, (update_callback, context) in list(self._listeners.items()):
+            if (
+                update_all
+                or not _has_modbus_registers(context)
+                or listener_id in changed_listeners
+                or (
+                    (tier := self._poll_tier(context)) in refreshed_tiers  # type: ignore[arg-type]
+                    and (tier in forced_tiers or listener_id in self._new_listeners)
+                )
+            ):
+                self._new_listeners.discard(listener_id)
+                self.stats.listeners_updated += 1
+                update_callback()
+            else:
+                self.stats.listeners_skipped += 1
+        self.stats.dispatch_duration.record(time.monotonic() - started_at)
+
+    async def async_refresh_registers(self, blocks: Iterable[RegisterBlock]) -> None:
+        """Read only the given registers, and update the listeners using them.
+
+        Use this after a write to get the values which the device actually
+        holds, instead of assuming that the write succeeded. Only the listeners
+        whose registers changed are updated. When some of the registers can't
+        be read, a full refresh is requested instead.
+
+        The values read back shadow those of the last polls, until all tiers
+        are read again. The layers of the last polls are not modified, as they
+        are shared with the read cache of the hub.
+        """
+        blocks = tuple(blocks)
+        started_at = time.monotonic()
+        try:
+            snapshot = await self._modbus_hub.execute_read_plan(
+                self._modbus_hub.compile_read_plan(blocks)
+            )
+        except ModbusException as err:
+            _LOGGER.warning("Could not read back the written registers: %s", err)
+            await self.async_request_refresh()
+            return
+
+        if any(
+            (block.unit, block.table, address) not in snapshot
+            for block in blocks
+            for address in block.registers
+        ):
+            _LOGGER.warning("Could not read back all the written registers")
+            await self.async_request_refresh()
+            return
+
+        if (previous := self.data) is None or not snapshot.layers:
+            return
+
+        self._read_back_layers.insert(0, (started_at, snapshot.layers[0]))
+        data = self._layered_snapshot()
+        changed_registers = {
+            key for key in snapshot if key in previous and data[key] != previous[key]
+        }
+        self.data = data
+        if not changed_registers:
+            return
+
+        listener_index = self.listener_index
+        changed_listeners = {
+            listener_id
+            for key in changed_registers
+            for listener_id in listener_index.get(key, ())
+        }
+        for listener_id in sorted(changed_listeners):
+            if (listener := self._listeners.get(listener_id)) is not None:
+                self.stats.listeners_updated += 1
+                listener[0]()
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return the state and statistics of the coordinator and its hub."""
+        read_plan = self.read_plan
+        return {
+            "update_interval": self.update_interval.total_seconds()
+            if self.update_interval
+            else None,
+            "poll_tiers": {
+                str(tier): len(blocks) for tier, blocks in self.poll_tiers.items()
+            },
+            "read_plan": {
+                "batches": len(read_plan.batches),
+                "registers": read_plan.register_count,
+            },
+            "stats": self.stats.as_dict(),
+            "scheduler": self._scheduler.stats.as_dict() if self._scheduler else None,
+            "hub": self._modbus_hub.get_diagnostics(),
+        }
+
+
+def _has_modbus_registers(context: Any) -> bool:
+    """Return whether a listener context contains Modbus registers."""
+    return isinstance(context, dict) and MODBUS_REGISTERS in context
+
+
+def _context_registers(
+    context: dict[str, Any],
+) -> Iterator[tuple[RegisterBlock, ModbusDecoder | None]]:
+    """Return the register blocks of a listener context with their decoders.
+
+    The context holds either a single block and decoder, or a tuple of blocks
+    and a tuple of decoders for entities combining several values.
+    """
+    blocks = context[MODBUS_REGISTERS]
+    decoders = context.get(MODBUS_DECODER)
+    if isinstance(blocks, RegisterBlock):
+        yield blocks, decoders
+    else:
+        yield from zip(blocks, decoders or (None,) * len(blocks), strict=True)
@@ -0,0 +1,119 @@
+"""Precompiled decoders for Modbus register values."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from operator import itemgetter
+import struct
+from typing import TYPE_CHECKING, Any, Literal
+
+from .const import ModbusTable
+
+if TYPE_CHECKING:
+    from .entity import SimpleModbusRegisterType
+
+type ByteOrder = Literal["big", "little"]
+
+
+@dataclass(frozen=True)
+class ModbusDecoder:
+    """Decoder for the raw bytes of a register block.
+
+    The decoding function is compiled once when the decoder is created, so
+    that decoding a value is a single struct call instead of going through
+    the generic type dispatch of pymodbus on every update.
+
+    Decoders are compared by their specification, so entities with the same
+    registers and data type share the decoded value.
+    """
+
+    table: ModbusTable
+    register_type: SimpleModbusRegisterType | None
+    count: int
+    scale: float | None = None
+    word_order: ByteOrder = "big"
+    byte_order: ByteOrder = "big"
+
+    decode: Callable[[memoryview], Any] = field(init=False, repr=False, compare=False)
+    """Decode the raw bytes of the registers, as stored in a RegisterSnapshot."""
+
+    def __post_init__(self) -> None:
+        """Compile the decoding function."""
+        object.__setattr__(self, "decode", self._compile())
+
+    def _compile(self) -> Callable[[memoryview], Any]:
+        """Return a function decoding the raw bytes of the registers."""
+        if self.table.is_bit_table:
+            if self.count == 1:
+                return lambda view: bool(view[0])
+            return lambda view: [bool(bit) for bit in view]
+
+        assert self.register_type is not None
+        struct_format, type_length = self.register_type.value.value
+
+        if self.scale is not None and not type_length:
+            raise ValueError("Scale can only be set for registers containing a number")
+
+        reorder = _reorder_bytes(self.count, self.word_order, self.byte_order)
+
+        if not type_length:
+            if struct_format == "s":
+                return _chain(reorder, _decode_string)
+            return _chain(reorder, _decode_bits)
+
+        if self.count != type_length:
+            raise ValueError(
+                "modbus_count does not match the length for this register type"
+            )
+
+        unpack_from = struct.Struct(f">{struct_format}").unpack_from
+        if reorder is None:
+            if self.scale is None:
+                return lambda view: unpack_from(view)[0]
+            scale = self.scale
+            return lambda view: unpack_from(view)[0] / scale
+
+        if self.scale is None:
+            return lambda view: unpack_from(reorder(view))[0]
+        scale = self.scale
+        return lambda view: unpack_from(reorder(view))[0] / scale
+
+
+def _reorder_bytes(
+    count: int, word_order: ByteOrder, byte_order: ByteOrder
+) -> Callable[[memoryview], bytes] | None:
+    """Return a function converting the bytes to big word and byte order."""
+    if word_order == "big" and byte_order == "big":
+        return None
+    if word_order == "little" and byte_order == "little":
+        return lambda view: bytes(view)[::-1]
+
+    words = range(count - 1, -1, -1) if word_order == "little" else range(count)
+    permutation = [
+        2 * word + byte
+        for word in words
+        for byte in ((1, 0) if byte_order == "little" else (0, 1))
+    ]
+    getter = itemgetter(*permutation)
+    return lambda view: bytes(getter(view))
+
+
+def _chain(
+    reorder: Callable[[memoryview], bytes] | None,
+    decode: Callable[[memoryview | bytes], Any],
+) -> Callable[[memoryview], Any]:
+    """Reorder the bytes, if needed, before decoding them."""
+    if reorder is None:
+        return decode
+    return lambda view: decode(reorder(view))
+
+
+def _decode_string(data: memoryview | bytes) -> str:
+    """Decode a string, ignoring trailing null bytes."""
+    return bytes(data).rstrip(b"\x00").decode("utf-8")
+
+
+def _decode_bits(data: memoryview | bytes) -> list[bool]:
+    """Decode the bits of the registers, least significant bit of each byte first."""
+    return [bool(byte >> bit & 1) for byte in data for bit in range(8)]
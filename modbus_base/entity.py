@@ -1,16 +1,32 @@
 """Base Modbus Entity."""
 
+from collections.abc import Iterable
 from dataclasses import dataclass
+from datetime import timedelta
 from enum import Enum
 from functools import cached_property
+import logging
+from typing import Any
 
 from pymodbus.client.mixin import ModbusClientMixin
 
+from homeassistant.core import CALLBACK_TYPE, callback
 from homeassistant.helpers.entity import EntityDescription
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import MODBUS_REGISTERS
+from .const import (
+    DEFAULT_UNIT_ID,
+    MODBUS_DECODER,
+    MODBUS_POLL_INTERVAL,
+    MODBUS_REGISTERS,
+    ModbusTable,
+)
 from .coordinator import BaseModbusUpdateCoordinator
+from .decoder import ByteOrder, ModbusDecoder
+from .planner import RegisterBlock
+
+_LOGGER = logging.getLogger(__name__)
 
 PyModbusDataType = ModbusClientMixin.DATATYPE
 
@@ -30,54 +46,281 @@ class SimpleModbusRegisterType(Enum):
     BITS = PyModbusDataType.BITS
 
 
-@dataclass(frozen=True)
+def modbus_register_block(
+    unit: int,
+    table: ModbusTable,
+    address: int | None,
+    register_type: SimpleModbusRegisterType | None,
+    count: int | None,
+) -> RegisterBlock:
+    """Return the block of registers described by an entity description."""
+
+    # these must be set, but cannot type them correctly due to
+    # "non-default argument 'xyz' follows default argument 'abc'" error
+    assert address is not None
+
+    if table.is_bit_table:
+        # coils and discrete inputs hold a single bit per address
+        return RegisterBlock(unit, table, range(address, address + (count or 1)))
+
+    assert register_type
+
+    type_length = register_type.value.value[1]
+
+    if count and type_length and count != type_length:
+        raise ValueError(
+            "modbus_count does not match the length for this register type"
+        )
+
+    if not count:
+        if not type_length:
+            raise ValueError("modbus_count must be set for this register type")
+        count = type_length
+
+    return RegisterBlock(unit, table, range(address, address + count))
+
+
+@dataclass(frozen=True, kw_only=True)
 class SimpleModbusEntityDescription:
-    """Entity description for a simple Modbus entity."""
+    """Entity description for a simple Modbus entity.
+
+    Mixin for the entity descriptions of the platforms, such as
+    SimpleModbusSensorEntityDescription.
+    """
 
     modbus_address: int | None = None
+    """Modbus register number."""
     modbus_register_type: SimpleModbusRegisterType | None = None
+    """Type of data stored in the register."""
     modbus_count: int | None = None
+    """Number of registers to read for this entity."""
+    modbus_table: ModbusTable = ModbusTable.HOLDING_REGISTER
+    """Modbus table in which the registers live."""
+    modbus_unit: int = DEFAULT_UNIT_ID
+    """Modbus unit ID of the device."""
+    modbus_word_order: ByteOrder = "big"
+    """Order of the registers of values spanning several registers."""
+    modbus_byte_order: ByteOrder = "big"
+    """Order of the bytes within every register."""
+    poll_interval: timedelta | None = None
+    """When set, the registers are polled at this interval instead of the
+    update interval of the coordinator."""
+
+    @property
+    def modbus_scale(self) -> float | None:
+        """Return the scale by which the value of the registers is divided."""
+        return None
 
     @cached_property
-    def modbus_registers(self) -> list[int]:
+    def modbus_block(self) -> RegisterBlock:
+        """Return the Modbus unit, table and registers."""
+        return modbus_register_block(
+            self.modbus_unit,
+            self.modbus_table,
+            self.modbus_address,
+            self.modbus_register_type,
+            self.modbus_count,
+        )
+
+    @property
+    def modbus_registers(self) -> range:
         """Return the Modbus registers."""
+        return self.modbus_block.registers
 
-        # these must be set, but cannot type them correctly due to
-        # "non-default argument 'xyz' follows default argument 'abc'" error
-        assert self.modbus_address
-        assert self.modbus_register_type
+    @cached_property
+    def modbus_decoder(self) -> ModbusDecoder:
+        """Return the decoder for the value of the registers."""
+        return ModbusDecoder(
+            self.modbus_table,
+            self.modbus_register_type,
+            len(self.modbus_registers),
+            scale=self.modbus_scale,
+            word_order=self.modbus_word_order,
+            byte_order=self.modbus_byte_order,
+        )
 
-        type_length = self.modbus_register_type.value.value[1]
-        modbus_count = self.modbus_count
 
-        if self.modbus_count and type_length and self.modbus_count != type_length:
-            raise ValueError(
-                "modbus_count does not match the length for this register type"
-            )
+@dataclass(frozen=True, kw_only=True)
+class ModbusField:
+    """A value read by a composite Modbus entity."""
 
-        if not self.modbus_count:
-            if not type_length:
-                raise ValueError("modbus_count must be set for this register type")
-            modbus_count = type_length
+    address: int
+    register_type: SimpleModbusRegisterType | None = None
+    count: int | None = None
+    table: ModbusTable = ModbusTable.HOLDING_REGISTER
+    unit: int = DEFAULT_UNIT_ID
+    word_order: ByteOrder = "big"
+    byte_order: ByteOrder = "big"
+    scale: float | None = None
 
-        assert modbus_count is not None
+    @cached_property
+    def modbus_block(self) -> RegisterBlock:
+        """Return the Modbus unit, table and registers."""
+        return modbus_register_block(
+            self.unit, self.table, self.address, self.register_type, self.count
+        )
 
-        return list(range(self.modbus_address, self.modbus_address + modbus_count))
+    @cached_property
+    def modbus_decoder(self) -> ModbusDecoder:
+        """Return the decoder for the value of the registers."""
+        return ModbusDecoder(
+            self.table,
+            self.register_type,
+            len(self.modbus_block.registers),
+            scale=self.scale,
+            word_order=self.word_order,
+            byte_order=self.byte_order,
+        )
 
 
 class BaseModbusEntity(CoordinatorEntity[BaseModbusUpdateCoordinator]):
     """Base Modbus Entity."""
 
+    _modbus_block: RegisterBlock
+    _modbus_decoder: ModbusDecoder
+
     def __init__(
         self,
         coordinator: BaseModbusUpdateCoordinator,
         description: EntityDescription,
+        unit: int | None = None,
     ) -> None:
-        """Initialize the entity."""
-        super().__init__(
-            coordinator,
-            context={
-                MODBUS_REGISTERS: description.modbus_registers,  # type: ignore[reportAccessAttributeIssue]
-            },
-        )
+        """Initialize the entity.
+
+        When unit is set, it overrides the unit ID of the description, which
+        allows to share the same descriptions between several devices on a bus.
+        """
+        super().__init__(coordinator, context=self._modbus_context(description, unit))
         self.entity_description = description
+
+    def _modbus_context(
+        self, description: EntityDescription, unit: int | None
+    ) -> dict[str, Any]:
+        """Return the context with which the entity listens to the coordinator."""
+        block: RegisterBlock = description.modbus_block  # type: ignore[reportAccessAttributeIssue]
+        if unit is not None:
+            block = block._replace(unit=unit)
+        self._modbus_block = block
+        self._modbus_decoder = description.modbus_decoder  # type: ignore[reportAccessAttributeIssue]
+        return {
+            MODBUS_REGISTERS: block,
+            MODBUS_POLL_INTERVAL: description.poll_interval,  # type: ignore[reportAccessAttributeIssue]
+            MODBUS_DECODER: self._modbus_decoder,
+        }
+
+    def _get_modbus_value(self) -> Any:
+        """Return the decoded value of this entity from the coordinator data.
+
+        Returns None when not all registers are available.
+        """
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.decode(self._modbus_block, self._modbus_decoder)
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Update the attributes of the entity from the coordinator data."""
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        self._async_update_attrs()
+        self.async_write_ha_state()
+
+
+class CompositeModbusEntity(BaseModbusEntity):
+    """Base class for entities combining the values of several Modbus fields.
+
+    The fields can be anywhere on the device: they are added to the read plan
+    of the coordinator like the registers of any other entity, and read in
+    the same poll. The entity is updated when any of them changed.
+    """
+
+    _modbus_blocks: tuple[RegisterBlock, ...]
+    _modbus_decoders: tuple[ModbusDecoder, ...]
+
+    def _modbus_context(
+        self, description: EntityDescription, unit: int | None
+    ) -> dict[str, Any]:
+        """Return the context with which the entity listens to the coordinator.
+
+        When unit is set, it overrides the unit ID of all fields of the
+        description.
+        """
+        fields: tuple[ModbusField, ...] = description.modbus_fields  # type: ignore[reportAccessAttributeIssue]
+        self._modbus_blocks = tuple(
+            field.modbus_block
+            if unit is None
+            else field.modbus_block._replace(unit=unit)
+            for field in fields
+        )
+        self._modbus_decoders = tuple(field.modbus_decoder for field in fields)
+        return {
+            MODBUS_REGISTERS: self._modbus_blocks,
+            MODBUS_POLL_INTERVAL: description.poll_interval,  # type: ignore[reportAccessAttributeIssue]
+            MODBUS_DECODER: self._modbus_decoders,
+        }
+
+    def _get_modbus_values(self) -> tuple[Any, ...] | None:
+        """Return the decoded values of all fields from the coordinator data.
+
+        Returns None when not all registers are available.
+        """
+        if not (data := self.coordinator.data):
+            return None
+        values = tuple(
+            data.decode(block, decoder)
+            for block, decoder in zip(
+                self._modbus_blocks, self._modbus_decoders, strict=True
+            )
+        )
+        if any(value is None for value in values):
+            return None
+        return values
+
+
+async def async_add_modbus_entities(
+    coordinator: BaseModbusUpdateCoordinator,
+    async_add_entities: AddEntitiesCallback,
+    entities: Iterable[BaseModbusEntity],
+) -> None:
+    """Add Modbus entities after reading all their registers at once.
+
+    Use this instead of adding the entities with update_before_add, which
+    refreshes the coordinator once per entity. The registers of all entities
+    are registered with the coordinator first, so that a single refresh reads
+    them with one read plan. The entities are then added with their values.
+    When that refresh fails, they are added as unavailable and are updated by
+    the next refresh. An entity which fails to take its value is added
+    without it, and doesn't affect the other entities.
+    """
+    entities = list(entities)
+    remove_listeners: list[CALLBACK_TYPE] = []
+    try:
+        for entity in entities:
+            remove_listeners.append(
+                coordinator.async_add_listener(
+                    _initial_update_callback(entity), entity.coordinator_context
+                )
+            )
+        await coordinator.async_refresh()
+    finally:
+        for remove_listener in remove_listeners:
+            remove_listener()
+
+    async_add_entities(entities)
+
+
+def _initial_update_callback(entity: BaseModbusEntity) -> CALLBACK_TYPE:
+    """Return a callback updating the attributes of an entity before it is added."""
+
+    @callback
+    def _update_attrs() -> None:
+        try:
+            entity._async_update_attrs()
+        except Exception:
+            _LOGGER.exception(
+                "Error updating the initial value of %s", entity.entity_description.key
+            )
+
+    return _update_attrs
@@ -3,18 +3,68 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Iterable
+from collections.abc import AsyncIterator, Iterable, Iterator, Mapping, Sequence
+from contextlib import asynccontextmanager
+import dataclasses
 import logging
+import struct
 import time
+from typing import Any
 
 from pymodbus.client.base import ModbusBaseClient
+from pymodbus.exceptions import ModbusException, ModbusIOException
+from pymodbus.pdu import ExceptionResponse
 
 from homeassistant.core import HomeAssistant
 
+from .const import (
+    DEFAULT_MAX_BIT_READ_COUNT,
+    DEFAULT_MAX_READ_COUNT,
+    DEFAULT_MAX_WRITE_COUNT,
+    DEFAULT_READ_CACHE_TTL,
+    DEFAULT_REGISTER_COST,
+    DEFAULT_REQUEST_COST,
+    DEFAULT_UNIT_ID,
+    PROTOCOL_MAX_BIT_READ_COUNT,
+    PROTOCOL_MAX_READ_COUNT,
+    ModbusTable,
+)
+from .pacing import AdaptivePacing
+from .planner import (
+    ExcludedRanges,
+    ReadBatch,
+    ReadCostModel,
+    ReadPlan,
+    RegisterBlock,
+    RegisterKey,
+    compile_read_plan,
+)
+from .profile import DeviceProfile
+from .rtu import SerialLine
+from .snapshot import RegisterSnapshot, SnapshotLayer
+from .stats import ModbusHubStats
+from .trace import ModbusTrace, RecordingModbusClient
+
 _LOGGER = logging.getLogger(__name__)
 
-MAX_BATCHED_REGISTERS_COUNT = 64
-MAX_BATCHED_REGISTERS_GAP = 1
+_READ_METHODS = {
+    ModbusTable.COIL: "read_coils",
+    ModbusTable.DISCRETE_INPUT: "read_discrete_inputs",
+    ModbusTable.HOLDING_REGISTER: "read_holding_registers",
+    ModbusTable.INPUT_REGISTER: "read_input_registers",
+}
+
+_MAX_UNANSWERED_TIMEOUTS = 2
+"""Timeouts after which a read which got no response at all is aborted."""
+
+_WRITE_METHODS = {
+    # table: (single write, multiple write)
+    ModbusTable.COIL: ("write_coil", "write_coils"),
+    ModbusTable.HOLDING_REGISTER: ("write_register", "write_registers"),
+}
+
+type _PendingWrites = dict[int, tuple[int | bool, asyncio.Future[None], range]]
+"""Value, completion and addresses of the queued writes of a table, keyed by address."""
 
 
 class ModbusHub:
@@ -30,26 +80,234 @@ class ModbusHub:
         hass: HomeAssistant,
         client: ModbusBaseClient,
         _msg_wait: float | None = None,
+        *,
+        request_cost: float = DEFAULT_REQUEST_COST,
+        register_cost: float = DEFAULT_REGISTER_COST,
+        max_read_count: int = DEFAULT_MAX_READ_COUNT,
+        max_bit_read_count: int = DEFAULT_MAX_BIT_READ_COUNT,
+        excluded_ranges: Mapping[tuple[int, ModbusTable], Iterable[range]]
+        | None = None,
+        pipeline_window: int = 1,
+        max_write_count: int = DEFAULT_MAX_WRITE_COUNT,
+        pacing: AdaptivePacing | None = None,
+        read_cache_ttl: float = DEFAULT_READ_CACHE_TTL,
     ) -> None:
-        """Initialize the Modbus hub."""
+        """Initialize the Modbus hub.
+
+        request_cost, register_cost, max_read_count and max_bit_read_count
+        describe how expensive reads are on this connection and are used to plan
+        batches. The maximum read sizes probed or restored from a profile only
+        apply to their unit, as units sharing a hub may accept different sizes.
+        Registers in excluded_ranges, keyed by (unit, table), are never
+        read, and batches never span them.
+
+        When pipeline_window is larger than 1, up to that many read requests are
+        sent without waiting for the previous responses. This only helps with
+        a client which supports several outstanding requests, such as
+        PipelinedModbusTcpClient, and a device which accepts them.
+
+        Writes are queued and performed as soon as possible: when a poll is
+        running, they are performed before its next read request, once the
+        pipelined requests in flight are answered. Queued writes to adjacent
+        addresses are combined into requests of up to max_write_count
+        registers or coils. Set it to 1 to disable this.
+
+        With pacing, the wait between requests is adapted to the latency,
+        timeouts and busy responses of the device instead of using the fixed
+        _msg_wait.
+
+        The values read by every read plan are kept for read_cache_ttl seconds,
+        to answer the ad-hoc reads of read() without a request.
+        """
 
         # generic configuration
         self._client = client
         self._msg_wait = _msg_wait
+        self.pacing = pacing
+        self.stats = ModbusHubStats()
+
+        register_cost_model = ReadCostModel(request_cost, register_cost, max_read_count)
+        # 16 coils or discrete inputs are packed in the space of one register
+        bit_cost_model = ReadCostModel(
+            request_cost, register_cost / 16, max_bit_read_count
+        )
+        self.read_cost_models: dict[ModbusTable, ReadCostModel] = {
+            table: bit_cost_model if table.is_bit_table else register_cost_model
+            for table in ModbusTable
+        }
+        self.unit_read_cost_models: dict[tuple[int, ModbusTable], ReadCostModel] = {}
+        """Cost models of the units with a different maximum read size."""
+        self.excluded_ranges: dict[tuple[int, ModbusTable], ExcludedRanges] = {
+            key: ExcludedRanges(ranges)
+            for key, ranges in (excluded_ranges or {}).items()
+        }
+        self.read_plan_version = 0
+        """Incremented whenever previously compiled read plans are outdated."""
+        self._pipeline_window = pipeline_window
+        self._max_write_count = max_write_count
+        self._pending_writes: dict[tuple[int, ModbusTable], _PendingWrites] = {}
+        self._write_task: asyncio.Task[None] | None = None
+        self._read_cache_ttl = read_cache_ttl
+        self._pacing_restored = False
+        # newest first, with the time at which they were read
+        self._cached_layers: list[tuple[float, SnapshotLayer]] = []
+        # the number of write requests performed, and the last one of every
+        # register written, to know which reads may hold older values
+        self._write_generation = 0
+        self._written_at: dict[RegisterKey, int] = {}
+        self._reads_in_flight: list[tuple[ReadPlan, asyncio.Future[None]]] = []
         self._lock = asyncio.Lock()
         self.hass = hass
 
+    @classmethod
+    def for_serial_line(
+        cls,
+        hass: HomeAssistant,
+        client: ModbusBaseClient,
+        line: SerialLine,
+        **kwargs: Any,
+    ) -> ModbusHub:
+        """Create a hub for a Modbus RTU client on a serial line.
+
+        The read plans and the wait between requests are derived from the
+        timing of the line, unless given in kwargs. With pacing, its min_wait
+        should be at least line.frame_gap.
+        """
+        return cls(hass, client, **(line.hub_options() | kwargs))
+
+    @asynccontextmanager
+    async def _acquire_lock(self) -> AsyncIterator[None]:
+        """Hold the lock, and record the time waited for it."""
+        started_at = time.monotonic()
+        async with self._lock:
+            self.stats.lock_wait.record(time.monotonic() - started_at)
+            yield
+
+    def close(self) -> None:
+        """Close the connection, failing the writes which were not performed yet."""
+        if self._write_task is not None:
+            self._write_task.cancel()
+            self._write_task = None
+        pending_writes, self._pending_writes = self._pending_writes, {}
+        _set_results(
+            (
+                future
+                for writes in pending_writes.values()
+                for _, future, _ in writes.values()
+            ),
+            ModbusException("Connection closed"),
+        )
+        self._client.close()
+
+    def start_capture(self) -> ModbusTrace:
+        """Start recording every request and response into a trace.
+
+        The trace grows until stop_capture is called. Save it with
+        ModbusTrace.save, and replay it with ReplayModbusClient.
+        """
+        if isinstance(self._client, RecordingModbusClient):
+            return self._client.trace
+        trace = ModbusTrace()
+        self._client = RecordingModbusClient(self._client, trace)  # type: ignore[assignment]
+        return trace
+
+    def stop_capture(self) -> ModbusTrace | None:
+        """Stop recording, and return the trace recorded since start_capture."""
+        if not isinstance(recorder := self._client, RecordingModbusClient):
+            return None
+        self._client = recorder.client
+        return recorder.trace
+
+    def export_profile(self, unit: int = DEFAULT_UNIT_ID) -> DeviceProfile:
+        """Return what was learned about the device with the given unit ID."""
+        return DeviceProfile(
+            max_read_count=self.read_cost_model(
+                unit, ModbusTable.HOLDING_REGISTER
+            ).max_count,
+            max_bit_read_count=self.read_cost_model(unit, ModbusTable.COIL).max_count,
+            excluded_ranges={
+                table: list(ranges)
+                for (excluded_unit, table), ranges in self.excluded_ranges.items()
+                if excluded_unit == unit and ranges
+            },
+            pacing_wait=self.pacing.wait if self.pacing else None,
+            pacing_latency=self.pacing.latency if self.pacing else None,
+        )
+
+    def apply_profile(
+        self, profile: DeviceProfile, unit: int = DEFAULT_UNIT_ID
+    ) -> None:
+        """Reuse what was learned about the device with the given unit ID.
+
+        This must be done before the first poll, so that it already uses a
+        read plan without the illegal addresses of the device.
+
+        The pacing is shared by all units of the hub: when the profiles of
+        several units are applied, the longest wait between requests is kept.
+        """
+        if profile.max_read_count is not None:
+            self._set_max_read_count(unit, False, profile.max_read_count)
+        if profile.max_bit_read_count is not None:
+            self._set_max_read_count(unit, True, profile.max_bit_read_count)
+        for table, ranges in profile.excluded_ranges.items():
+            excluded = self.excluded_ranges.get((unit, table))
+            self.excluded_ranges[unit, table] = ExcludedRanges(
+                [*(excluded or ()), *ranges]
+            )
+        if (
+            self.pacing
+            and profile.pacing_wait is not None
+            and (not self._pacing_restored or profile.pacing_wait > self.pacing.wait)
+        ):
+            self._pacing_restored = True
+            self.pacing.restore(profile.pacing_wait, profile.pacing_latency)
+        self.read_plan_version += 1
+
+    def read_cost_model(self, unit: int, table: ModbusTable) -> ReadCostModel:
+        """Return the cost model used to plan reads of a table of a unit."""
+        return self.unit_read_cost_models.get(
+            (unit, table), self.read_cost_models[table]
+        )
+
+    def _set_max_read_count(self, unit: int, bit_table: bool, max_count: int) -> None:
+        """Set the maximum read size of the tables of a unit holding bits or not."""
+        for table in ModbusTable:
+            if table.is_bit_table == bit_table:
+                self.unit_read_cost_models[unit, table] = dataclasses.replace(
+                    self.read_cost_models[table], max_count=max_count
+                )
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        """Return the configuration and statistics of the hub."""
+        return {
+            "excluded_ranges": {
+                f"{unit}/{table}": [str(excluded) for excluded in ranges]
+                for (unit, table), ranges in self.excluded_ranges.items()
+            },
+            "pipeline_window": self._pipeline_window,
+            "pacing": {
+                "wait": self.pacing.wait,
+                "latency": self.pacing.latency,
+                "responses": self.pacing.responses,
+                "congestions": self.pacing.congestions,
+            }
+            if self.pacing
+            else None,
+            "stats": self.stats.as_dict(),
+        }
+
     async def connect(self) -> bool:
         """Connect client."""
-        async with self._lock:
+        async with self._acquire_lock():
             return await self._client.connect()
 
     async def cooldown_between_modbus_calls(self) -> None:
         """Cooldown between Modbus calls."""
-        if self._msg_wait is not None and self.__last_call_finished_at is not None:
+        msg_wait = self.pacing.wait if self.pacing else self._msg_wait
+        if msg_wait is not None and self.__last_call_finished_at is not None:
             cooldown_time_needed = (
-                self.__last_call_finished_at + self._msg_wait
-            ) - time.time()
+                self.__last_call_finished_at + msg_wait
+            ) - time.monotonic()
 
             if cooldown_time_needed > 0:
                 _LOGGER.debug(
@@ -57,83 +315,818 @@ class ModbusHub:
                     cooldown_time_needed,
                 )
                 await asyncio.sleep(cooldown_time_needed)
+                self.stats.cooldown.record(cooldown_time_needed)
 
     async def batch_read(
         self,
         registers: Iterable[int],
-        slave: int = 1,
-    ) -> dict[int, int]:
-        """Read multiple registers."""
+        slave: int = DEFAULT_UNIT_ID,
+        table: ModbusTable = ModbusTable.HOLDING_REGISTER,
+    ) -> dict[int, Any]:
+        """Read multiple registers from a single table of a single unit."""
+        result = await self.execute_read_plan(
+            self.compile_read_plan(
+                RegisterBlock(slave, table, range(register, register + 1))
+                for register in registers
+            )
+        )
+        return {address: value for (_, _, address), value in result.items()}
 
-        sorted_registers = sorted(registers)
+    def compile_read_plan(self, blocks: Iterable[RegisterBlock]) -> ReadPlan:
+        """Compile the cheapest read plan for the register blocks on this hub."""
+        return compile_read_plan(
+            blocks,
+            self.read_cost_models,
+            self.excluded_ranges,
+            self.unit_read_cost_models,
+        )
 
-        async with self._lock:
-            if not self._client:
-                return {}
+    async def execute_read_plan(self, plan: ReadPlan) -> RegisterSnapshot:
+        """Read all registers covered by a precompiled read plan.
 
-            result = {}
+        The batches of all units are performed in a single pass. The values are
+        returned as a snapshot keyed by (unit, table, address), with coils and
+        discrete inputs as booleans and registers as integers.
 
-            batch_first_idx = 0
-            batch_last_idx = 0
+        Every read request takes the lock on its own, in order: when several
+        coordinators share this hub, their read plans are interleaved request
+        by request instead of one plan delaying the others. Pipelined reads
+        hold the lock for the whole plan.
 
-            while batch_first_idx < len(sorted_registers):
-                # Batch together registers:
-                while (
-                    batch_last_idx + 1 < len(sorted_registers)
-                    and
-                    # as long as the total amount of registers doesn't exceed MAX_BATCHED_REGISTERS_COUNT
-                    (
-                        sorted_registers[batch_last_idx + 1]
-                        - sorted_registers[batch_first_idx]
-                        < MAX_BATCHED_REGISTERS_COUNT
+        A batch which fails does not affect the other batches. When a batch
+        fails because it contains an illegal address, it is bisected to find
+        the illegal addresses, which are excluded from later read plans. The
+        returned snapshot then uses an adjusted plan with the parts of the
+        batch which could be read.
+
+        The values are kept in the read cache, and ad-hoc reads of registers
+        in the plan wait for it instead of sending requests of their own.
+        """
+
+        if not self._client:
+            return RegisterSnapshot()
+
+        in_flight = (plan, asyncio.get_running_loop().create_future())
+        self._reads_in_flight.append(in_flight)
+        write_generation = self._write_generation
+        try:
+            layer = await self._execute_read_plan(plan)
+        finally:
+            self._reads_in_flight.remove(in_flight)
+            in_flight[1].set_result(None)
+
+        self._cache_layer(layer, write_generation)
+        return RegisterSnapshot([layer])
+
+    async def _execute_read_plan(self, plan: ReadPlan) -> SnapshotLayer:
+        """Read all registers covered by a read plan, see execute_read_plan."""
+        buffers: list[bytearray | None] = [None] * len(plan.batches)
+
+        illegal_batches: list[int] = []
+        idx = 0
+        async for batch, response in self._read_batches(plan.batches):
+            if response is None:
+                # no response: like after an error, the batch has no buffer
+                idx += 1
+                continue
+            if not response.isError():
+                if (buffer := _to_buffer(batch, response)) is None:
+                    _LOGGER.error(
+                        "Short response while reading %s %d with count %d from unit %d: %s",
+                        batch.table,
+                        batch.address,
+                        batch.count,
+                        batch.unit,
+                        response,
                     )
-                    and
-                    # as long as the gap between registers is not more than MAX_BATCHED_REGISTERS_GAP
-                    (
-                        sorted_registers[batch_last_idx + 1]
-                        - sorted_registers[batch_last_idx]
-                        <= MAX_BATCHED_REGISTERS_GAP
+                buffers[idx] = buffer
+            elif response.exception_code == ExceptionResponse.ILLEGAL_ADDRESS:
+                illegal_batches.append(idx)
+            else:
+                _LOGGER.error(
+                    "Read error while reading %s %d with count %d from unit %d: %s",
+                    batch.table,
+                    batch.address,
+                    batch.count,
+                    batch.unit,
+                    response,
+                )
+            idx += 1
+
+        if illegal_batches:
+            async with self._acquire_lock():
+                plan, buffers = await self._isolate_illegal_addresses(
+                    plan, buffers, illegal_batches
+                )
+
+        return SnapshotLayer(plan, buffers)
+
+    async def read_plan_into(
+        self, plan: ReadPlan, buffers: Sequence[bytearray]
+    ) -> bool:
+        """Read all registers of a read plan into preallocated buffers.
+
+        This is meant for high-frequency sampling. buffers holds one buffer per
+        batch of the plan, with the size of its raw values, which is
+        overwritten in place. No snapshot is created, the values are not added
+        to the read cache, and failed batches are not bisected.
+
+        Returns whether all batches were read. The buffers of the batches which
+        failed keep their previous content.
+        """
+        if not self._client:
+            return False
+
+        complete = True
+        idx = 0
+        async for batch, response in self._read_batches(plan.batches):
+            if (
+                response is None
+                or response.isError()
+                or not _fill_buffer(batch, response, buffers[idx])
+            ):
+                complete = False
+            idx += 1
+        return complete
+
+    async def read(
+        self,
+        unit: int,
+        table: ModbusTable,
+        address: int,
+        count: int = 1,
+        *,
+        max_age: float | None = None,
+    ) -> list[int | bool]:
+        """Read consecutive values, from the read cache when possible.
+
+        Values read at most max_age seconds ago, by a poll or by another call,
+        are returned without a request. max_age defaults to, and is limited by,
+        the read_cache_ttl of the hub. When a read in progress includes some of
+        the missing registers, its result is awaited instead of sending
+        another request, so concurrent callers share a single request.
+
+        Raises ModbusException when some registers can't be read.
+        """
+        keys = [(unit, table, address) for address in range(address, address + count)]
+
+        cached = self._cached_snapshot(max_age)
+        missing = [key for key in keys if key not in cached]
+        if not missing:
+            self.stats.cache_hits += 1
+            return [cached[key] for key in keys]
+
+        if waiting := [
+            future
+            for plan, future in self._reads_in_flight
+            if any(key in plan.register_index for key in missing)
+        ]:
+            self.stats.shared_reads += 1
+            await asyncio.wait(waiting)
+            cached = self._cached_snapshot(max_age)
+            missing = [key for key in keys if key not in cached]
+            if not missing:
+                return [cached[key] for key in keys]
+
+        self.stats.cache_misses += 1
+        known = {key: cached[key] for key in keys if key in cached}
+        addresses = [key[2] for key in missing]
+        snapshot = await self.execute_read_plan(
+            self.compile_read_plan(
+                [RegisterBlock(unit, table, range(min(addresses), max(addresses) + 1))]
+            )
+        )
+        if any(key not in snapshot for key in missing):
+            raise ModbusException(
+                f"Could not read {count} {table} values at {address} from unit {unit}"
+            )
+        return [snapshot[key] if key in snapshot else known[key] for key in keys]
+
+    def _cache_layer(self, layer: SnapshotLayer, write_generation: int) -> None:
+        """Add the values of a read plan to the read cache.
+
+        write_generation is the number of writes performed when the read
+        started. Writes are performed between the requests of a read, so a
+        layer including registers written since may hold their previous
+        values: it is not cached.
+
+        When all batches were read, older layers of the same plan are dropped,
+        as the new layer shadows all their values.
+        """
+        now = time.monotonic()
+        self._prune_cache(now)
+        if self._read_cache_ttl <= 0:
+            return
+        register_index = layer.plan.register_index
+        if any(
+            written_at > write_generation and key in register_index
+            for key, written_at in self._written_at.items()
+        ):
+            return
+        if all(buffer is not None for buffer in layer.buffers):
+            self._cached_layers = [
+                (read_at, cached)
+                for read_at, cached in self._cached_layers
+                if cached.plan is not layer.plan
+            ]
+        self._cached_layers.insert(0, (now, layer))
+
+    def _prune_cache(self, now: float) -> None:
+        """Drop the cached layers which expired."""
+        self._cached_layers = [
+            (read_at, layer)
+            for read_at, layer in self._cached_layers
+            if now - read_at <= self._read_cache_ttl
+        ]
+
+    def _cached_snapshot(self, max_age: float | None) -> RegisterSnapshot:
+        """Return a snapshot of the cached values read at most max_age ago."""
+        now = time.monotonic()
+        self._prune_cache(now)
+        if max_age is None:
+            max_age = self._read_cache_ttl
+        return RegisterSnapshot(
+            [
+                layer
+                for read_at, layer in self._cached_layers
+                if now - read_at <= max_age
+            ]
+        )
+
+    def _invalidate_cache(
+        self, unit: int, table: ModbusTable, addresses: Iterable[int]
+    ) -> None:
+        """Drop the cached values of registers which were written."""
+        keys = [(unit, table, address) for address in addresses]
+        self._cached_layers = [
+            (read_at, layer)
+            for read_at, layer in self._cached_layers
+            if not any(key in layer.plan.register_index for key in keys)
+        ]
+
+    async def _isolate_illegal_addresses(
+        self,
+        plan: ReadPlan,
+        buffers: list[bytearray | None],
+        illegal_batches: Iterable[int],
+    ) -> tuple[ReadPlan, list[bytearray | None]]:
+        """Read the legal parts of batches which failed with an illegal address.
+
+        Returns the plan with the failed batches replaced by their legal parts,
+        and the buffers for that plan. The lock must be held by the caller.
+        """
+        replacements: dict[int, list[ReadBatch]] = {}
+        part_buffers: dict[int, list[bytearray]] = {}
+        for idx in illegal_batches:
+            batch = plan.batches[idx]
+            illegal_addresses: list[int] = []
+            try:
+                parts = await self._bisect_illegal_addresses(batch, illegal_addresses)
+            finally:
+                # keep what was found, even when the bisection was aborted, so
+                # that it doesn't start over on the next poll
+                if illegal_addresses:
+                    self._exclude_addresses(batch.unit, batch.table, illegal_addresses)
+            replacements[idx] = [part for part, _ in parts]
+            part_buffers[idx] = [buffer for _, buffer in parts]
+
+        new_buffers: list[bytearray | None] = []
+        for idx, buffer in enumerate(buffers):
+            new_buffers.extend(part_buffers.get(idx, (buffer,)))
+        return plan.replace_batches(replacements), new_buffers
+
+    async def _bisect_illegal_addresses(
+        self, batch: ReadBatch, illegal_addresses: list[int]
+    ) -> list[tuple[ReadBatch, bytearray]]:
+        """Find the illegal addresses in a batch by reading both halves.
+
+        Returns the parts which could be read with their buffers. The illegal
+        addresses are added to illegal_addresses as soon as they are found.
+        Parts which fail otherwise, get no response or a short response, are
+        left out.
+        """
+        if batch.count == 1:
+            illegal_addresses.append(batch.address)
+            return []
+
+        parts: list[tuple[ReadBatch, bytearray]] = []
+        half = batch.count // 2
+        for part in (
+            ReadBatch(batch.unit, batch.table, batch.address, half),
+            ReadBatch(
+                batch.unit, batch.table, batch.address + half, batch.count - half
+            ),
+        ):
+            await self.cooldown_between_modbus_calls()
+            try:
+                response = await self._read(part)
+            except ModbusIOException as err:
+                response = err
+            finally:
+                self.__last_call_finished_at = time.monotonic()
+
+            if isinstance(response, ModbusIOException) or (
+                response.isError()
+                and response.exception_code != ExceptionResponse.ILLEGAL_ADDRESS
+            ):
+                _LOGGER.debug(
+                    "Read error while reading %s %d with count %d from unit %d: %s",
+                    part.table,
+                    part.address,
+                    part.count,
+                    part.unit,
+                    response,
+                )
+            elif response.isError():
+                parts.extend(
+                    await self._bisect_illegal_addresses(part, illegal_addresses)
+                )
+            elif (buffer := _to_buffer(part, response)) is not None:
+                parts.append((part, buffer))
+            else:
+                _LOGGER.debug(
+                    "Short response while reading %s %d with count %d from unit %d: %s",
+                    part.table,
+                    part.address,
+                    part.count,
+                    part.unit,
+                    response,
+                )
+        return parts
+
+    async def probe_max_read_count(
+        self,
+        address: int,
+        *,
+        unit: int = DEFAULT_UNIT_ID,
+        table: ModbusTable = ModbusTable.HOLDING_REGISTER,
+        limit: int | None = None,
+    ) -> int:
+        """Find the largest read request the device accepts, and use it from now on.
+
+        Registers from address up to address + limit must all be readable:
+        every failing read is taken to mean that the request was too large.
+        Starting from the current maximum, the size is doubled until a read
+        fails or limit is reached, after which the largest accepted size is
+        found by bisection. limit defaults to the protocol maximum.
+
+        The result becomes the maximum read size of all tables of the unit
+        holding the same kind of values, and is included in its profile.
+        """
+        if limit is None:
+            limit = (
+                PROTOCOL_MAX_BIT_READ_COUNT
+                if table.is_bit_table
+                else PROTOCOL_MAX_READ_COUNT
+            )
+        cost_model = self.read_cost_model(unit, table)
+
+        async with self._acquire_lock():
+            accepted = 0
+            rejected = limit + 1
+            count = min(cost_model.max_count, limit)
+            while rejected - accepted > 1:
+                if await self._probe_read(ReadBatch(unit, table, address, count)):
+                    accepted = count
+                    # grow until the first rejection, then bisect
+                    count = (
+                        min(count * 2, limit)
+                        if rejected > limit
+                        else (accepted + rejected) // 2
                     )
-                ):
-                    batch_last_idx += 1
+                else:
+                    rejected = count
+                    count = (accepted + rejected) // 2
+                if count in (accepted, rejected):
+                    break
+
+        if not accepted:
+            raise ModbusException(
+                f"Could not read {table} {address} from unit {unit} while probing"
+            )
+
+        _LOGGER.info(
+            "Unit %d accepts reads of up to %d %s values", unit, accepted, table
+        )
+        self._set_max_read_count(unit, table.is_bit_table, accepted)
+        self.read_plan_version += 1
+        return accepted
+
+    async def _probe_read(self, batch: ReadBatch) -> bool:
+        """Return whether a read of the batch succeeds with all its values."""
+        await self.cooldown_between_modbus_calls()
+        try:
+            response = await self._read(batch)
+        except ModbusIOException:
+            return False
+        finally:
+            self.__last_call_finished_at = time.monotonic()
+
+        if response.isError():
+            return False
+        values = response.bits if batch.table.is_bit_table else response.registers
+        return len(values) >= batch.count
+
+    def _exclude_addresses(
+        self, unit: int, table: ModbusTable, addresses: Iterable[int]
+    ) -> None:
+        """Exclude addresses from all read plans compiled from now on."""
+        new_ranges = [range(address, address + 1) for address in addresses]
+        excluded = self.excluded_ranges.get((unit, table))
+        self.excluded_ranges[unit, table] = ExcludedRanges(
+            [*(excluded or ()), *new_ranges]
+        )
+        self.read_plan_version += 1
+        _LOGGER.warning(
+            "%s addresses %s of unit %d are illegal and will not be read anymore",
+            table,
+            ", ".join(str(r) for r in ExcludedRanges(new_ranges)),
+            unit,
+        )
+
+    async def _read_batches(
+        self, batches: Sequence[ReadBatch]
+    ) -> AsyncIterator[tuple[ReadBatch, Any | None]]:
+        """Read batches, and yield every batch with its response.
+
+        A batch which got no response is yielded with None, like a batch with
+        an error response only affects its own registers. When no batch got
+        a response, the device is most likely unreachable: the read is
+        aborted after _MAX_UNANSWERED_TIMEOUTS timeouts, and the last
+        ModbusIOException is raised.
+        """
+        if self._pipeline_window > 1:
+            async with self._acquire_lock():
+                responses = await self._read_pipelined(batches)
+        else:
+            responses = self._read_serially(batches)
+
+        timeout: ModbusIOException | None = None
+        timeouts = 0
+        answered = False
+        async for batch, response in responses:
+            if not isinstance(response, ModbusIOException):
+                answered = True
+                yield batch, response
+                continue
+
+            timeout = response
+            timeouts += 1
+            if not answered and timeouts >= _MAX_UNANSWERED_TIMEOUTS:
+                raise timeout
+            _LOGGER.debug(
+                "No response while reading %s %d with count %d from unit %d: %s",
+                batch.table,
+                batch.address,
+                batch.count,
+                batch.unit,
+                timeout,
+            )
+            yield batch, None
+
+        if timeout is not None and not answered:
+            raise timeout
+
+    async def _read_serially(
+        self, batches: Iterable[ReadBatch]
+    ) -> AsyncIterator[tuple[ReadBatch, Any]]:
+        """Read batches one after the other, waiting for every response.
+
+        Timeouts are yielded as the ModbusIOException instead of a response.
+        """
+        for batch in batches:
+            async with self._acquire_lock():
+                await self._perform_writes()
+                await self.cooldown_between_modbus_calls()
+                try:
+                    response = await self._read(batch)
+                except ModbusIOException as err:
+                    response = err
+                finally:
+                    self.__last_call_finished_at = time.monotonic()
+            yield batch, response
+
+    async def _read_pipelined(
+        self, batches: Sequence[ReadBatch]
+    ) -> AsyncIterator[tuple[ReadBatch, Any]]:
+        """Read batches with up to pipeline_window requests in flight.
+
+        The cooldown is only applied before the first request: the device is
+        expected to queue the requests itself. Queued writes are performed
+        once the requests in flight are answered, and before any other request
+        is sent, so that no response can hold values from before a write.
+        Timeouts are returned as the ModbusIOException instead of a response.
+        """
+        window = asyncio.Semaphore(self._pipeline_window)
+        writing = asyncio.Lock()
+        idle = asyncio.Event()
+        idle.set()
+        in_flight = 0
+
+        async def read(batch: ReadBatch) -> Any:
+            nonlocal in_flight
+            async with window:
+                if self._pending_writes or writing.locked():
+                    async with writing:
+                        await idle.wait()
+                        await self._perform_writes()
+                in_flight += 1
+                idle.clear()
+                try:
+                    return await self._read(batch)
+                finally:
+                    in_flight -= 1
+                    if not in_flight:
+                        idle.set()
+
+        await self.cooldown_between_modbus_calls()
+        responses = await asyncio.gather(
+            *(read(batch) for batch in batches), return_exceptions=True
+        )
+        self.__last_call_finished_at = time.monotonic()
+
+        for response in responses:
+            if isinstance(response, BaseException) and not isinstance(
+                response, ModbusIOException
+            ):
+                raise response
+
+        return _iterate(zip(batches, responses, strict=True))
+
+    async def _read(self, batch: ReadBatch) -> Any:
+        """Perform a single read request for a batch."""
+        self.stats.read_requests += 1
+        self.stats.registers_read += batch.count
+        return await self._request(
+            _READ_METHODS[batch.table],
+            batch.address,
+            count=batch.count,
+            slave=batch.unit,
+        )
+
+    async def _request(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        """Perform a request with the client, and record its outcome."""
+        started_at = time.monotonic()
+        try:
+            response = await getattr(self._client, method)(*args, **kwargs)
+        except ModbusIOException:
+            self.stats.timeouts += 1
+            if self.pacing:
+                self.pacing.record_congestion()
+            raise
 
-                registers_count = (
-                    sorted_registers[batch_last_idx]
-                    - sorted_registers[batch_first_idx]
-                    + 1
+        if response is not None and response.isError():
+            self.stats.error_responses += 1
+            if (
+                self.pacing
+                and getattr(response, "exception_code", None)
+                == ExceptionResponse.SLAVE_BUSY
+            ):
+                self.pacing.record_congestion()
+                return response
+
+        latency = time.monotonic() - started_at
+        if method in _READ_METHODS.values():
+            self.stats.read_latency.record(latency)
+        if self.pacing:
+            self.pacing.record_response(latency)
+        return response
+
+    async def write_register(
+        self, register: int, value: int, slave: int = DEFAULT_UNIT_ID
+    ) -> float:
+        """Write a single register.
+
+        Returns the time in seconds between queueing the write and its completion.
+        """
+        return await self.write(slave, ModbusTable.HOLDING_REGISTER, register, [value])
+
+    async def write_registers(
+        self, address: int, values: Sequence[int], slave: int = DEFAULT_UNIT_ID
+    ) -> float:
+        """Write consecutive registers.
+
+        Returns the time in seconds between queueing the write and its completion.
+        """
+        return await self.write(slave, ModbusTable.HOLDING_REGISTER, address, values)
+
+    async def write_coil(
+        self, address: int, value: bool, slave: int = DEFAULT_UNIT_ID
+    ) -> float:
+        """Write a single coil.
+
+        Returns the time in seconds between queueing the write and its completion.
+        """
+        return await self.write(slave, ModbusTable.COIL, address, [value])
+
+    async def write(
+        self,
+        unit: int,
+        table: ModbusTable,
+        address: int,
+        values: Sequence[int | bool],
+    ) -> float:
+        """Queue a write of consecutive values and wait for its completion.
+
+        A queued write which was not performed yet is superseded by a newer
+        write including all its addresses: only the newest values are written,
+        and both callers wait for that write. A write which only overlaps a
+        part of a queued write is rejected with ValueError, as it would combine
+        the values of both writes, for instance in a 32-bit value.
+
+        Returns the time in seconds between queueing the write and its completion.
+        """
+        if table not in _WRITE_METHODS:
+            raise ValueError(f"Cannot write to {table}")
+
+        queued_at = time.monotonic()
+        addresses = range(address, address + len(values))
+        pending = self._pending_writes.get((unit, table), {})
+        if any(
+            (queued := pending.get(queued_address)) is not None
+            and (queued[2].start < addresses.start or queued[2].stop > addresses.stop)
+            for queued_address in addresses
+        ):
+            raise ValueError(
+                f"Write of {len(values)} {table} values at {address} to unit {unit}"
+                " partially overlaps a queued write"
+            )
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending_writes.setdefault((unit, table), pending)
+        futures: list[asyncio.Future[None]] = []
+        for offset, value in enumerate(values):
+            if (queued := pending.get(address + offset)) is not None:
+                future = queued[1]
+            else:
+                future = loop.create_future()
+            pending[address + offset] = (value, future, addresses)
+            futures.append(future)
+
+        # the writes are performed by a running poll, or by this task as soon
+        # as the connection is free
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._perform_writes_when_idle())
+
+        # the futures are shared with the callers of superseding writes, which
+        # must not be cancelled when this caller is
+        await asyncio.shield(asyncio.gather(*futures))
+        latency = time.monotonic() - queued_at
+        self.stats.write_latency.record(latency)
+        _LOGGER.debug(
+            "Wrote %d %s values at %d to unit %d in %.3f seconds",
+            len(values),
+            table,
+            address,
+            unit,
+            latency,
+        )
+        return latency
+
+    async def _perform_writes_when_idle(self) -> None:
+        """Perform the queued writes once no other call is in progress."""
+        async with self._acquire_lock():
+            await self._perform_writes()
+
+    async def _perform_writes(self) -> None:
+        """Perform all queued writes. The lock must be held by the caller."""
+        while self._pending_writes:
+            pending_writes, self._pending_writes = self._pending_writes, {}
+            try:
+                await self._perform_pending_writes(pending_writes)
+            finally:
+                # don't leave callers waiting when interrupted
+                _set_results(
+                    (
+                        future
+                        for writes in pending_writes.values()
+                        for _, future, _ in writes.values()
+                    ),
+                    ModbusException("Write was interrupted"),
                 )
 
+    async def _perform_pending_writes(
+        self, pending_writes: dict[tuple[int, ModbusTable], _PendingWrites]
+    ) -> None:
+        """Perform writes, combining the writes to adjacent addresses."""
+        for (unit, table), writes in pending_writes.items():
+            for address, values, futures in _coalesce_writes(
+                writes, self._max_write_count
+            ):
                 await self.cooldown_between_modbus_calls()
-                response = await self._client.read_holding_registers(
-                    sorted_registers[batch_first_idx],
-                    count=registers_count,
-                    slave=slave,
+                self._write_generation += 1
+                for written in range(address, address + len(values)):
+                    self._written_at[unit, table, written] = self._write_generation
+                self._invalidate_cache(
+                    unit, table, range(address, address + len(values))
                 )
-                self.__last_call_finished_at = time.time()
+                try:
+                    response = await self._write(unit, table, address, values)
+                except Exception as err:  # noqa: BLE001
+                    # the error is raised to the callers waiting for the write
+                    _set_results(futures, err)
+                else:
+                    if response is not None and response.isError():
+                        _set_results(
+                            futures,
+                            ModbusException(
+                                f"Could not write {len(values)} {table} values at {address} to unit {unit}: {response}"
+                            ),
+                        )
+                    else:
+                        _set_results(futures)
+                finally:
+                    self.__last_call_finished_at = time.monotonic()
 
-                if response.isError():
-                    _LOGGER.error(
-                        "Read error while reading register %d with count %d: %s",
-                        sorted_registers[batch_first_idx],
-                        registers_count,
-                        response,
-                    )
-                    return {}
+    async def _write(
+        self,
+        unit: int,
+        table: ModbusTable,
+        address: int,
+        values: list[int | bool],
+    ) -> Any:
+        """Perform a single write request."""
+        self.stats.write_requests += 1
+        self.stats.values_written += len(values)
+        single_method, multiple_method = _WRITE_METHODS[table]
+        if len(values) == 1:
+            return await self._request(single_method, address, values[0], slave=unit)
+        return await self._request(multiple_method, address, values, slave=unit)
 
-                for idx in range(batch_first_idx, batch_last_idx + 1):
-                    result[sorted_registers[idx]] = response.registers[
-                        sorted_registers[idx] - sorted_registers[batch_first_idx]
-                    ]
 
-                batch_first_idx = batch_last_idx + 1
-                batch_last_idx = batch_first_idx
+def _coalesce_writes(
+    writes: _PendingWrites, max_count: int
+) -> Iterator[tuple[int, list[int | bool], list[asyncio.Future[None]]]]:
+    """Combine writes to adjacent addresses into runs of at most max_count values."""
+    run_address = 0
+    values: list[int | bool] = []
+    futures: list[asyncio.Future[None]] = []
+    for address in sorted(writes):
+        if values and (
+            address != run_address + len(values) or len(values) >= max_count
+        ):
+            yield run_address, values, futures
+            values, futures = [], []
+        if not values:
+            run_address = address
+        value, future, _ = writes[address]
+        values.append(value)
+        futures.append(future)
+    if values:
+        yield run_address, values, futures
 
-            return result
 
-    async def write_register(self, register: int, value: int, slave: int = 1) -> None:
-        """Write a single register."""
-        async with self._lock:
-            await self.cooldown_between_modbus_calls()
+def _set_results(
+    futures: Iterable[asyncio.Future[None]], err: Exception | None = None
+) -> None:
+    """Complete the futures of writes, unless their callers stopped waiting."""
+    for future in futures:
+        if future.done():
+            continue
+        if err is None:
+            future.set_result(None)
+        else:
+            future.set_exception(err)
+
+
+def _to_buffer(batch: ReadBatch, response: Any) -> bytearray | None:
+    """Return the raw values of a read response, as sent on the wire.
+
+    Returns None when the response holds less values than requested.
+    """
+    if not _has_all_values(batch, response):
+        return None
+    if batch.table.is_bit_table:
+        return bytearray(response.bits[: batch.count])
+    return bytearray(
+        struct.pack(f">{batch.count}H", *response.registers[: batch.count])
+    )
+
+
+def _fill_buffer(batch: ReadBatch, response: Any, buffer: bytearray) -> bool:
+    """Write the raw values of a read response into a buffer, in place.
+
+    Returns False, leaving the buffer untouched, when the response holds less
+    values than requested.
+    """
+    if not _has_all_values(batch, response):
+        return False
+    if batch.table.is_bit_table:
+        buffer[: batch.count] = bytes(response.bits[: batch.count])
+    else:
+        struct.pack_into(
+            f">{batch.count}H", buffer, 0, *response.registers[: batch.count]
+        )
+    return True
+
+
+def _has_all_values(batch: ReadBatch, response: Any) -> bool:
+    """Return whether a read response holds all the values requested."""
+    values = response.bits if batch.table.is_bit_table else response.registers
+    return len(values) >= batch.count
+
 
-            await self._client.write_register(register, value, slave=slave)
-            self.__last_call_finished_at = time.time()
+async def _iterate[T](items: Iterable[T]) -> AsyncIterator[T]:
+    """Iterate asynchronously over items."""
+    for item in items:
+        yield item
@@ -0,0 +1,101 @@
+"""Adaptive pacing of the requests to a Modbus device."""
+
+from __future__ import annotations
+
+import logging
+
+from .const import (
+    DEFAULT_MAX_PACING_WAIT,
+    DEFAULT_MIN_PACING_WAIT,
+    DEFAULT_PACING_DECREASE,
+    DEFAULT_PACING_INCREASE_FACTOR,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+LATENCY_SMOOTHING = 0.2
+"""Weight of a new latency measurement in the smoothed latency."""
+
+
+class AdaptivePacing:
+    """Wait between two requests, adapted to how well the device keeps up.
+
+    The wait is adjusted AIMD-style: every response decreases it by a fixed
+    step, while every timeout or busy response multiplies it, and makes it at
+    least as long as the smoothed response latency. The wait always stays
+    between min_wait and max_wait.
+    """
+
+    def __init__(
+        self,
+        min_wait: float = DEFAULT_MIN_PACING_WAIT,
+        max_wait: float = DEFAULT_MAX_PACING_WAIT,
+        *,
+        initial_wait: float | None = None,
+        decrease: float = DEFAULT_PACING_DECREASE,
+        increase_factor: float = DEFAULT_PACING_INCREASE_FACTOR,
+    ) -> None:
+        """Initialize the pacing, starting at initial_wait or min_wait."""
+        if not 0 <= min_wait <= max_wait:
+            raise ValueError("min_wait must be between 0 and max_wait")
+
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.decrease = decrease
+        self.increase_factor = increase_factor
+
+        self._wait = self._clamp(min_wait if initial_wait is None else initial_wait)
+        self._latency: float | None = None
+        self.responses = 0
+        """Number of responses received."""
+        self.congestions = 0
+        """Number of timeouts and busy responses."""
+
+    @property
+    def wait(self) -> float:
+        """Return the current wait between requests, in seconds."""
+        return self._wait
+
+    @property
+    def latency(self) -> float | None:
+        """Return the smoothed response latency, in seconds."""
+        return self._latency
+
+    def _clamp(self, wait: float) -> float:
+        """Return the wait within the configured bounds."""
+        return min(max(wait, self.min_wait), self.max_wait)
+
+    def restore(self, wait: float, latency: float | None = None) -> None:
+        """Restore a wait and latency learned before, e.g. before a restart."""
+        self._wait = self._clamp(wait)
+        self._latency = latency
+
+    def record_response(self, latency: float) -> None:
+        """Record a response, which decreases the wait."""
+        self.responses += 1
+        self._latency = (
+            latency
+            if self._latency is None
+            else self._latency + LATENCY_SMOOTHING * (latency - self._latency)
+        )
+        self._wait = self._clamp(self._wait - self.decrease)
+
+    def record_congestion(self) -> None:
+        """Record a timeout or busy response, which increases the wait."""
+        self.congestions += 1
+        previous_wait = self._wait
+        self._wait = self._clamp(
+            max(self._wait * self.increase_factor, self._latency or self.decrease)
+        )
+        _LOGGER.debug(
+            "Device did not keep up, increasing wait between requests from %.3f to %.3f seconds",
+            previous_wait,
+            self._wait,
+        )
+
+    def __repr__(self) -> str:
+        """Return a representation of the pacing."""
+        return (
+            f"AdaptivePacing(wait={self._wait:.3f}, latency={self._latency}, "
+            f"responses={self.responses}, congestions={self.congestions})"
+        )
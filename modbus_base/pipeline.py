@@ -0,0 +1,264 @@
+"""Modbus TCP client which allows several outstanding requests."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.framer import FramerSocket
+from pymodbus.pdu import DecodePDU, ModbusPDU
+from pymodbus.pdu.bit_message import (
+    ReadCoilsRequest,
+    ReadDiscreteInputsRequest,
+    WriteMultipleCoilsRequest,
+    WriteSingleCoilRequest,
+)
+from pymodbus.pdu.register_message import (
+    ReadHoldingRegistersRequest,
+    ReadInputRegistersRequest,
+    WriteMultipleRegistersRequest,
+    WriteSingleRegisterRequest,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 3.0
+DEFAULT_RECONNECT_DELAY = 0.1
+"""Default wait (in seconds) before reconnecting, as in pymodbus."""
+DEFAULT_RECONNECT_DELAY_MAX = 300.0
+"""Default maximum wait (in seconds) before reconnecting, as in pymodbus."""
+
+
+class PipelinedModbusTcpClient:
+    """Minimal Modbus TCP client which pipelines requests.
+
+    pymodbus only allows a single outstanding request per client. Many Modbus
+    TCP devices however accept several requests at once, and match the
+    responses with the transaction ID from the MBAP header. This client sends
+    requests without waiting for the previous response, and resolves every
+    response by its transaction ID.
+
+    Only the subset of the pymodbus client API used by ModbusHub is
+    implemented. Responses are regular pymodbus PDUs.
+
+    Like the pymodbus clients, it reconnects when the connection was lost:
+    requests made while disconnected try to reconnect, waiting at least
+    reconnect_delay between attempts, doubled after every failed attempt up to
+    reconnect_delay_max. Requests made before the next attempt is due fail
+    right away. After close(), it only reconnects on connect().
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 502,
+        *,
+        timeout: float = DEFAULT_TIMEOUT,
+        reconnect_delay: float = DEFAULT_RECONNECT_DELAY,
+        reconnect_delay_max: float = DEFAULT_RECONNECT_DELAY_MAX,
+    ) -> None:
+        """Initialize the client."""
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_delay_max = reconnect_delay_max
+
+        self._framer = FramerSocket(DecodePDU(is_server=False))
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._receive_task: asyncio.Task[None] | None = None
+        self._pending: dict[int, asyncio.Future[ModbusPDU]] = {}
+        self._transaction_id = 0
+        self._connect_lock = asyncio.Lock()
+        self._closed = True
+        self._reconnect_wait = reconnect_delay
+        self._reconnect_at = 0.0
+
+    @property
+    def connected(self) -> bool:
+        """Return whether the client is connected."""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> bool:
+        """Connect to the device."""
+        self._closed = False
+        async with self._connect_lock:
+            if self.connected:
+                return True
+
+            try:
+                async with asyncio.timeout(self.timeout):
+                    self._reader, self._writer = await asyncio.open_connection(
+                        self.host, self.port
+                    )
+            except (OSError, TimeoutError) as err:
+                _LOGGER.debug(
+                    "Could not connect to %s:%d: %s", self.host, self.port, err
+                )
+                return False
+
+            self._receive_task = asyncio.create_task(self._receive_loop())
+            self._reconnect_wait = self.reconnect_delay
+            return True
+
+    async def _reconnect(self) -> bool:
+        """Reconnect after the connection was lost, when the backoff allows it."""
+        if self._closed:
+            return False
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._reconnect_at:
+            return False
+        if self._connect_lock.locked():
+            # another request is reconnecting already
+            async with self._connect_lock:
+                return self.connected
+        if await self.connect():
+            _LOGGER.debug("Reconnected to %s:%d", self.host, self.port)
+            return True
+        self._reconnect_at = loop.time() + self._reconnect_wait
+        self._reconnect_wait = min(self._reconnect_wait * 2, self.reconnect_delay_max)
+        return False
+
+    def close(self) -> None:
+        """Close the connection, failing all outstanding requests."""
+        self._closed = True
+        if self._receive_task:
+            self._receive_task.cancel()
+            self._receive_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._reader = None
+        self._fail_pending(ConnectionException("Connection closed"))
+
+    def _fail_pending(self, err: Exception) -> None:
+        """Fail all outstanding requests."""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(err)
+        self._pending.clear()
+
+    async def _receive_loop(self) -> None:
+        """Read responses and hand them to the matching request."""
+        assert self._reader
+        buffer = b""
+        try:
+            while data := await self._reader.read(4096):
+                buffer += data
+                while buffer:
+                    used_len, pdu = self._framer.processIncomingFrame(buffer)
+                    if not used_len:
+                        break
+                    buffer = buffer[used_len:]
+                    if pdu is None:
+                        continue
+                    future = self._pending.pop(pdu.transaction_id, None)
+                    if future is None or future.done():
+                        _LOGGER.debug(
+                            "Dropping response for unknown transaction %d",
+                            pdu.transaction_id,
+                        )
+                        continue
+                    future.set_result(pdu)
+        except (OSError, ModbusIOException) as err:
+            _LOGGER.debug("Connection to %s:%d lost: %s", self.host, self.port, err)
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(ConnectionException("Connection lost"))
+
+    def _next_transaction_id(self) -> int:
+        """Return the next free transaction ID."""
+        while True:
+            self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+            if self._transaction_id and self._transaction_id not in self._pending:
+                return self._transaction_id
+
+    async def execute(self, request: ModbusPDU) -> ModbusPDU:
+        """Send a request and wait for its response."""
+        if not self.connected and not await self._reconnect():
+            raise ConnectionException(f"Not connected to {self.host}:{self.port}")
+        assert self._writer
+
+        request.transaction_id = self._next_transaction_id()
+        future: asyncio.Future[ModbusPDU] = asyncio.get_running_loop().create_future()
+        self._pending[request.transaction_id] = future
+        self._writer.write(self._framer.buildFrame(request))
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                return await future
+        except TimeoutError as err:
+            raise ModbusIOException(
+                f"No response received for transaction {request.transaction_id}"
+            ) from err
+        finally:
+            self._pending.pop(request.transaction_id, None)
+
+    async def read_coils(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> ModbusPDU:
+        """Read coils (code 0x01)."""
+        return await self.execute(
+            ReadCoilsRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def read_discrete_inputs(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> ModbusPDU:
+        """Read discrete inputs (code 0x02)."""
+        return await self.execute(
+            ReadDiscreteInputsRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> ModbusPDU:
+        """Read holding registers (code 0x03)."""
+        return await self.execute(
+            ReadHoldingRegistersRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def read_input_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> ModbusPDU:
+        """Read input registers (code 0x04)."""
+        return await self.execute(
+            ReadInputRegistersRequest(address=address, count=count, dev_id=slave)
+        )
+
+    async def write_coil(
+        self, address: int, value: bool, *, slave: int = 1
+    ) -> ModbusPDU:
+        """Write a single coil (code 0x05)."""
+        return await self.execute(
+            WriteSingleCoilRequest(address=address, bits=[value], dev_id=slave)
+        )
+
+    async def write_register(
+        self, address: int, value: int, *, slave: int = 1
+    ) -> ModbusPDU:
+        """Write a single register (code 0x06)."""
+        return await self.execute(
+            WriteSingleRegisterRequest(address=address, registers=[value], dev_id=slave)
+        )
+
+    async def write_coils(
+        self, address: int, values: list[bool], *, slave: int = 1
+    ) -> ModbusPDU:
+        """Write multiple coils (code 0x0F)."""
+        return await self.execute(
+            WriteMultipleCoilsRequest(address=address, bits=values, dev_id=slave)
+        )
+
+    async def write_registers(
+        self, address: int, values: list[int], *, slave: int = 1
+    ) -> ModbusPDU:
+        """Write multiple registers (code 0x10)."""
+        return await self.execute(
+            WriteMultipleRegistersRequest(
+                address=address, registers=values, dev_id=slave
+            )
+        )
@@ -0,0 +1,344 @@
+"""Read planner for batching Modbus register reads."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import zip_longest
+from types import MappingProxyType
+from typing import NamedTuple
+
+from .const import (
+    DEFAULT_MAX_READ_COUNT,
+    DEFAULT_REGISTER_COST,
+    DEFAULT_REQUEST_COST,
+    DEFAULT_UNIT_ID,
+    ModbusTable,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ReadCostModel:
+    """Cost model used to decide where batch boundaries are placed."""
+
+    request_cost: float = DEFAULT_REQUEST_COST
+    """Fixed cost (in seconds) of a single request/response round trip."""
+    register_cost: float = DEFAULT_REGISTER_COST
+    """Additional cost (in seconds) of every register included in a request."""
+    max_count: int = DEFAULT_MAX_READ_COUNT
+    """Maximum number of registers that can be read in a single request."""
+
+    def __post_init__(self) -> None:
+        """Validate the cost model."""
+        if self.max_count < 1:
+            raise ValueError("max_count must be at least 1")
+        if self.request_cost < 0 or self.register_cost < 0:
+            raise ValueError("Costs cannot be negative")
+
+    def cost(self, count: int) -> float:
+        """Return the cost of reading count registers in one request."""
+        return self.request_cost + self.register_cost * count
+
+
+type RegisterKey = tuple[int, ModbusTable, int]
+"""Key of a single register: (unit, table, address)."""
+
+
+class RegisterBlock(NamedTuple):
+    """Contiguous range of registers in one Modbus table of one unit."""
+
+    unit: int
+    table: ModbusTable
+    registers: range
+
+
+@dataclass(frozen=True, slots=True)
+class ReadBatch:
+    """A single read request covering count registers starting at address."""
+
+    unit: int
+    table: ModbusTable
+    address: int
+    count: int
+
+    @property
+    def registers(self) -> range:
+        """Return the registers covered by this batch."""
+        return range(self.address, self.address + self.count)
+
+
+def merge_ranges(ranges: Iterable[range], *, adjacent: bool = True) -> list[range]:
+    """Sort and merge overlapping (and optionally adjacent) address ranges."""
+    merged: list[range] = []
+    for current in sorted((r for r in ranges if r), key=lambda r: r.start):
+        if merged and (
+            current.start <= merged[-1].stop
+            if adjacent
+            else current.start < merged[-1].stop
+        ):
+            if current.stop > merged[-1].stop:
+                merged[-1] = range(merged[-1].start, current.stop)
+        else:
+            merged.append(current)
+    return merged
+
+
+class ExcludedRanges:
+    """Set of address ranges which must never be included in a read request."""
+
+    __slots__ = ("_ranges", "_starts")
+
+    def __init__(self, ranges: Iterable[range] = ()) -> None:
+        """Initialize the excluded ranges."""
+        self._ranges = merge_ranges(ranges)
+        self._starts = [r.start for r in self._ranges]
+
+    def __bool__(self) -> bool:
+        """Return whether any range is excluded."""
+        return bool(self._ranges)
+
+    def __iter__(self):
+        """Iterate over the merged excluded ranges."""
+        return iter(self._ranges)
+
+    def __repr__(self) -> str:
+        """Return a representation of the excluded ranges."""
+        return f"ExcludedRanges({self._ranges!r})"
+
+    def overlaps(self, start: int, stop: int) -> bool:
+        """Return whether [start, stop) overlaps with an excluded range."""
+        if start >= stop:
+            return False
+        # the ranges are merged, so only the last range starting before
+        # `stop` can possibly overlap
+        idx = bisect_left(self._starts, stop) - 1
+        return idx >= 0 and self._ranges[idx].stop > start
+
+    def __contains__(self, address: object) -> bool:
+        """Return whether the address is excluded."""
+        return isinstance(address, int) and self.overlaps(address, address + 1)
+
+    def subtract(self, registers: range) -> list[range]:
+        """Return the parts of registers which are not excluded."""
+        remaining: list[range] = []
+        start = registers.start
+        idx = max(bisect_right(self._starts, start) - 1, 0)
+        while start < registers.stop:
+            if idx >= len(self._ranges) or self._ranges[idx].start >= registers.stop:
+                remaining.append(range(start, registers.stop))
+                break
+            excluded = self._ranges[idx]
+            if excluded.stop > start:
+                if excluded.start > start:
+                    remaining.append(range(start, excluded.start))
+                start = excluded.stop
+            idx += 1
+        return remaining
+
+
+def plan_reads(
+    register_ranges: Iterable[range],
+    cost_model: ReadCostModel,
+    excluded: ExcludedRanges | None = None,
+    table: ModbusTable = ModbusTable.HOLDING_REGISTER,
+    unit: int = DEFAULT_UNIT_ID,
+) -> list[ReadBatch]:
+    """Split register ranges into batches minimizing the total cost of reading them.
+
+    Reading a few unused registers between two wanted ranges is often much
+    cheaper than an extra round trip. The optimal split is found with dynamic
+    programming over the sorted ranges: a batch can span from any range to a
+    later one as long as it stays within `cost_model.max_count` registers and
+    does not cross an excluded range. Overlapping ranges are never split over
+    several batches, unless they are larger than `cost_model.max_count`.
+
+    Registers which are themselves excluded are never read.
+    """
+
+    blocks = merge_ranges(register_ranges, adjacent=False)
+    if excluded:
+        blocks = [part for block in blocks for part in excluded.subtract(block)]
+
+    max_count = cost_model.max_count
+    if any(len(block) > max_count for block in blocks):
+        blocks = [
+            range(start, min(start + max_count, block.stop))
+            for block in blocks
+            for start in range(block.start, block.stop, max_count)
+        ]
+
+    batches: list[ReadBatch] = []
+    segment_start = 0
+    for idx in range(1, len(blocks) + 1):
+        # A batch can never span an excluded range, so split the blocks
+        # in independent segments first.
+        if idx == len(blocks) or (
+            excluded and excluded.overlaps(blocks[idx - 1].stop, blocks[idx].start)
+        ):
+            batches.extend(
+                ReadBatch(unit, table, address, count)
+                for address, count in _plan_segment(
+                    blocks[segment_start:idx], cost_model
+                )
+            )
+            segment_start = idx
+
+    return batches
+
+
+def _plan_segment(
+    blocks: list[range], cost_model: ReadCostModel
+) -> list[tuple[int, int]]:
+    """Find the cheapest batching for a sorted list of non-overlapping blocks.
+
+    Returns the address and count of every batch.
+    """
+
+    max_count = cost_model.max_count
+    # best_cost[j] is the minimal cost to read blocks[:j],
+    # batch_start[j] is the index of the first block of the last batch
+    best_cost = [0.0] * (len(blocks) + 1)
+    batch_start = [0] * (len(blocks) + 1)
+
+    for j, last_block in enumerate(blocks, start=1):
+        best_cost[j] = float("inf")
+        i = j - 1
+        while i >= 0 and last_block.stop - blocks[i].start <= max_count:
+            cost = best_cost[i] + cost_model.cost(last_block.stop - blocks[i].start)
+            if cost < best_cost[j]:
+                best_cost[j] = cost
+                batch_start[j] = i
+            i -= 1
+
+    batches: list[tuple[int, int]] = []
+    j = len(blocks)
+    while j > 0:
+        i = batch_start[j]
+        batches.append((blocks[i].start, blocks[j - 1].stop - blocks[i].start))
+        j = i
+    batches.reverse()
+    return batches
+
+
+@dataclass(frozen=True)
+class ReadPlan:
+    """Precompiled, immutable plan for reading a set of register blocks."""
+
+    batches: tuple[ReadBatch, ...]
+    """Read requests to perform, interleaved over the units."""
+    locations: Mapping[RegisterBlock, tuple[int, int]]
+    """Index of the batch and offset within that batch of each register block."""
+
+    @property
+    def register_count(self) -> int:
+        """Return the total number of registers read when executing this plan."""
+        return sum(batch.count for batch in self.batches)
+
+    @cached_property
+    def register_index(self) -> Mapping[RegisterKey, tuple[int, int]]:
+        """Return the index of the batch and offset of every register read."""
+        return MappingProxyType(
+            {
+                (batch.unit, batch.table, address): (idx, offset)
+                for idx, batch in enumerate(self.batches)
+                for offset, address in enumerate(batch.registers)
+            }
+        )
+
+    def replace_batches(
+        self, replacements: Mapping[int, Sequence[ReadBatch]]
+    ) -> ReadPlan:
+        """Return a plan in which some batches are replaced by other batches.
+
+        Blocks of replaced batches keep a location only when they fit in one of
+        the new batches.
+        """
+        batches: list[ReadBatch] = []
+        new_indices: list[int] = []
+        for idx, batch in enumerate(self.batches):
+            new_indices.append(len(batches))
+            batches.extend(replacements.get(idx, (batch,)))
+
+        locations: dict[RegisterBlock, tuple[int, int]] = {}
+        for block, (idx, offset) in self.locations.items():
+            if idx not in replacements:
+                locations[block] = (new_indices[idx], offset)
+                continue
+            for new_idx, batch in enumerate(replacements[idx], start=new_indices[idx]):
+                if (
+                    block.registers.start >= batch.address
+                    and block.registers.stop <= batch.registers.stop
+                ):
+                    locations[block] = (new_idx, block.registers.start - batch.address)
+                    break
+
+        return ReadPlan(tuple(batches), MappingProxyType(locations))
+
+
+EMPTY_READ_PLAN = ReadPlan((), MappingProxyType({}))
+
+
+def compile_read_plan(
+    blocks: Iterable[RegisterBlock],
+    cost_models: Mapping[ModbusTable, ReadCostModel],
+    excluded: Mapping[tuple[int, ModbusTable], ExcludedRanges] | None = None,
+    unit_cost_models: Mapping[tuple[int, ModbusTable], ReadCostModel] | None = None,
+) -> ReadPlan:
+    """Compile a read plan for the given register blocks.
+
+    Every table of every unit is planned separately, using the cost model for
+    that unit and table in unit_cost_models, or else the one for that table in
+    cost_models, and the excluded ranges for that unit and table. The batches of
+    the different units are interleaved, so that all units are polled evenly
+    during a single pass.
+
+    Blocks which cannot be read because they (partially) fall in an excluded
+    range, or which end up split over several batches, get no location.
+    """
+
+    grouped_blocks: dict[tuple[int, ModbusTable], set[range]] = {}
+    for block in blocks:
+        if block.registers:
+            grouped_blocks.setdefault((block.unit, block.table), set()).add(
+                block.registers
+            )
+
+    unit_batches: dict[int, list[ReadBatch]] = {}
+    block_batches: dict[RegisterBlock, ReadBatch] = {}
+    for unit, table in sorted(grouped_blocks):
+        batches = plan_reads(
+            grouped_blocks[unit, table],
+            unit_cost_models.get((unit, table), cost_models[table])
+            if unit_cost_models
+            else cost_models[table],
+            excluded.get((unit, table)) if excluded else None,
+            table,
+            unit,
+        )
+        unit_batches.setdefault(unit, []).extend(batches)
+        batch_starts = [batch.address for batch in batches]
+
+        for registers in grouped_blocks[unit, table]:
+            idx = bisect_right(batch_starts, registers.start) - 1
+            if idx >= 0 and registers.stop <= batches[idx].registers.stop:
+                block_batches[RegisterBlock(unit, table, registers)] = batches[idx]
+
+    interleaved = tuple(
+        batch
+        for batches in zip_longest(*unit_batches.values())
+        for batch in batches
+        if batch is not None
+    )
+    batch_index = {batch: idx for idx, batch in enumerate(interleaved)}
+
+    return ReadPlan(
+        interleaved,
+        MappingProxyType(
+            {
+                block: (batch_index[batch], block.registers.start - batch.address)
+                for block, batch in block_batches.items()
+            }
+        ),
+    )
@@ -0,0 +1,174 @@
+"""Persisted profiles of what a ModbusHub learned about a device."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field, fields
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DOMAIN, ModbusTable
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = f"{DOMAIN}.device_profiles"
+STORAGE_VERSION = 1
+PROFILE_SAVE_DELAY = 60
+"""Delay (in seconds) before the profiles are saved after a change."""
+
+DATA_PROFILE_STORE: HassKey[ModbusDeviceProfileStore] = HassKey(
+    f"{DOMAIN}_device_profiles"
+)
+_LOAD_LOCK: HassKey[asyncio.Lock] = HassKey(f"{DOMAIN}_device_profiles_lock")
+
+
+@dataclass(slots=True, kw_only=True)
+class DeviceProfile:
+    """What was learned about a device, to be reused after a restart."""
+
+    fingerprint: str | None = None
+    """Identifies the device firmware. The profile is discarded when it changes."""
+    max_read_count: int | None = None
+    """Maximum number of registers read in a single request."""
+    max_bit_read_count: int | None = None
+    """Maximum number of coils or discrete inputs read in a single request."""
+    excluded_ranges: dict[ModbusTable, list[range]] = field(default_factory=dict)
+    """Illegal addresses of the device, per table."""
+    pacing_wait: float | None = None
+    """Last wait between requests of the adaptive pacing."""
+    pacing_latency: float | None = None
+    """Last smoothed latency of the adaptive pacing."""
+    identity: dict[str, Any] = field(default_factory=dict)
+    """Values which don't change for a given firmware, such as the serial
+    number, so that they don't need to be read again."""
+
+    async def async_get_identity(
+        self, key: str, read: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return an identity value, only reading it when it is not known yet."""
+        if key not in self.identity:
+            self.identity[key] = await read()
+        return self.identity[key]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the profile as JSON serializable dict."""
+        return asdict(self) | {
+            "excluded_ranges": {
+                table.value: [[r.start, r.stop] for r in ranges]
+                for table, ranges in self.excluded_ranges.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> DeviceProfile:
+        """Return a profile from a dict returned by as_dict.
+
+        Unknown keys, such as those stored by a newer version, are ignored.
+        """
+        names = {profile_field.name for profile_field in fields(cls)}
+        excluded_ranges = {
+            ModbusTable(table): [range(start, stop) for start, stop in ranges]
+            for table, ranges in data.get("excluded_ranges", {}).items()
+        }
+        return cls(
+            **{key: value for key, value in data.items() if key in names}
+            | {"excluded_ranges": excluded_ranges}
+        )
+
+
+class ModbusDeviceProfileStore:
+    """Device profiles stored in the Home Assistant storage, keyed by device.
+
+    Tracked profiles are exported again every time the store is saved, which
+    happens after a change and when Home Assistant stops.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the store. Call async_load before using it."""
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY
+        )
+        self._profiles: dict[str, dict[str, Any]] = {}
+        self._exporters: dict[str, Callable[[], DeviceProfile]] = {}
+
+    async def async_load(self) -> None:
+        """Load the stored profiles."""
+        self._profiles = await self._store.async_load() or {}
+
+    def get(
+        self, device_id: str, fingerprint: str | None = None
+    ) -> DeviceProfile | None:
+        """Return the profile of a device.
+
+        When fingerprint is set and differs from the fingerprint of the stored
+        profile, e.g. after a firmware update, the profile is discarded.
+        """
+        if (data := self._profiles.get(device_id)) is None:
+            return None
+        profile = DeviceProfile.from_dict(data)
+        if fingerprint is not None and profile.fingerprint != fingerprint:
+            _LOGGER.info(
+                "Discarding the profile of device %s, which was learned with %s",
+                device_id,
+                profile.fingerprint,
+            )
+            self.async_invalidate(device_id)
+            return None
+        return profile
+
+    @callback
+    def async_track(
+        self, device_id: str, export: Callable[[], DeviceProfile]
+    ) -> CALLBACK_TYPE:
+        """Save the profile returned by export whenever the store is saved.
+
+        Returns a callback which stops tracking the device, after saving its
+        profile a last time.
+        """
+        self._exporters[device_id] = export
+        self.async_schedule_save()
+
+        @callback
+        def _untrack() -> None:
+            if self._exporters.get(device_id) is export:
+                self._profiles[device_id] = export().as_dict()
+                del self._exporters[device_id]
+                self.async_schedule_save()
+
+        return _untrack
+
+    @callback
+    def async_invalidate(self, device_id: str) -> None:
+        """Forget the profile of a device."""
+        self._profiles.pop(device_id, None)
+        self._exporters.pop(device_id, None)
+        self.async_schedule_save()
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Save the profiles after a delay."""
+        self._store.async_delay_save(self._data_to_save, PROFILE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict[str, Any]]:
+        """Return the profiles to save, with the tracked profiles up to date."""
+        for device_id, export in self._exporters.items():
+            self._profiles[device_id] = export().as_dict()
+        return self._profiles
+
+
+async def async_get_profile_store(hass: HomeAssistant) -> ModbusDeviceProfileStore:
+    """Return the loaded device profile store of this Home Assistant instance."""
+    if (store := hass.data.get(DATA_PROFILE_STORE)) is not None:
+        return store
+    async with hass.data.setdefault(_LOAD_LOCK, asyncio.Lock()):
+        if (store := hass.data.get(DATA_PROFILE_STORE)) is None:
+            store = ModbusDeviceProfileStore(hass)
+            await store.async_load()
+            hass.data[DATA_PROFILE_STORE] = store
+    return store
@@ -0,0 +1,102 @@
+"""Sharing of one ModbusHub between config entries using the same connection."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DOMAIN
+from .modbus import ModbusHub
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_HUB_REGISTRY: HassKey[ModbusHubRegistry] = HassKey(f"{DOMAIN}_hub_registry")
+
+
+def tcp_endpoint(host: str, port: int) -> tuple[str, str, int]:
+    """Return the key of a Modbus TCP connection in the hub registry."""
+    return ("tcp", host.lower(), port)
+
+
+def serial_endpoint(port: str) -> tuple[str, str]:
+    """Return the key of a serial line in the hub registry."""
+    return ("serial", port)
+
+
+class ModbusHubRegistry:
+    """Reference counted ModbusHubs, keyed by their connection.
+
+    Config entries for several devices behind the same gateway acquire the
+    same hub, so that they share a single connection. As the hub serializes
+    every request, their polls can't collide on the wire, and read plans of
+    several coordinators are interleaved request by request.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._hubs: dict[Hashable, ModbusHub] = {}
+        self._refcounts: dict[Hashable, int] = {}
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+
+    async def async_acquire(
+        self, key: Hashable, create_hub: Callable[[], Awaitable[ModbusHub]]
+    ) -> ModbusHub:
+        """Return the hub for key, creating it with create_hub if needed.
+
+        Every call must be matched by a call to async_release. While a hub is
+        created, other callers for the same key wait for it, but those for
+        other keys don't.
+        """
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            if (hub := self._hubs.get(key)) is None:
+                hub = await create_hub()
+                self._hubs[key] = hub
+                self._refcounts[key] = 0
+                _LOGGER.debug("Created a shared Modbus hub for %s", key)
+            self._refcounts[key] += 1
+            return hub
+
+    async def async_release(self, key: Hashable) -> None:
+        """Release the hub for key, closing it when it is no longer used."""
+        self._refcounts[key] -= 1
+        if self._refcounts[key]:
+            return
+        del self._refcounts[key]
+        hub = self._hubs.pop(key)
+        hub.close()
+        if not self._locks[key].locked():
+            del self._locks[key]
+        _LOGGER.debug("Closed the shared Modbus hub for %s", key)
+
+    def __len__(self) -> int:
+        """Return the number of hubs in use."""
+        return len(self._hubs)
+
+
+def _get_registry(hass: HomeAssistant) -> ModbusHubRegistry:
+    """Return the hub registry of this Home Assistant instance."""
+    if (registry := hass.data.get(DATA_HUB_REGISTRY)) is None:
+        registry = hass.data[DATA_HUB_REGISTRY] = ModbusHubRegistry()
+    return registry
+
+
+async def async_acquire_shared_hub(
+    hass: HomeAssistant,
+    key: Hashable,
+    create_hub: Callable[[], Awaitable[ModbusHub]],
+) -> ModbusHub:
+    """Return the hub shared by all users of the connection identified by key.
+
+    create_hub is only called when no hub exists yet for key. Exceptions it
+    raises are propagated, and no hub is registered.
+    """
+    return await _get_registry(hass).async_acquire(key, create_hub)
+
+
+async def async_release_shared_hub(hass: HomeAssistant, key: Hashable) -> None:
+    """Release a hub returned by async_acquire_shared_hub."""
+    await _get_registry(hass).async_release(key)
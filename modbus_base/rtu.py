@@ -0,0 +1,72 @@
+"""Timing of Modbus RTU frames on a serial line."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+from typing import Any, Literal
+
+from .const import DEFAULT_RTU_TURNAROUND, ModbusTable
+
+RTU_READ_REQUEST_SIZE = 8
+"""Bytes of a read request: unit ID, function code, address, count and CRC."""
+RTU_READ_RESPONSE_OVERHEAD = 5
+"""Bytes of a read response besides the values: unit ID, function code, byte count and CRC."""
+
+_FIXED_FRAME_GAP_BAUDRATE = 19200
+_FIXED_FRAME_GAP = 0.00175
+"""Inter-frame gap (in seconds) recommended above 19200 baud."""
+
+
+@dataclass(frozen=True, slots=True)
+class SerialLine:
+    """Settings of a serial line, and the timing of Modbus RTU frames on it.
+
+    The defaults match those of the pymodbus serial client.
+    """
+
+    baudrate: int = 19200
+    bytesize: int = 8
+    parity: Literal["N", "E", "O"] = "N"
+    stopbits: int = 1
+    turnaround: float = DEFAULT_RTU_TURNAROUND
+    """Time (in seconds) the device needs before it starts to respond."""
+
+    @property
+    def character_time(self) -> float:
+        """Return the time to transfer a single byte, in seconds."""
+        bits = 1 + self.bytesize + (self.parity != "N") + self.stopbits
+        return bits / self.baudrate
+
+    @property
+    def frame_gap(self) -> float:
+        """Return the silence required between two frames, in seconds.
+
+        This is 3.5 character times, or a fixed 1.75 ms above 19200 baud.
+        """
+        if self.baudrate > _FIXED_FRAME_GAP_BAUDRATE:
+            return _FIXED_FRAME_GAP
+        return 3.5 * self.character_time
+
+    def read_time(self, table: ModbusTable, count: int) -> float:
+        """Return the expected duration of a read request, in seconds.
+
+        This includes both frames, the turnaround of the device and the gap
+        before the next request.
+        """
+        data_size = math.ceil(count / 8) if table.is_bit_table else 2 * count
+        frames_size = RTU_READ_REQUEST_SIZE + RTU_READ_RESPONSE_OVERHEAD + data_size
+        return frames_size * self.character_time + self.turnaround + 2 * self.frame_gap
+
+    def hub_options(self) -> dict[str, Any]:
+        """Return the ModbusHub options matching this line.
+
+        Batches are planned with the actual cost of a request and of every
+        register on the wire, and the wait between requests is the inter-frame
+        gap, so that requests follow each other as closely as the bus allows.
+        """
+        return {
+            "_msg_wait": self.frame_gap,
+            "request_cost": self.read_time(ModbusTable.HOLDING_REGISTER, 0),
+            "register_cost": 2 * self.character_time,
+        }
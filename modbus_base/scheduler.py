@@ -0,0 +1,104 @@
+"""Scheduling of the polls of many coordinators."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import math
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DEFAULT_MAX_CONCURRENT_POLLS, DOMAIN, OverrunPolicy
+from .stats import SchedulerStats
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_POLL_SCHEDULER: HassKey[ModbusPollScheduler] = HassKey(f"{DOMAIN}_poll_scheduler")
+
+_GOLDEN_RATIO_FRACTION = (math.sqrt(5) - 1) / 2
+"""Step between consecutive phases, which keeps any number of them evenly spread."""
+
+_SLOT_TOLERANCE = 1e-6
+"""Tolerance (in intervals) for rounding errors when locating a slot."""
+
+
+class ModbusPollScheduler:
+    """Schedules the polls of all coordinators using it on a steady grid.
+
+    Every coordinator gets a phase within its update interval, spread evenly
+    over the interval, so that the polls of many devices don't all start at
+    the same moment. Polls are scheduled on a fixed grid instead of relative to
+    the end of the previous poll, so they don't drift. At most
+    max_concurrent_polls polls run at the same time; the others wait.
+
+    When a poll overruns, i.e. its next slot has already passed when it
+    finishes, the overrun policy decides whether the missed polls are skipped
+    or merged into a single poll which starts right away.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        max_concurrent_polls: int = DEFAULT_MAX_CONCURRENT_POLLS,
+        overrun_policy: OverrunPolicy = OverrunPolicy.SKIP,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self.overrun_policy = overrun_policy
+        self.stats = SchedulerStats()
+        self._semaphore = asyncio.Semaphore(max_concurrent_polls)
+        self._epoch = hass.loop.time()
+        self._phases = 0
+
+    def allocate_phase(self) -> float:
+        """Return the phase of a new coordinator, as a fraction of its interval."""
+        phase = (self._phases * _GOLDEN_RATIO_FRACTION) % 1
+        self._phases += 1
+        return phase
+
+    def next_poll_at(
+        self, phase: float, interval: float, previous_poll_at: float | None
+    ) -> float:
+        """Return the loop time at which the next poll must start.
+
+        previous_poll_at is the time at which the previous poll was scheduled,
+        or None for the first poll.
+        """
+        offset = self._epoch + phase * interval
+        now = self.hass.loop.time()
+        first_slot = math.ceil((now - offset) / interval - _SLOT_TOLERANCE)
+        if previous_poll_at is None:
+            return offset + first_slot * interval
+
+        next_slot = (
+            math.floor((previous_poll_at - offset) / interval + _SLOT_TOLERANCE) + 1
+        )
+        if next_slot >= first_slot:
+            return offset + next_slot * interval
+
+        missed = first_slot - next_slot
+        if self.overrun_policy is OverrunPolicy.MERGE:
+            self.stats.merged_polls += 1
+            _LOGGER.debug("Poll overran by %d intervals, polling again now", missed)
+            return now
+        self.stats.skipped_polls += missed
+        _LOGGER.debug("Poll overran, skipping %d polls", missed)
+        return offset + first_slot * interval
+
+    async def async_run_poll(
+        self, poll_at: float, poll: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Run a poll which was scheduled at poll_at, within the concurrency limit."""
+        async with self._semaphore:
+            self.stats.polls += 1
+            self.stats.poll_lag.record(max(self.hass.loop.time() - poll_at, 0))
+            await poll()
+
+
+def get_poll_scheduler(hass: HomeAssistant) -> ModbusPollScheduler:
+    """Return the poll scheduler shared by all coordinators of this instance."""
+    if (scheduler := hass.data.get(DATA_POLL_SCHEDULER)) is None:
+        scheduler = hass.data[DATA_POLL_SCHEDULER] = ModbusPollScheduler(hass)
+    return scheduler
@@ -1,56 +1,45 @@
 """Base Modbus Sensor."""
 
+from collections.abc import Callable
 from dataclasses import dataclass
-from functools import cached_property
+from datetime import timedelta
+from typing import Any
 
-from pymodbus.client.mixin import ModbusClientMixin
-
-from homeassistant.components.sensor import SensorEntity, SensorEntityDescription
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfTime
 from homeassistant.core import callback
+from homeassistant.helpers.typing import StateType
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .const import StreamStatistic
 from .coordinator import BaseModbusUpdateCoordinator
-from .entity import BaseModbusEntity, SimpleModbusRegisterType
+from .entity import (
+    BaseModbusEntity,
+    CompositeModbusEntity,
+    ModbusField,
+    SimpleModbusEntityDescription,
+)
+from .stream import ModbusStreamer
 
 
-@dataclass(frozen=True)
-class SimpleModbusSensorEntityDescription(SensorEntityDescription):
+@dataclass(frozen=True, kw_only=True)
+class SimpleModbusSensorEntityDescription(
+    SensorEntityDescription, SimpleModbusEntityDescription
+):
     """EntityDescription of a Simple Modbus sensor."""
 
-    modbus_address: int | None = None
-    """Modbus register number."""
-    modbus_register_type: SimpleModbusRegisterType | None = None
-    """Type of data stored in the register."""
-    modbus_count: int | None = None
-    """Number of registers to read for this sensor."""
-
     scale: float | None = None
     """When set, the value returned by the device will be divided by this scale."""
 
-    @cached_property
-    def modbus_registers(self) -> list[int]:
-        """Return the Modbus registers."""
-
-        # these must be set, but cannot type them correctly due to
-        # "non-default argument 'xyz' follows default argument 'abc'" error
-        assert self.modbus_address
-        assert self.modbus_register_type
-
-        type_length = self.modbus_register_type.value.value[1]
-        modbus_count = self.modbus_count
-
-        if self.modbus_count and type_length and self.modbus_count != type_length:
-            raise ValueError(
-                "modbus_count does not match the length for this register type"
-            )
-
-        if not self.modbus_count:
-            if not type_length:
-                raise ValueError("modbus_count must be set for this register type")
-            modbus_count = type_length
-
-        assert modbus_count is not None
-
-        return list(range(self.modbus_address, self.modbus_address + modbus_count))
+    @property
+    def modbus_scale(self) -> float | None:
+        """Return the scale by which the value of the registers is divided."""
+        return self.scale
 
 
 class SimpleModbusSensorEntity(BaseModbusEntity, SensorEntity):
@@ -62,37 +51,212 @@ class SimpleModbusSensorEntity(BaseModbusEntity, SensorEntity):
         self,
         coordinator: BaseModbusUpdateCoordinator,
         description: SimpleModbusSensorEntityDescription,
+        unit: int | None = None,
     ):
         """Initialize the Modbus sensor."""
-        super().__init__(coordinator, description)
+        super().__init__(coordinator, description, unit)
 
     @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        assert self.entity_description.modbus_register_type
-
-        if self.coordinator.data and all(
-            modbus_register in self.coordinator.data
-            for modbus_register in self.entity_description.modbus_registers
-        ):
-            registers = [
-                self.coordinator.data[modbus_register]
-                for modbus_register in self.entity_description.modbus_registers
-            ]
-            value = ModbusClientMixin.convert_from_registers(
-                registers,
-                self.entity_description.modbus_register_type.value,
-            )
-
-            if self.entity_description.scale is not None:
-                assert isinstance(value, (int, float)), (
-                    "Scale can only be set for registers containing a number"
-                )
-                value = value / self.entity_description.scale
+    def _async_update_attrs(self) -> None:
+        """Update the value and availability from the coordinator data."""
+        value = self._get_modbus_value()
+
+        if value is not None:
             self._attr_native_value = value  # type: ignore[reportAccessAttributeIssue]
             self._attr_available = True
         else:
             self._attr_available = False
             self._attr_native_value = None
 
+
+@dataclass(frozen=True, kw_only=True)
+class CompositeModbusSensorEntityDescription(SensorEntityDescription):
+    """EntityDescription of a sensor combining the values of several Modbus fields."""
+
+    modbus_fields: tuple[ModbusField, ...]
+    """Fields read from the device, in the order they are passed to value_fn."""
+    value_fn: Callable[..., StateType]
+    """Combine the decoded values of the fields into the value of the sensor."""
+    poll_interval: timedelta | None = None
+    """When set, the fields are polled at this interval instead of the update
+    interval of the coordinator."""
+
+
+class CompositeModbusSensorEntity(CompositeModbusEntity, SensorEntity):
+    """Sensor whose value is computed from several Modbus fields.
+
+    The values are only combined again when one of them changed.
+    """
+
+    entity_description: CompositeModbusSensorEntityDescription
+
+    _modbus_values: tuple[Any, ...] | None = None
+
+    def __init__(
+        self,
+        coordinator: BaseModbusUpdateCoordinator,
+        description: CompositeModbusSensorEntityDescription,
+        unit: int | None = None,
+    ) -> None:
+        """Initialize the composite Modbus sensor."""
+        super().__init__(coordinator, description, unit)
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Update the value and availability from the coordinator data."""
+        values = self._get_modbus_values()
+
+        if values is not None:
+            if values != self._modbus_values:
+                self._attr_native_value = self.entity_description.value_fn(*values)
+            self._attr_available = True
+        else:
+            self._attr_available = False
+            self._attr_native_value = None
+        self._modbus_values = values
+
+
+@dataclass(frozen=True, kw_only=True)
+class ModbusStreamSensorEntityDescription(SensorEntityDescription):
+    """EntityDescription of a sensor exposing an aggregate of a streamed field."""
+
+    channel: int
+    """Index of the field in the fields of the streamer."""
+    statistic: StreamStatistic = StreamStatistic.MEAN
+
+
+class ModbusStreamSensorEntity(SensorEntity):
+    """Sensor exposing the minimum, maximum or mean of a streamed field.
+
+    It is updated once per window of the streamer, not on every sample.
+    """
+
+    entity_description: ModbusStreamSensorEntityDescription
+
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        streamer: ModbusStreamer,
+        description: ModbusStreamSensorEntityDescription,
+    ) -> None:
+        """Initialize the stream sensor."""
+        self.streamer = streamer
+        self.entity_description = description
+        self._async_update_attrs()
+
+    async def async_added_to_hass(self) -> None:
+        """Listen to new aggregates of the streamer."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.streamer.async_add_listener(self._handle_stream_update)
+        )
+
+    @callback
+    def _handle_stream_update(self) -> None:
+        """Handle a new aggregate of the streamer."""
+        self._async_update_attrs()
         self.async_write_ha_state()
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Update the value and availability from the latest aggregate."""
+        if (aggregate := self.streamer.latest) is None:
+            self._attr_available = False
+            self._attr_native_value = None
+            return
+        values = getattr(aggregate, self.entity_description.statistic.value)
+        self._attr_available = True
+        self._attr_native_value = values[self.entity_description.channel]
+
+
+@dataclass(frozen=True, kw_only=True)
+class ModbusStatsSensorEntityDescription(SensorEntityDescription):
+    """EntityDescription of a sensor exposing statistics of the Modbus communication."""
+
+    value_fn: Callable[[BaseModbusUpdateCoordinator], StateType]
+
+
+def _mean_ms(duration: float | None) -> float | None:
+    """Return a duration in milliseconds."""
+    return None if duration is None else round(duration * 1000, 1)
+
+
+MODBUS_STATS_SENSORS: tuple[ModbusStatsSensorEntityDescription, ...] = (
+    ModbusStatsSensorEntityDescription(
+        key="modbus_read_requests",
+        name="Modbus read requests",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.modbus_hub.stats.read_requests,
+    ),
+    ModbusStatsSensorEntityDescription(
+        key="modbus_errors",
+        name="Modbus errors",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: (
+            coordinator.modbus_hub.stats.error_responses
+            + coordinator.modbus_hub.stats.timeouts
+        ),
+    ),
+    ModbusStatsSensorEntityDescription(
+        key="modbus_read_latency",
+        name="Modbus read latency",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: _mean_ms(
+            coordinator.modbus_hub.stats.read_latency.mean
+        ),
+    ),
+    ModbusStatsSensorEntityDescription(
+        key="modbus_refresh_duration",
+        name="Modbus refresh duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: _mean_ms(coordinator.stats.refresh_duration.mean),
+    ),
+    ModbusStatsSensorEntityDescription(
+        key="modbus_read_efficiency",
+        name="Modbus read efficiency",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda coordinator: (
+            None
+            if (efficiency := coordinator.stats.read_efficiency) is None
+            else round(efficiency * 100, 1)
+        ),
+    ),
+)
+
+
+class ModbusStatsSensorEntity(
+    CoordinatorEntity[BaseModbusUpdateCoordinator], SensorEntity
+):
+    """Diagnostic sensor exposing statistics of the Modbus communication.
+
+    These sensors are disabled by default, which requires a unique ID: they
+    need a coordinator with a config entry. They are updated after every
+    refresh of the coordinator.
+    """
+
+    entity_description: ModbusStatsSensorEntityDescription
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: BaseModbusUpdateCoordinator,
+        description: ModbusStatsSensorEntityDescription,
+    ) -> None:
+        """Initialize the statistics sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        if (config_entry := coordinator.config_entry) is not None:
+            self._attr_unique_id = f"{config_entry.entry_id}_{description.key}"
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the value of the statistic."""
+        return self.entity_description.value_fn(self.coordinator)
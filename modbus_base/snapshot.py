@@ -0,0 +1,238 @@
+"""Compact snapshot of the registers read during a poll."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+import logging
+import struct
+from typing import Any, NamedTuple
+
+from .decoder import ModbusDecoder
+from .planner import ReadPlan, RegisterBlock, RegisterKey
+
+_LOGGER = logging.getLogger(__name__)
+
+REGISTER_SIZE = 2
+"""Size in bytes of a register."""
+
+
+class SnapshotLayer(NamedTuple):
+    """Buffers holding the result of executing a read plan.
+
+    Every batch of the plan has one buffer with the raw values as they were
+    sent on the wire: two big-endian bytes per register, or one byte (0 or 1)
+    per coil or discrete input. Batches which could not be read have no buffer.
+    """
+
+    plan: ReadPlan
+    buffers: Sequence[bytearray | None]
+
+
+class RegisterSnapshot(Mapping[RegisterKey, int | bool]):
+    """Register values read during one or more polls.
+
+    Values are stored in one contiguous buffer per read request instead of one
+    Python object per register. Entities can get a zero-copy memoryview over
+    their registers with view(), which is an O(1) lookup in the read plan.
+
+    A snapshot can contain several layers, for instance when poll tiers are
+    read at different moments. Newer layers take precedence over older ones.
+    """
+
+    __slots__ = ("_decoded", "_layers")
+
+    def __init__(self, layers: Sequence[SnapshotLayer] = ()) -> None:
+        """Initialize the snapshot, with the newest layer first."""
+        self._layers = tuple(layers)
+        self._decoded: dict[tuple[RegisterBlock, ModbusDecoder], Any] = {}
+
+    @property
+    def layers(self) -> tuple[SnapshotLayer, ...]:
+        """Return the layers of the snapshot, newest first."""
+        return self._layers
+
+    def _locate(self, key: RegisterKey) -> tuple[bytearray, int] | None:
+        """Return the buffer and byte offset of a register."""
+        for plan, buffers in self._layers:
+            if (location := plan.register_index.get(key)) is not None:
+                idx, offset = location
+                if (buffer := buffers[idx]) is not None:
+                    size = 1 if key[1].is_bit_table else REGISTER_SIZE
+                    return buffer, offset * size
+        return None
+
+    def view(self, block: RegisterBlock) -> memoryview | None:
+        """Return the raw bytes of a register block, or None when not read.
+
+        The view shares the memory of the snapshot when the block was read in
+        a single request.
+        """
+        size = 1 if block.table.is_bit_table else REGISTER_SIZE
+        for plan, buffers in self._layers:
+            if (location := plan.locations.get(block)) is not None:
+                idx, offset = location
+                if (buffer := buffers[idx]) is not None:
+                    return memoryview(buffer)[
+                        offset * size : (offset + len(block.registers)) * size
+                    ]
+
+        # the block was split over several requests, or is only partially
+        # available in each layer: gather it register per register
+        parts = []
+        for address in block.registers:
+            if (found := self._locate((block.unit, block.table, address))) is None:
+                return None
+            buffer, offset = found
+            parts.append(buffer[offset : offset + size])
+        return memoryview(b"".join(parts))
+
+    def decode(self, block: RegisterBlock, decoder: ModbusDecoder) -> Any:
+        """Return the decoded value of a register block, or None when not read.
+
+        Decoded values are cached, so that entities sharing the same registers
+        and decoder only decode them once.
+        """
+        try:
+            return self._decoded[block, decoder]
+        except KeyError:
+            pass
+
+        if (view := self.view(block)) is None:
+            value = None
+        else:
+            try:
+                value = decoder.decode(view)
+            except (ValueError, struct.error) as err:
+                _LOGGER.warning(
+                    "Could not decode %s registers %s of unit %d: %s",
+                    block.table,
+                    block.registers,
+                    block.unit,
+                    err,
+                )
+                value = None
+
+        self._decoded[block, decoder] = value
+        return value
+
+    def decode_all(self, items: Iterable[tuple[RegisterBlock, ModbusDecoder]]) -> None:
+        """Decode all register blocks in a single pass over the snapshot."""
+        decoded = self._decoded
+        decode = self.decode
+        for item in items:
+            if item not in decoded:
+                decode(*item)
+
+    def changed_registers(self, previous: RegisterSnapshot) -> set[RegisterKey]:
+        """Return the registers of the newest layer which differ from previous.
+
+        Registers which are new, or which could not be read anymore, are
+        considered changed. Batches whose bytes are identical to the previous
+        read of the same plan are skipped with a single comparison.
+        """
+        if not self._layers:
+            return set(previous)
+
+        plan, buffers = self._layers[0]
+        # only the newest layer of previous holds the effective values of all
+        # its registers, older layers can be shadowed
+        previous_buffers = (
+            previous.layers[0].buffers
+            if previous.layers and previous.layers[0].plan is plan
+            else None
+        )
+
+        changed: set[RegisterKey] = set()
+        for idx, batch in enumerate(plan.batches):
+            buffer = buffers[idx]
+            size = 1 if batch.table.is_bit_table else REGISTER_SIZE
+
+            if (
+                buffer is not None
+                and previous_buffers is not None
+                and (previous_buffer := previous_buffers[idx]) is not None
+            ):
+                if buffer == previous_buffer:
+                    continue
+                for offset, address in enumerate(batch.registers):
+                    start = offset * size
+                    if (
+                        buffer[start : start + size]
+                        != previous_buffer[start : start + size]
+                    ):
+                        changed.add((batch.unit, batch.table, address))
+                continue
+
+            for offset, address in enumerate(batch.registers):
+                key = (batch.unit, batch.table, address)
+                found = previous._locate(key)
+                if buffer is None or found is None:
+                    if buffer is not None or found is not None:
+                        changed.add(key)
+                    continue
+                previous_buffer, previous_offset = found
+                start = offset * size
+                if (
+                    buffer[start : start + size]
+                    != previous_buffer[previous_offset : previous_offset + size]
+                ):
+                    changed.add(key)
+
+        # registers of dropped layers which are not read anymore
+        for layer in previous.layers:
+            if layer.plan is plan or any(layer is known for known in self._layers):
+                continue
+            for key, (idx, _) in layer.plan.register_index.items():
+                if layer.buffers[idx] is not None and key not in self:
+                    changed.add(key)
+
+        return changed
+
+    def __getitem__(self, key: RegisterKey) -> int | bool:
+        """Return the value of a single register, coil or discrete input."""
+        if (found := self._locate(key)) is None:
+            raise KeyError(key)
+        buffer, offset = found
+        if key[1].is_bit_table:
+            return bool(buffer[offset])
+        return int.from_bytes(buffer[offset : offset + REGISTER_SIZE], "big")
+
+    def __setitem__(self, key: RegisterKey, value: int | bool) -> None:
+        """Overwrite the value of a register which is part of the snapshot."""
+        if (found := self._locate(key)) is None:
+            raise KeyError(key)
+        buffer, offset = found
+        self._decoded.clear()
+        if key[1].is_bit_table:
+            buffer[offset] = bool(value)
+        else:
+            buffer[offset : offset + REGISTER_SIZE] = int(value).to_bytes(
+                REGISTER_SIZE, "big"
+            )
+
+    def __contains__(self, key: object) -> bool:
+        """Return whether the register is part of the snapshot."""
+        return isinstance(key, tuple) and self._locate(key) is not None  # type: ignore[arg-type]
+
+    def __iter__(self) -> Iterator[RegisterKey]:
+        """Iterate over all registers in the snapshot."""
+        seen: set[RegisterKey] = set()
+        for plan, buffers in self._layers:
+            for key, (idx, _) in plan.register_index.items():
+                if buffers[idx] is not None and key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        """Return the number of registers in the snapshot."""
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        """Return whether any register was read."""
+        return any(
+            buffer is not None for _, buffers in self._layers for buffer in buffers
+        )
+
+    def __repr__(self) -> str:
+        """Return a representation of the snapshot."""
+        return f"RegisterSnapshot({dict(self)!r})"
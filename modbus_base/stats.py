@@ -0,0 +1,183 @@
+"""Lightweight statistics about the Modbus communication."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field, fields
+from typing import Any
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.002,
+    0.005,
+    0.01,
+    0.02,
+    0.05,
+    0.1,
+    0.2,
+    0.5,
+    1.0,
+    2.0,
+    5.0,
+    10.0,
+)
+"""Upper bounds (in seconds) of the buckets of a latency histogram."""
+
+
+class LatencyHistogram:
+    """Histogram of durations, with fixed buckets.
+
+    Recording a duration is a bisect and a few additions, so that histograms
+    can always be enabled.
+    """
+
+    __slots__ = ("counts", "max", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        # the last bucket holds the durations above the largest bound
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, duration: float) -> None:
+        """Record a duration, in seconds."""
+        self.counts[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    @property
+    def count(self) -> int:
+        """Return the number of recorded durations."""
+        return sum(self.counts)
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean duration, or None when nothing was recorded."""
+        count = self.count
+        return self.total / count if count else None
+
+    def percentile(self, percentile: float) -> float | None:
+        """Return the upper bound of the bucket containing the percentile.
+
+        Durations above the largest bucket are reported as the maximum.
+        """
+        if not (count := self.count):
+            return None
+        threshold = count * percentile / 100
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.counts, strict=False):
+            seen += bucket_count
+            if seen >= threshold:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram as a dict, for diagnostics."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "max": self.max,
+            "buckets": {
+                f"<={bound}": bucket_count
+                for bound, bucket_count in zip(
+                    LATENCY_BUCKETS, self.counts, strict=False
+                )
+            }
+            | {f">{LATENCY_BUCKETS[-1]}": self.counts[-1]},
+        }
+
+
+def _as_dict(stats: Any) -> dict[str, Any]:
+    """Return the counters and histograms of a stats dataclass as a dict."""
+    return {
+        stat.name: value.as_dict()
+        if isinstance(value := getattr(stats, stat.name), LatencyHistogram)
+        else value
+        for stat in fields(stats)
+    }
+
+
+@dataclass(slots=True)
+class ModbusHubStats:
+    """Statistics of the requests performed by a ModbusHub."""
+
+    read_requests: int = 0
+    write_requests: int = 0
+    registers_read: int = 0
+    """Registers, coils and discrete inputs read."""
+    values_written: int = 0
+    """Registers and coils written."""
+    error_responses: int = 0
+    timeouts: int = 0
+    cache_hits: int = 0
+    """Ad-hoc reads answered from the read cache."""
+    cache_misses: int = 0
+    """Ad-hoc reads which needed a request of their own."""
+    shared_reads: int = 0
+    """Ad-hoc reads which waited for a read already in progress."""
+
+    lock_wait: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time waited for the connection to be free."""
+    cooldown: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time slept between requests."""
+    read_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Round trip time of every read request."""
+    write_latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time between queueing a write and its completion."""
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics as a dict, for diagnostics."""
+        return _as_dict(self)
+
+
+@dataclass(slots=True)
+class CoordinatorStats:
+    """Statistics of the refreshes of a BaseModbusUpdateCoordinator."""
+
+    refreshes: int = 0
+    registers_read: int = 0
+    """Registers read by the read plans, including the gaps between blocks."""
+    registers_used: int = 0
+    """Registers read which are used by an entity."""
+    listeners_updated: int = 0
+    listeners_skipped: int = 0
+    """Listeners not updated because their registers didn't change."""
+
+    refresh_duration: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time to execute the read plan of every refresh."""
+    decode_duration: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time to decode the values of the refreshed entities."""
+    dispatch_duration: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time to update the listeners after every refresh."""
+
+    @property
+    def read_efficiency(self) -> float | None:
+        """Return the fraction of the registers read which are used."""
+        if not self.registers_read:
+            return None
+        return self.registers_used / self.registers_read
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics as a dict, for diagnostics."""
+        return _as_dict(self) | {"read_efficiency": self.read_efficiency}
+
+
+@dataclass(slots=True)
+class SchedulerStats:
+    """Statistics of the polls started by a ModbusPollScheduler."""
+
+    polls: int = 0
+    skipped_polls: int = 0
+    """Polls dropped because the previous poll overran."""
+    merged_polls: int = 0
+    """Overrunning polls after which the next poll was started right away."""
+
+    poll_lag: LatencyHistogram = field(default_factory=LatencyHistogram)
+    """Time between the scheduled start of a poll and its actual start."""
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics as a dict, for diagnostics."""
+        return _as_dict(self)
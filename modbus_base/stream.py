@@ -0,0 +1,332 @@
+"""High-frequency sampling of a few registers into a ring buffer."""
+
+from __future__ import annotations
+
+from array import array
+import asyncio
+from collections.abc import Callable, Sequence
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+import math
+import struct
+from typing import Any
+
+from pymodbus.exceptions import ModbusException
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+from .const import (
+    DEFAULT_STREAM_CAPACITY,
+    DEFAULT_STREAM_INTERVAL,
+    DEFAULT_STREAM_WINDOW,
+    MIN_STREAM_INTERVAL,
+)
+from .entity import ModbusField, SimpleModbusRegisterType
+from .modbus import ModbusHub
+from .planner import ReadPlan
+from .snapshot import REGISTER_SIZE
+
+_LOGGER = logging.getLogger(__name__)
+
+_NON_NUMERIC_TYPES = (SimpleModbusRegisterType.STRING, SimpleModbusRegisterType.BITS)
+
+_MAX_FAILURE_BACKOFF = 10.0
+"""Maximum wait in seconds between samples after consecutive missed samples."""
+
+
+class SampleRingBuffer:
+    """Fixed-size buffer of the latest samples of several channels.
+
+    The timestamps and values are stored in preallocated arrays of doubles,
+    so appending a sample doesn't allocate memory.
+    """
+
+    __slots__ = ("_count", "_next", "_timestamps", "_values", "capacity", "channels")
+
+    def __init__(self, capacity: int, channels: int) -> None:
+        """Initialize an empty buffer."""
+        if capacity < 1 or channels < 1:
+            raise ValueError("capacity and channels must be at least 1")
+        self.capacity = capacity
+        self.channels = channels
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity * channels))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples in the buffer."""
+        return self._count
+
+    def append(self, timestamp: float, values: Sequence[float]) -> None:
+        """Add a sample, overwriting the oldest one when the buffer is full."""
+        idx = self._next
+        self._timestamps[idx] = timestamp
+        offset = idx * self.channels
+        for channel, value in enumerate(values):
+            self._values[offset + channel] = value
+        self._next = (idx + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def window(self, count: int | None = None) -> tuple[array, array]:
+        """Return the timestamps and values of the latest samples, oldest first.
+
+        The values of the channels of every sample are interleaved. Both arrays
+        are copies, made without creating an object per sample.
+        """
+        count = self._count if count is None else min(count, self._count)
+        start = (self._next - count) % self.capacity
+        if start + count <= self.capacity:
+            return (
+                self._timestamps[start : start + count],
+                self._values[start * self.channels : (start + count) * self.channels],
+            )
+        wrapped = start + count - self.capacity
+        return (
+            self._timestamps[start:] + self._timestamps[:wrapped],
+            self._values[start * self.channels :]
+            + self._values[: wrapped * self.channels],
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class StreamAggregate:
+    """Aggregates of the samples of every channel over a window."""
+
+    start: float
+    """Event loop time of the first sample of the window."""
+    end: float
+    """Event loop time of the last sample of the window."""
+    count: int
+    minimum: tuple[float, ...]
+    maximum: tuple[float, ...]
+    mean: tuple[float, ...]
+
+
+class ModbusStreamer:
+    """Samples a few Modbus fields as fast as needed, into a ring buffer.
+
+    Unlike the coordinator, the streamer doesn't update entities on every
+    sample: its listeners are called with the minimum, maximum and mean of
+    every channel once per window. The raw samples are kept in buffer.
+
+    Samples bypass the read cache of the hub: the registers are read into
+    buffers allocated once per read plan, and decoded into a preallocated
+    sample. Timestamps are event loop times, which are monotonic.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        hub: ModbusHub,
+        fields: Sequence[ModbusField],
+        *,
+        interval: timedelta = DEFAULT_STREAM_INTERVAL,
+        window: timedelta = DEFAULT_STREAM_WINDOW,
+        capacity: int = DEFAULT_STREAM_CAPACITY,
+    ) -> None:
+        """Initialize the streamer.
+
+        Every field is a channel of the buffer, in the given order, and must
+        hold a number. The interval must be at least MIN_STREAM_INTERVAL.
+        """
+        if any(field.register_type in _NON_NUMERIC_TYPES for field in fields):
+            raise ValueError("Only numeric fields can be streamed")
+        if interval < MIN_STREAM_INTERVAL:
+            raise ValueError(f"The interval must be at least {MIN_STREAM_INTERVAL}")
+
+        self.hass = hass
+        self.hub = hub
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.window = window
+        self.buffer = SampleRingBuffer(capacity, len(self.fields))
+        self.latest: StreamAggregate | None = None
+        """Aggregates of the last complete window."""
+        self.samples = 0
+        self.missed_samples = 0
+        """Samples which could not be read or decoded."""
+        self.late_samples = 0
+        """Samples which started after the next one was due."""
+
+        channels = len(self.fields)
+        self._sample = array("d", bytes(8 * channels))
+        self._window_start: float | None = None
+        self._window_end = 0.0
+        self._window_count = 0
+        self._window_min = array("d", bytes(8 * channels))
+        self._window_max = array("d", bytes(8 * channels))
+        self._window_sum = array("d", bytes(8 * channels))
+        self._reset_window()
+
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._task: asyncio.Task[None] | None = None
+        self._read_plan: ReadPlan | None = None
+        self._read_plan_version = -1
+        self._read_buffers: list[bytearray] = []
+        self._channel_decoders: list[tuple[memoryview, Callable[[memoryview], Any]]]
+        self._channel_decoders = []
+
+    def _reset_window(self) -> None:
+        """Start aggregating a new window."""
+        self._window_start = None
+        self._window_count = 0
+        for channel in range(len(self.fields)):
+            self._window_min[channel] = math.inf
+            self._window_max[channel] = -math.inf
+            self._window_sum[channel] = 0.0
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Call update_callback with every new aggregate, in latest."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def _remove_listener() -> None:
+            self._listeners.remove(update_callback)
+
+        return _remove_listener
+
+    @callback
+    def async_start(self) -> None:
+        """Start sampling.
+
+        Raises ModbusException when a field can't be read in a single request.
+        """
+        if self._task is None:
+            self._compile()
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), name="Modbus streamer"
+            )
+
+    async def async_stop(self) -> None:
+        """Stop sampling."""
+        if (task := self._task) is not None:
+            self._task = None
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _async_run(self) -> None:
+        """Sample on a fixed grid, without catching up on late samples.
+
+        After consecutive missed samples, the wait between samples is doubled
+        up to _MAX_FAILURE_BACKOFF, so that a device which doesn't answer is
+        not flooded with requests. Sampling stops when a field can't be read
+        anymore.
+        """
+        loop = asyncio.get_running_loop()
+        interval = self.interval.total_seconds()
+        next_sample_at = loop.time()
+        failures = 0
+        while True:
+            if self._read_plan_version != self.hub.read_plan_version:
+                try:
+                    self._compile()
+                except ModbusException as err:
+                    _LOGGER.error("Stopped sampling: %s", err)
+                    self._task = None
+                    return
+
+            missed_samples = self.missed_samples
+            try:
+                await self._async_sample()
+            except Exception:
+                self.missed_samples += 1
+                _LOGGER.exception("Unexpected error while sampling")
+            failures = failures + 1 if self.missed_samples > missed_samples else 0
+
+            next_sample_at += interval
+            if failures:
+                backoff = min(interval * 2 ** min(failures, 16), _MAX_FAILURE_BACKOFF)
+                next_sample_at = max(next_sample_at, loop.time() + backoff)
+            if (delay := next_sample_at - loop.time()) < 0:
+                self.late_samples += 1
+                next_sample_at -= delay
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def _compile(self) -> None:
+        """Compile the read plan, with its buffers and the views of every channel."""
+        self._read_plan = None
+        self._read_plan_version = self.hub.read_plan_version
+        plan = self.hub.compile_read_plan(field.modbus_block for field in self.fields)
+        self._read_buffers = [
+            bytearray(
+                batch.count if batch.table.is_bit_table else batch.count * REGISTER_SIZE
+            )
+            for batch in plan.batches
+        ]
+        self._channel_decoders = []
+        for field in self.fields:
+            block = field.modbus_block
+            if (location := plan.locations.get(block)) is None:
+                raise ModbusException(
+                    f"Registers {block.registers} of unit {block.unit} can't be read"
+                    " in a single request"
+                )
+            idx, offset = location
+            size = 1 if block.table.is_bit_table else REGISTER_SIZE
+            view = memoryview(self._read_buffers[idx])[
+                offset * size : (offset + len(block.registers)) * size
+            ]
+            self._channel_decoders.append((view, field.modbus_decoder.decode))
+        self._read_plan = plan
+
+    async def _async_sample(self) -> None:
+        """Read and record a single sample."""
+        assert self._read_plan is not None
+        try:
+            complete = await self.hub.read_plan_into(
+                self._read_plan, self._read_buffers
+            )
+        except ModbusException as err:
+            self.missed_samples += 1
+            _LOGGER.debug("Could not read a sample: %s", err)
+            return
+        if not complete:
+            self.missed_samples += 1
+            return
+
+        timestamp = self.hass.loop.time()
+        sample = self._sample
+        try:
+            for channel, (view, decode) in enumerate(self._channel_decoders):
+                sample[channel] = decode(view)
+        except (ValueError, struct.error) as err:
+            self.missed_samples += 1
+            _LOGGER.debug("Could not decode a sample: %s", err)
+            return
+
+        self.samples += 1
+        self.buffer.append(timestamp, sample)
+        self._aggregate(timestamp, sample)
+
+    def _aggregate(self, timestamp: float, sample: array) -> None:
+        """Add a sample to the current window, and publish it when complete."""
+        if self._window_start is None:
+            self._window_start = timestamp
+        self._window_end = timestamp
+        self._window_count += 1
+        for channel, value in enumerate(sample):
+            self._window_min[channel] = min(self._window_min[channel], value)
+            self._window_max[channel] = max(self._window_max[channel], value)
+            self._window_sum[channel] += value
+
+        if timestamp - self._window_start < self.window.total_seconds():
+            return
+
+        count = self._window_count
+        self.latest = StreamAggregate(
+            start=self._window_start,
+            end=self._window_end,
+            count=count,
+            minimum=tuple(self._window_min),
+            maximum=tuple(self._window_max),
+            mean=tuple(total / count for total in self._window_sum),
+        )
+        self._reset_window()
+        for update_callback in list(self._listeners):
+            update_callback()
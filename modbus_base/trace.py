@@ -0,0 +1,490 @@
+"""Recording of Modbus traffic into compact traces, and their replay."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Iterable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+import struct
+import time
+from typing import Any
+
+from pymodbus.client import ModbusBaseClient
+from pymodbus.exceptions import ConnectionException, ModbusException, ModbusIOException
+from pymodbus.pdu import ExceptionResponse, ModbusPDU
+from pymodbus.pdu.bit_message import (
+    ReadCoilsResponse,
+    ReadDiscreteInputsResponse,
+    WriteMultipleCoilsResponse,
+    WriteSingleCoilResponse,
+)
+from pymodbus.pdu.register_message import (
+    ReadHoldingRegistersResponse,
+    ReadInputRegistersResponse,
+    WriteMultipleRegistersResponse,
+    WriteSingleRegisterResponse,
+)
+
+TRACE_MAGIC = b"MBTRACE\x01"
+"""Start of a trace file, including the version of the format."""
+
+NO_RESPONSE = 0xFF
+"""Exception code of a request which got no response."""
+CONNECTION_ERROR = 0xFE
+"""Exception code of a request which failed because of the connection."""
+CLIENT_ERROR = 0xFD
+"""Exception code of a request which failed with another client error."""
+
+_RECORD = struct.Struct("<dfBBHHBH")
+"""Start, duration, function code, unit, address, count, exception code and
+payload size of a record."""
+
+_BIT_FUNCTION_CODES = {0x01, 0x02, 0x05, 0x0F}
+_READ_FUNCTION_CODES = {0x01, 0x02, 0x03, 0x04}
+
+_RESPONSES: dict[int, type[ModbusPDU]] = {
+    0x01: ReadCoilsResponse,
+    0x02: ReadDiscreteInputsResponse,
+    0x03: ReadHoldingRegistersResponse,
+    0x04: ReadInputRegistersResponse,
+    0x05: WriteSingleCoilResponse,
+    0x06: WriteSingleRegisterResponse,
+    0x0F: WriteMultipleCoilsResponse,
+    0x10: WriteMultipleRegistersResponse,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class TraceRecord:
+    """A request and its response."""
+
+    started_at: float
+    """Time (in seconds) at which the request was sent, since the start of the trace."""
+    duration: float
+    """Time (in seconds) until the response was received."""
+    function_code: int
+    unit: int
+    address: int
+    count: int
+    exception_code: int
+    """Exception code of the response, 0 for a regular response, or NO_RESPONSE,
+    CONNECTION_ERROR or CLIENT_ERROR when the request raised."""
+    payload: bytes
+    """Values read or written: registers as big-endian words, or packed bits."""
+
+    @property
+    def values(self) -> list[int] | list[bool]:
+        """Return the values read or written."""
+        if self.function_code in _BIT_FUNCTION_CODES:
+            return _unpack_bits(self.payload)
+        return list(struct.unpack(f">{len(self.payload) // 2}H", self.payload))
+
+
+@dataclass(slots=True)
+class ModbusTrace:
+    """Requests and responses of a Modbus client, in the order they were sent."""
+
+    records: list[TraceRecord] = field(default_factory=list)
+
+    def to_bytes(self) -> bytes:
+        """Return the trace in its binary format."""
+        parts = [TRACE_MAGIC]
+        for record in self.records:
+            parts.append(
+                _RECORD.pack(
+                    record.started_at,
+                    record.duration,
+                    record.function_code,
+                    record.unit,
+                    record.address,
+                    record.count,
+                    record.exception_code,
+                    len(record.payload),
+                )
+            )
+            parts.append(record.payload)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> ModbusTrace:
+        """Return the trace stored in data."""
+        if not data.startswith(TRACE_MAGIC):
+            raise ValueError("Not a Modbus trace, or an unsupported version")
+        records: list[TraceRecord] = []
+        offset = len(TRACE_MAGIC)
+        while offset < len(data):
+            *fields, payload_size = _RECORD.unpack_from(data, offset)
+            offset += _RECORD.size
+            payload = data[offset : offset + payload_size]
+            if len(payload) != payload_size:
+                raise ValueError("Truncated Modbus trace")
+            offset += payload_size
+            records.append(TraceRecord(*fields, payload=payload))
+        return cls(records)
+
+    def save(self, path: str | Path) -> None:
+        """Write the trace to a file.
+
+        This does blocking I/O: run it in the executor.
+        """
+        Path(path).write_bytes(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str | Path) -> ModbusTrace:
+        """Read a trace from a file.
+
+        This does blocking I/O: run it in the executor.
+        """
+        return cls.from_bytes(Path(path).read_bytes())
+
+
+class RecordingModbusClient:
+    """Client which records the traffic of another client into a trace.
+
+    Only the requests of the pymodbus client API used by ModbusHub are
+    recorded. Everything else is passed through to the wrapped client.
+    """
+
+    def __init__(self, client: ModbusBaseClient, trace: ModbusTrace) -> None:
+        """Initialize the recording client."""
+        self.client = client
+        self.trace = trace
+        self._started_at = time.monotonic()
+
+    def __getattr__(self, name: str) -> Any:
+        """Return the attributes of the wrapped client."""
+        return getattr(self.client, name)
+
+    async def _record(
+        self,
+        function_code: int,
+        address: int,
+        count: int,
+        slave: int,
+        written: Sequence[int | bool] | None,
+        request: Awaitable[Any],
+    ) -> Any:
+        """Wait for a request of the wrapped client, and record it."""
+        started_at = time.monotonic()
+        try:
+            response = await request
+        except ModbusException as err:
+            if isinstance(err, ModbusIOException):
+                exception_code = NO_RESPONSE
+            elif isinstance(err, ConnectionException):
+                exception_code = CONNECTION_ERROR
+            else:
+                exception_code = CLIENT_ERROR
+            self._append(
+                function_code,
+                address,
+                count,
+                slave,
+                exception_code,
+                written,
+                started_at,
+            )
+            raise
+
+        if response.isError():
+            exception_code = response.exception_code
+            values = written
+        else:
+            exception_code = 0
+            if written is not None:
+                values = written
+            elif function_code in _BIT_FUNCTION_CODES:
+                values = response.bits[:count]
+            else:
+                values = response.registers
+        self._append(
+            function_code, address, count, slave, exception_code, values, started_at
+        )
+        return response
+
+    def _append(
+        self,
+        function_code: int,
+        address: int,
+        count: int,
+        unit: int,
+        exception_code: int,
+        values: Sequence[int | bool] | None,
+        started_at: float,
+    ) -> None:
+        """Append a record to the trace."""
+        if not values:
+            payload = b""
+        elif function_code in _BIT_FUNCTION_CODES:
+            payload = _pack_bits(values)
+        else:
+            payload = struct.pack(f">{len(values)}H", *values)
+        self.trace.records.append(
+            TraceRecord(
+                started_at=started_at - self._started_at,
+                duration=time.monotonic() - started_at,
+                function_code=function_code,
+                unit=unit,
+                address=address,
+                count=count,
+                exception_code=exception_code,
+                payload=payload,
+            )
+        )
+
+    async def read_coils(self, address: int, *, count: int = 1, slave: int = 1) -> Any:
+        """Read coils, and record the request."""
+        return await self._record(
+            0x01,
+            address,
+            count,
+            slave,
+            None,
+            self.client.read_coils(address, count=count, slave=slave),
+        )
+
+    async def read_discrete_inputs(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read discrete inputs, and record the request."""
+        return await self._record(
+            0x02,
+            address,
+            count,
+            slave,
+            None,
+            self.client.read_discrete_inputs(address, count=count, slave=slave),
+        )
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read holding registers, and record the request."""
+        return await self._record(
+            0x03,
+            address,
+            count,
+            slave,
+            None,
+            self.client.read_holding_registers(address, count=count, slave=slave),
+        )
+
+    async def read_input_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read input registers, and record the request."""
+        return await self._record(
+            0x04,
+            address,
+            count,
+            slave,
+            None,
+            self.client.read_input_registers(address, count=count, slave=slave),
+        )
+
+    async def write_coil(self, address: int, value: bool, *, slave: int = 1) -> Any:
+        """Write a single coil, and record the request."""
+        return await self._record(
+            0x05,
+            address,
+            1,
+            slave,
+            [value],
+            self.client.write_coil(address, value, slave=slave),
+        )
+
+    async def write_register(self, address: int, value: int, *, slave: int = 1) -> Any:
+        """Write a single register, and record the request."""
+        return await self._record(
+            0x06,
+            address,
+            1,
+            slave,
+            [value],
+            self.client.write_register(address, value, slave=slave),
+        )
+
+    async def write_coils(
+        self, address: int, values: list[bool], *, slave: int = 1
+    ) -> Any:
+        """Write multiple coils, and record the request."""
+        return await self._record(
+            0x0F,
+            address,
+            len(values),
+            slave,
+            values,
+            self.client.write_coils(address, values, slave=slave),
+        )
+
+    async def write_registers(
+        self, address: int, values: list[int], *, slave: int = 1
+    ) -> Any:
+        """Write multiple registers, and record the request."""
+        return await self._record(
+            0x10,
+            address,
+            len(values),
+            slave,
+            values,
+            self.client.write_registers(address, values, slave=slave),
+        )
+
+
+class ReplayModbusClient:
+    """Client which answers requests with the responses of a trace.
+
+    Every request is answered with the next recorded response to the same
+    request, i.e. with the same function code, unit, address and count. With
+    realtime, a request is not answered before the gap between its recorded
+    request and the previous one in the trace elapsed since the previous
+    request, and then takes as long as it did when it was recorded; otherwise
+    responses are returned right away. Recorded timeouts, connection errors
+    and client errors are raised again. With repeat, the responses
+    to a request are replayed again once all were used, so that a short trace
+    can answer any number of polls.
+
+    Requests which were not recorded get no response: they raise a
+    ModbusIOException, like a timeout, and are counted in unmatched_requests.
+    """
+
+    def __init__(
+        self, trace: ModbusTrace, *, realtime: bool = True, repeat: bool = False
+    ) -> None:
+        """Initialize the replay client."""
+        self.realtime = realtime
+        self.repeat = repeat
+        self.unmatched_requests = 0
+        self._connected = False
+        self._last_request_at: float | None = None
+        # every record with the time between its request and the previous one
+        self._responses: dict[
+            tuple[int, int, int, int], deque[tuple[TraceRecord, float]]
+        ] = {}
+        previous_started_at: float | None = None
+        for record in trace.records:
+            gap = (
+                0.0
+                if previous_started_at is None
+                else max(record.started_at - previous_started_at, 0.0)
+            )
+            previous_started_at = record.started_at
+            self._responses.setdefault(_request_key(record), deque()).append(
+                (record, gap)
+            )
+
+    @property
+    def connected(self) -> bool:
+        """Return whether the client is connected."""
+        return self._connected
+
+    async def connect(self) -> bool:
+        """Connect to the replayed device."""
+        self._connected = True
+        return True
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._connected = False
+
+    async def _replay(
+        self, function_code: int, address: int, count: int, slave: int
+    ) -> ModbusPDU:
+        """Return the next recorded response to a request."""
+        responses = self._responses.get((function_code, slave, address, count))
+        if not responses:
+            self.unmatched_requests += 1
+            raise ModbusIOException(
+                f"No recorded response to function code {function_code} for unit"
+                f" {slave} at address {address} with count {count}"
+            )
+        record, gap = item = responses.popleft()
+        if self.repeat:
+            responses.append(item)
+
+        if self.realtime:
+            loop = asyncio.get_running_loop()
+            if self._last_request_at is not None:
+                await asyncio.sleep(self._last_request_at + gap - loop.time())
+            self._last_request_at = loop.time()
+            await asyncio.sleep(record.duration)
+        if record.exception_code == NO_RESPONSE:
+            raise ModbusIOException("No response received (replayed)")
+        if record.exception_code == CONNECTION_ERROR:
+            raise ConnectionException("Connection lost (replayed)")
+        if record.exception_code == CLIENT_ERROR:
+            raise ModbusException("Client error (replayed)")
+        if record.exception_code:
+            return ExceptionResponse(function_code, record.exception_code, slave=slave)
+
+        response_class = _RESPONSES[function_code]
+        if function_code not in _READ_FUNCTION_CODES:
+            return response_class(dev_id=slave, address=address, count=count)
+        if function_code in _BIT_FUNCTION_CODES:
+            return response_class(dev_id=slave, bits=record.values)
+        return response_class(dev_id=slave, registers=record.values)
+
+    async def read_coils(self, address: int, *, count: int = 1, slave: int = 1) -> Any:
+        """Read coils (code 0x01)."""
+        return await self._replay(0x01, address, count, slave)
+
+    async def read_discrete_inputs(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read discrete inputs (code 0x02)."""
+        return await self._replay(0x02, address, count, slave)
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read holding registers (code 0x03)."""
+        return await self._replay(0x03, address, count, slave)
+
+    async def read_input_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        """Read input registers (code 0x04)."""
+        return await self._replay(0x04, address, count, slave)
+
+    async def write_coil(self, address: int, value: bool, *, slave: int = 1) -> Any:
+        """Write a single coil (code 0x05)."""
+        return await self._replay(0x05, address, 1, slave)
+
+    async def write_register(self, address: int, value: int, *, slave: int = 1) -> Any:
+        """Write a single register (code 0x06)."""
+        return await self._replay(0x06, address, 1, slave)
+
+    async def write_coils(
+        self, address: int, values: list[bool], *, slave: int = 1
+    ) -> Any:
+        """Write multiple coils (code 0x0F)."""
+        return await self._replay(0x0F, address, len(values), slave)
+
+    async def write_registers(
+        self, address: int, values: list[int], *, slave: int = 1
+    ) -> Any:
+        """Write multiple registers (code 0x10)."""
+        return await self._replay(0x10, address, len(values), slave)
+
+
+def _request_key(record: TraceRecord) -> tuple[int, int, int, int]:
+    """Return the request a record answers."""
+    return (record.function_code, record.unit, record.address, record.count)
+
+
+def _pack_bits(values: Iterable[int | bool]) -> bytes:
+    """Pack bits into bytes, least significant bit first."""
+    packed = bytearray()
+    for idx, value in enumerate(values):
+        if idx % 8 == 0:
+            packed.append(0)
+        if value:
+            packed[-1] |= 1 << (idx % 8)
+    return bytes(packed)
+
+
+def _unpack_bits(data: bytes) -> list[bool]:
+    """Unpack bits packed by _pack_bits, padded to whole bytes."""
+    return [bool(byte >> bit & 1) for byte in data for bit in range(8)]
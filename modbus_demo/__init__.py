@@ -2,15 +2,25 @@
 
 from __future__ import annotations
 
+import dataclasses
 from dataclasses import dataclass
 import logging
 
 from pymodbus.client import AsyncModbusTcpClient
 
-from homeassistant.components.modbus_base import BaseModbusUpdateCoordinator, ModbusHub
+from homeassistant.components.modbus_base import (
+    BaseModbusUpdateCoordinator,
+    DeviceProfile,
+    ModbusHub,
+    async_acquire_shared_hub,
+    async_get_profile_store,
+    async_release_shared_hub,
+    get_poll_scheduler,
+    tcp_endpoint,
+)
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, CONF_PORT, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 
 from .const import UPDATE_INTERVAL
@@ -24,7 +34,7 @@ _LOGGER = logging.getLogger(__name__)
 class ModbusDemoConfigEntryData:
     """Modbus Demo config entry runtime data."""
 
-    client: AsyncModbusTcpClient
+    hub_key: tuple[str, str, int]
     coordinator: BaseModbusUpdateCoordinator
 
 
@@ -34,25 +44,56 @@ type ModbusDemoConfigEntry = ConfigEntry[ModbusDemoConfigEntryData]
 async def async_setup_entry(hass: HomeAssistant, entry: ModbusDemoConfigEntry) -> bool:
     """Set up Modbus Demo from a config entry."""
 
-    client = AsyncModbusTcpClient(entry.data[CONF_HOST], port=entry.data[CONF_PORT])
-
-    if not await client.connect():
-        raise ConfigEntryNotReady("Could not connect to the Modbus device")
-
-    _LOGGER.debug(
-        "Connected to the Modbus device at %s:%s",
-        entry.data[CONF_HOST],
-        entry.data[CONF_PORT],
-    )
-    hub = ModbusHub(hass, client)
-    entry.runtime_data = ModbusDemoConfigEntryData(
-        client=client,
-        coordinator=BaseModbusUpdateCoordinator(
-            hass, _LOGGER, hub, "Demo", UPDATE_INTERVAL
-        ),
-    )
-
-    await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
+    host: str = entry.data[CONF_HOST]
+    port: int = entry.data[CONF_PORT]
+
+    async def create_hub() -> ModbusHub:
+        client = AsyncModbusTcpClient(host, port=port)
+        if not await client.connect():
+            raise ConfigEntryNotReady("Could not connect to the Modbus device")
+        _LOGGER.debug("Connected to the Modbus device at %s:%s", host, port)
+        return ModbusHub(hass, client)
+
+    hub_key = tcp_endpoint(host, port)
+    hub = await async_acquire_shared_hub(hass, hub_key, create_hub)
+
+    try:
+        # reuse what was learned about the device before the restart, so that the
+        # first poll already skips its illegal addresses
+        profile_store = await async_get_profile_store(hass)
+        device_id = entry.unique_id or entry.entry_id
+        if (profile := profile_store.get(device_id)) is not None:
+            hub.apply_profile(profile)
+        else:
+            profile = DeviceProfile()
+
+        @callback
+        def export_profile() -> DeviceProfile:
+            return dataclasses.replace(
+                hub.export_profile(),
+                fingerprint=profile.fingerprint,
+                identity=profile.identity,
+            )
+
+        entry.async_on_unload(profile_store.async_track(device_id, export_profile))
+        entry.runtime_data = ModbusDemoConfigEntryData(
+            hub_key=hub_key,
+            coordinator=BaseModbusUpdateCoordinator(
+                hass,
+                _LOGGER,
+                hub,
+                "Demo",
+                UPDATE_INTERVAL,
+                scheduler=get_poll_scheduler(hass),
+                config_entry=entry,
+            ),
+        )
+
+        await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
+    except BaseException:
+        # the hub is only released on unload once the entry is set up
+        await async_release_shared_hub(hass, hub_key)
+        raise
 
     return True
 
@@ -60,6 +101,6 @@ async def async_setup_entry(hass: HomeAssistant, entry: ModbusDemoConfigEntry) -
 async def async_unload_entry(hass: HomeAssistant, entry: ModbusDemoConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, _PLATFORMS):
-        entry.runtime_data.client.close()
+        await async_release_shared_hub(hass, entry.runtime_data.hub_key)
 
     return unload_ok
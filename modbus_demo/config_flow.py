@@ -8,6 +8,7 @@ from typing import Any
 import voluptuous as vol
 
 from homeassistant.components.modbus_base import ModbusHub
+from homeassistant.components.modbus_base.const import ModbusTable
 from homeassistant.config_entries import ConfigFlow as BaseConfigFlow, ConfigFlowResult
 from homeassistant.const import CONF_HOST, CONF_PORT
 from homeassistant.core import HomeAssistant
@@ -36,13 +37,12 @@ class PlaceholderHub(ModbusHub):
     async def get_device_serial_number(self) -> str:
         """Get device serial number."""
         serial_number = self._client.convert_from_registers(
-            (
-                await self._client.read_holding_registers(
-                    SERIAL_NUMBER_REGISTER,
-                    count=SERIAL_NUMBER_REGISTERS_COUNT,
-                    slave=SLAVE_ID,
-                )
-            ).registers,
+            await self.read(
+                SLAVE_ID,
+                ModbusTable.HOLDING_REGISTER,
+                SERIAL_NUMBER_REGISTER,
+                SERIAL_NUMBER_REGISTERS_COUNT,
+            ),
             self._client.DATATYPE.STRING,
         )
         assert isinstance(serial_number, str)
@@ -0,0 +1,16 @@
+"""Diagnostics support for Modbus Demo."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+from . import ModbusDemoConfigEntry
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ModbusDemoConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    return entry.runtime_data.coordinator.get_diagnostics()
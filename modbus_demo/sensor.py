@@ -4,8 +4,16 @@ from __future__ import annotations
 
 import logging
 
-from homeassistant.components.modbus_base.sensor import (
+from homeassistant.components.modbus_base.entity import (
+    ModbusField,
     SimpleModbusRegisterType,
+    async_add_modbus_entities,
+)
+from homeassistant.components.modbus_base.sensor import (
+    MODBUS_STATS_SENSORS,
+    CompositeModbusSensorEntity,
+    CompositeModbusSensorEntityDescription,
+    ModbusStatsSensorEntity,
     SimpleModbusSensorEntity,
     SimpleModbusSensorEntityDescription,
 )
@@ -31,6 +39,18 @@ SENSORS: list[SimpleModbusSensorEntityDescription] = [
     ),
 ]
 
+COMPOSITE_SENSORS: list[CompositeModbusSensorEntityDescription] = [
+    CompositeModbusSensorEntityDescription(
+        key="composite_sensor_1",
+        name="Sum Sensor",
+        modbus_fields=(
+            ModbusField(address=2168, register_type=SimpleModbusRegisterType.UINT16),
+            ModbusField(address=4688, register_type=SimpleModbusRegisterType.INT16),
+        ),
+        value_fn=lambda first, second: first + second,
+    ),
+]
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -43,8 +63,20 @@ async def async_setup_entry(
         config_entry.entry_id,
     )
 
-    for sensor in SENSORS:
-        async_add_entities(
-            [SimpleModbusSensorEntity(config_entry.runtime_data.coordinator, sensor)],
-            True,
-        )
+    coordinator = config_entry.runtime_data.coordinator
+    await async_add_modbus_entities(
+        coordinator,
+        async_add_entities,
+        [
+            *(SimpleModbusSensorEntity(coordinator, sensor) for sensor in SENSORS),
+            *(
+                CompositeModbusSensorEntity(coordinator, sensor)
+                for sensor in COMPOSITE_SENSORS
+            ),
+        ],
+    )
+
+    async_add_entities(
+        ModbusStatsSensorEntity(coordinator, description)
+        for description in MODBUS_STATS_SENSORS
+    )
@@ -0,0 +1,7 @@
+"""Fixtures for the tests.
+
+The tests run in a Home Assistant development environment in which modbus_base
+is available as homeassistant.components.modbus_base, like the benchmarks.
+"""
+
+pytest_plugins = ["pytest_homeassistant_custom_component"]
@@ -0,0 +1 @@
+"""Tests for the modbus_base integration."""
@@ -0,0 +1,294 @@
+"""Tests for the Modbus coordinator."""
+
+from datetime import timedelta
+import logging
+from unittest.mock import patch
+
+from pymodbus.exceptions import ModbusException
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import BaseModbusUpdateCoordinator, ModbusHub
+from homeassistant.components.modbus_base.const import (
+    MODBUS_POLL_INTERVAL,
+    MODBUS_REGISTERS,
+    ModbusTable,
+)
+from homeassistant.components.modbus_base.entity import SimpleModbusRegisterType
+from homeassistant.components.modbus_base.planner import RegisterBlock
+from homeassistant.components.modbus_base.switch import (
+    SimpleModbusSwitchEntity,
+    SimpleModbusSwitchEntityDescription,
+)
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+FAST_BLOCK = RegisterBlock(1, ModbusTable.HOLDING_REGISTER, range(10, 11))
+SLOW_BLOCK = RegisterBlock(1, ModbusTable.HOLDING_REGISTER, range(20, 21))
+FAST_KEY = (1, ModbusTable.HOLDING_REGISTER, 10)
+
+
+async def test_all_listeners_updated_after_failure(hass: HomeAssistant) -> None:
+    """Test that listeners of tiers which are not due are updated on recovery."""
+    client = SimulatedModbusClient(SimulatedModbusDevice())
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, ModbusHub(hass, client), "test", force_update_interval=None
+    )
+    updates: list[str] = []
+    coordinator.async_add_listener(
+        lambda: updates.append("fast"), {MODBUS_REGISTERS: FAST_BLOCK}
+    )
+    coordinator.async_add_listener(
+        lambda: updates.append("slow"),
+        {
+            MODBUS_REGISTERS: SLOW_BLOCK,
+            MODBUS_POLL_INTERVAL: timedelta(hours=1),
+        },
+    )
+
+    await coordinator.async_refresh()
+    assert sorted(updates) == ["fast", "slow"]
+
+    updates.clear()
+    await coordinator.async_refresh()
+    assert updates == []
+
+    client.close()
+    await coordinator.async_refresh()
+    assert not coordinator.last_update_success
+    assert sorted(updates) == ["fast", "slow"]
+
+    updates.clear()
+    await client.connect()
+    await coordinator.async_refresh()
+    assert coordinator.last_update_success
+    # the slow tier is not due, but its entities must become available again
+    assert sorted(updates) == ["fast", "slow"]
+
+    updates.clear()
+    await coordinator.async_refresh()
+    assert updates == []
+
+    await coordinator.async_shutdown()
+
+
+async def test_read_back_updates_changed_listeners(hass: HomeAssistant) -> None:
+    """Test that a read-back only updates the listeners of changed registers."""
+    device = SimulatedModbusDevice()
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, ModbusHub(hass, client), "test", force_update_interval=None
+    )
+    updates: list[str] = []
+    coordinator.async_add_listener(
+        lambda: updates.append("fast"), {MODBUS_REGISTERS: FAST_BLOCK}
+    )
+    coordinator.async_add_listener(
+        lambda: updates.append("slow"), {MODBUS_REGISTERS: SLOW_BLOCK}
+    )
+    await coordinator.async_refresh()
+    previous = coordinator.data
+
+    updates.clear()
+    await coordinator.async_refresh_registers([FAST_BLOCK, SLOW_BLOCK])
+    assert updates == []
+
+    device.set(1, "holding_register", 10, 42)
+    await coordinator.async_refresh_registers([FAST_BLOCK, SLOW_BLOCK])
+
+    assert updates == ["fast"]
+    assert coordinator.data[FAST_KEY] == 42
+    # the values of the poll, which are shared with the read cache, are kept
+    assert previous[FAST_KEY] == 1010
+
+    updates.clear()
+    await coordinator.async_refresh()
+    assert updates == []
+    assert coordinator.data[FAST_KEY] == 42
+
+    await coordinator.async_shutdown()
+
+
+async def test_read_back_of_rejected_write(hass: HomeAssistant) -> None:
+    """Test that a full refresh is requested when a register can't be read back."""
+    device = SimulatedModbusDevice(
+        illegal_ranges={(1, "holding_register"): [range(10, 11)]}
+    )
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, ModbusHub(hass, client), "test"
+    )
+    switch = SimpleModbusSwitchEntity(
+        coordinator,
+        SimpleModbusSwitchEntityDescription(
+            key="switch",
+            modbus_address=10,
+            modbus_register_type=SimpleModbusRegisterType.UINT16,
+        ),
+    )
+
+    with (
+        patch.object(coordinator, "async_request_refresh") as request_refresh,
+        pytest.raises(ModbusException),
+    ):
+        await switch.async_turn_on()
+
+    request_refresh.assert_awaited_once()
+    await coordinator.async_shutdown()
+
+
+async def test_failed_read_back(hass: HomeAssistant) -> None:
+    """Test that a full refresh is requested when the read-back fails."""
+    client = SimulatedModbusClient(SimulatedModbusDevice())
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, ModbusHub(hass, client), "test"
+    )
+    updates: list[str] = []
+    coordinator.async_add_listener(
+        lambda: updates.append("fast"), {MODBUS_REGISTERS: FAST_BLOCK}
+    )
+    await coordinator.async_refresh()
+    data = coordinator.data
+
+    updates.clear()
+    client.close()
+    with patch.object(coordinator, "async_request_refresh") as request_refresh:
+        await coordinator.async_refresh_registers([FAST_BLOCK])
+
+    request_refresh.assert_awaited_once()
+    assert updates == []
+    assert coordinator.data is data
+    await coordinator.async_shutdown()
+
+
+async def test_read_plan_cached_until_listeners_change(hass: HomeAssistant) -> None:
+    """Test that the read plan is only compiled again when listeners change."""
+    client = SimulatedModbusClient(SimulatedModbusDevice())
+    await client.connect()
+    hub = ModbusHub(hass, client)
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, hub, "test", force_update_interval=None
+    )
+    coordinator.async_add_listener(lambda: None, {MODBUS_REGISTERS: FAST_BLOCK})
+
+    with patch.object(
+        hub, "compile_read_plan", wraps=hub.compile_read_plan
+    ) as compile_read_plan:
+        await coordinator.async_refresh()
+        read_plan = coordinator.read_plan
+        await coordinator.async_refresh()
+        assert coordinator.read_plan is read_plan
+        assert compile_read_plan.call_count == 1
+
+        # listeners without Modbus registers don't change the plan
+        remove_listener = coordinator.async_add_listener(lambda: None)
+        remove_listener()
+        assert coordinator.read_plan is read_plan
+
+        remove_listener = coordinator.async_add_listener(
+            lambda: None, {MODBUS_REGISTERS: SLOW_BLOCK}
+        )
+        assert set(coordinator.read_plan.locations) == {FAST_BLOCK, SLOW_BLOCK}
+        assert compile_read_plan.call_count == 2
+
+        remove_listener()
+        assert set(coordinator.read_plan.locations) == {FAST_BLOCK}
+        assert compile_read_plan.call_count == 3
+
+    await coordinator.async_shutdown()
+
+
+async def test_units_are_interleaved(hass: HomeAssistant) -> None:
+    """Test that one coordinator polls several units, alternating between them."""
+    device = SimulatedModbusDevice()
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, ModbusHub(hass, client), "test", force_update_interval=None
+    )
+    blocks = [
+        RegisterBlock(unit, ModbusTable.HOLDING_REGISTER, registers)
+        for unit in (1, 2)
+        for registers in (range(10, 12), range(1000, 1002))
+    ]
+    blocks.append(RegisterBlock(3, ModbusTable.HOLDING_REGISTER, range(10, 12)))
+    for block in blocks:
+        coordinator.async_add_listener(lambda: None, {MODBUS_REGISTERS: block})
+
+    with patch.object(device, "handle", wraps=device.handle) as handle:
+        await coordinator.async_refresh()
+
+    assert [call.args[0] for call in handle.call_args_list] == [1, 2, 3, 1, 2]
+    # the values are keyed by unit
+    for block in blocks:
+        for address in block.registers:
+            assert (
+                coordinator.data[block.unit, block.table, address]
+                == block.unit * 1000 + address
+            )
+
+    await coordinator.async_shutdown()
+
+
+async def test_poll_tiers_are_read_when_due(hass: HomeAssistant) -> None:
+    """Test that every tier is read when due, and newer reads shadow older ones."""
+    device = SimulatedModbusDevice()
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass,
+        _LOGGER,
+        ModbusHub(hass, client),
+        "test",
+        update_interval=timedelta(seconds=10),
+        force_update_interval=None,
+    )
+    slow_tier = timedelta(minutes=1)
+    coordinator.async_add_listener(lambda: None, {MODBUS_REGISTERS: FAST_BLOCK})
+    coordinator.async_add_listener(
+        lambda: None,
+        {
+            MODBUS_REGISTERS: RegisterBlock(
+                1, ModbusTable.HOLDING_REGISTER, range(10, 12)
+            ),
+            MODBUS_POLL_INTERVAL: slow_tier,
+        },
+    )
+    assert coordinator.poll_tiers.keys() == {timedelta(seconds=10), slow_tier}
+
+    with patch(
+        "homeassistant.components.modbus_base.coordinator.time.monotonic"
+    ) as monotonic:
+        monotonic.return_value = 1000.0
+        await coordinator.async_refresh()
+        assert len(coordinator.data.layers) == 1
+
+        # a tick may be half the fastest interval early
+        assert coordinator._due_poll_tiers(1004.9) == frozenset()
+        assert coordinator._due_poll_tiers(1005.0) == {timedelta(seconds=10)}
+        assert coordinator._due_poll_tiers(1054.9) == {timedelta(seconds=10)}
+        assert coordinator._due_poll_tiers(1055.0) == coordinator.poll_tiers.keys()
+
+        device.set(1, "holding_register", 10, 1)
+        device.set(1, "holding_register", 11, 2)
+        monotonic.return_value = 1010.0
+        await coordinator.async_refresh()
+
+        # register 10 of the fast tier shadows the one of the slow tier
+        assert len(coordinator.data.layers) == 2
+        assert coordinator.data[FAST_KEY] == 1
+        assert coordinator.data[1, ModbusTable.HOLDING_REGISTER, 11] == 1011
+
+        monotonic.return_value = 1060.0
+        await coordinator.async_refresh()
+
+        # both tiers are read at once, into a single layer
+        assert len(coordinator.data.layers) == 1
+        assert coordinator.data[1, ModbusTable.HOLDING_REGISTER, 11] == 2
+
+    await coordinator.async_shutdown()
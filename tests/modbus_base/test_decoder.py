@@ -0,0 +1,126 @@
+"""Tests for the precompiled decoders."""
+
+import math
+import random
+import struct
+from typing import Any
+
+from pymodbus.client.mixin import ModbusClientMixin
+import pytest
+
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.decoder import ByteOrder, ModbusDecoder
+from homeassistant.components.modbus_base.entity import SimpleModbusRegisterType
+
+HOLDING_REGISTER = ModbusTable.HOLDING_REGISTER
+
+NUMERIC_TYPES = [
+    register_type
+    for register_type in SimpleModbusRegisterType
+    if register_type.value.value[1]
+]
+
+
+def _pymodbus_decode(
+    registers: list[int],
+    register_type: SimpleModbusRegisterType,
+    word_order: ByteOrder = "big",
+    byte_order: ByteOrder = "big",
+) -> Any:
+    """Return the value decoded by pymodbus, which only supports big byte order."""
+    if byte_order == "little":
+        registers = [(register & 0xFF) << 8 | register >> 8 for register in registers]
+    return ModbusClientMixin.convert_from_registers(
+        list(registers), register_type.value, word_order=word_order
+    )
+
+
+def _wire(registers: list[int]) -> memoryview:
+    """Return the registers as sent on the wire."""
+    return memoryview(struct.pack(f">{len(registers)}H", *registers))
+
+
+@pytest.mark.parametrize("register_type", NUMERIC_TYPES)
+@pytest.mark.parametrize("word_order", ["big", "little"])
+@pytest.mark.parametrize("byte_order", ["big", "little"])
+def test_numbers_match_pymodbus(
+    register_type: SimpleModbusRegisterType,
+    word_order: ByteOrder,
+    byte_order: ByteOrder,
+) -> None:
+    """Test that numbers are decoded like pymodbus does, in every order."""
+    count = register_type.value.value[1]
+    decoder = ModbusDecoder(
+        HOLDING_REGISTER,
+        register_type,
+        count,
+        word_order=word_order,
+        byte_order=byte_order,
+    )
+    rnd = random.Random(f"{register_type}{word_order}{byte_order}")
+    for _ in range(100):
+        registers = [rnd.randrange(0x10000) for _ in range(count)]
+        value = decoder.decode(_wire(registers))
+        expected = _pymodbus_decode(registers, register_type, word_order, byte_order)
+        if isinstance(expected, float) and math.isnan(expected):
+            assert math.isnan(value)
+        else:
+            assert value == expected
+
+
+def test_scale() -> None:
+    """Test that the value is divided by the scale."""
+    decoder = ModbusDecoder(
+        HOLDING_REGISTER,
+        SimpleModbusRegisterType.INT16,
+        1,
+        scale=10,
+        byte_order="little",
+    )
+
+    assert decoder.decode(_wire([0x85FF])) == -12.3
+
+
+@pytest.mark.parametrize("word_order", ["big", "little"])
+def test_string_matches_pymodbus(word_order: ByteOrder) -> None:
+    """Test that strings are decoded like pymodbus does, without trailing nulls."""
+    registers = [0x4142, 0x4344, 0x4500, 0x0000]
+    decoder = ModbusDecoder(
+        HOLDING_REGISTER, SimpleModbusRegisterType.STRING, 4, word_order=word_order
+    )
+
+    assert decoder.decode(_wire(registers)) == _pymodbus_decode(
+        registers, SimpleModbusRegisterType.STRING, word_order
+    )
+    if word_order == "big":
+        assert decoder.decode(_wire(registers)) == "ABCDE"
+
+
+@pytest.mark.parametrize("word_order", ["big", "little"])
+def test_bits_match_pymodbus(word_order: ByteOrder) -> None:
+    """Test that the bits of registers are decoded like pymodbus does."""
+    rnd = random.Random(word_order)
+    decoder = ModbusDecoder(
+        HOLDING_REGISTER, SimpleModbusRegisterType.BITS, 2, word_order=word_order
+    )
+    for _ in range(20):
+        registers = [rnd.randrange(0x10000) for _ in range(2)]
+        assert decoder.decode(_wire(registers)) == _pymodbus_decode(
+            registers, SimpleModbusRegisterType.BITS, word_order
+        )
+
+
+def test_bit_tables() -> None:
+    """Test the decoding of coils and discrete inputs, one byte per bit."""
+    assert ModbusDecoder(ModbusTable.COIL, None, 1).decode(memoryview(b"\x01"))
+    assert ModbusDecoder(ModbusTable.DISCRETE_INPUT, None, 3).decode(
+        memoryview(b"\x01\x00\x01")
+    ) == [True, False, True]
+
+
+def test_invalid_decoders() -> None:
+    """Test that invalid specifications are rejected when compiled."""
+    with pytest.raises(ValueError):
+        ModbusDecoder(HOLDING_REGISTER, SimpleModbusRegisterType.INT32, 1)
+    with pytest.raises(ValueError):
+        ModbusDecoder(HOLDING_REGISTER, SimpleModbusRegisterType.STRING, 2, scale=10)
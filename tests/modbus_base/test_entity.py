@@ -0,0 +1,248 @@
+"""Tests for the Modbus entities."""
+
+from datetime import timedelta
+import logging
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import BaseModbusUpdateCoordinator, ModbusHub
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.entity import (
+    BaseModbusEntity,
+    ModbusField,
+    SimpleModbusRegisterType,
+    async_add_modbus_entities,
+)
+from homeassistant.components.modbus_base.planner import RegisterBlock
+from homeassistant.components.modbus_base.sensor import (
+    MODBUS_STATS_SENSORS,
+    CompositeModbusSensorEntity,
+    CompositeModbusSensorEntityDescription,
+    ModbusStatsSensorEntity,
+    SimpleModbusSensorEntity,
+    SimpleModbusSensorEntityDescription,
+)
+from homeassistant.components.modbus_base.switch import (
+    SimpleModbusSwitchEntity,
+    SimpleModbusSwitchEntityDescription,
+)
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def _coordinator(
+    hass: HomeAssistant, device: SimulatedModbusDevice
+) -> BaseModbusUpdateCoordinator:
+    """Return a coordinator polling a simulated device."""
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    return BaseModbusUpdateCoordinator(hass, _LOGGER, ModbusHub(hass, client), "test")
+
+
+def test_descriptions_share_the_modbus_fields() -> None:
+    """Test the Modbus fields of the descriptions of every platform."""
+    sensor = SimpleModbusSensorEntityDescription(
+        key="sensor",
+        modbus_address=10,
+        modbus_register_type=SimpleModbusRegisterType.INT32,
+        modbus_unit=2,
+        modbus_table=ModbusTable.INPUT_REGISTER,
+        scale=10,
+    )
+    switch = SimpleModbusSwitchEntityDescription(
+        key="switch", modbus_address=3, modbus_table=ModbusTable.COIL
+    )
+
+    assert sensor.modbus_block == RegisterBlock(
+        2, ModbusTable.INPUT_REGISTER, range(10, 12)
+    )
+    assert sensor.modbus_decoder.decode(b"\x00\x00\x00\x7b") == 12.3
+    assert switch.modbus_registers == range(3, 4)
+    assert switch.modbus_decoder.decode(b"\x01") == 1
+
+
+async def test_add_modbus_entities(hass: HomeAssistant) -> None:
+    """Test that simple and composite entities are added with their values."""
+    coordinator = await _coordinator(hass, SimulatedModbusDevice())
+    sensor = SimpleModbusSensorEntity(
+        coordinator,
+        SimpleModbusSensorEntityDescription(
+            key="sensor",
+            modbus_address=10,
+            modbus_register_type=SimpleModbusRegisterType.UINT16,
+            scale=10,
+        ),
+    )
+    composite = CompositeModbusSensorEntity(
+        coordinator,
+        CompositeModbusSensorEntityDescription(
+            key="composite",
+            modbus_fields=(
+                ModbusField(address=10, register_type=SimpleModbusRegisterType.UINT16),
+                ModbusField(address=20, register_type=SimpleModbusRegisterType.UINT16),
+            ),
+            value_fn=lambda first, second: first + second,
+        ),
+        unit=2,
+    )
+    switch = SimpleModbusSwitchEntity(
+        coordinator,
+        SimpleModbusSwitchEntityDescription(
+            key="switch", modbus_address=3, modbus_table=ModbusTable.COIL
+        ),
+    )
+    added: list[BaseModbusEntity] = []
+
+    await async_add_modbus_entities(
+        coordinator, added.extend, [sensor, composite, switch]
+    )
+
+    assert added == [sensor, composite, switch]
+    assert sensor.native_value == 101.0
+    assert composite.native_value == 2010 + 2020
+    assert switch.is_on is False
+    assert not coordinator._listeners
+
+
+async def test_add_modbus_entities_with_invalid_value(
+    hass: HomeAssistant, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that an entity failing to decode its value doesn't affect the others."""
+    device = SimulatedModbusDevice()
+    device.set(1, "holding_register", 3, 7)
+    coordinator = await _coordinator(hass, device)
+    switch = SimpleModbusSwitchEntity(
+        coordinator,
+        SimpleModbusSwitchEntityDescription(
+            key="switch",
+            modbus_address=3,
+            modbus_register_type=SimpleModbusRegisterType.UINT16,
+        ),
+    )
+    sensor = SimpleModbusSensorEntity(
+        coordinator,
+        SimpleModbusSensorEntityDescription(
+            key="sensor",
+            modbus_address=10,
+            modbus_register_type=SimpleModbusRegisterType.UINT16,
+        ),
+    )
+    added: list[BaseModbusEntity] = []
+
+    await async_add_modbus_entities(coordinator, added.extend, [switch, sensor])
+
+    assert added == [switch, sensor]
+    assert switch.is_on is None
+    assert sensor.native_value == 1010
+    assert "Error updating the initial value of switch" in caplog.text
+    assert not coordinator._listeners
+
+
+async def test_composite_entity(hass: HomeAssistant) -> None:
+    """Test that fields of several tables are read in one poll, and combined on change."""
+    device = SimulatedModbusDevice()
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    coordinator = BaseModbusUpdateCoordinator(
+        hass,
+        _LOGGER,
+        ModbusHub(hass, client),
+        "test",
+        force_update_interval=timedelta(0),
+    )
+    combined: list[tuple[int, ...]] = []
+
+    def value_fn(*values: int) -> int:
+        combined.append(values)
+        return sum(values)
+
+    composite = CompositeModbusSensorEntity(
+        coordinator,
+        CompositeModbusSensorEntityDescription(
+            key="composite",
+            modbus_fields=(
+                ModbusField(address=10, register_type=SimpleModbusRegisterType.UINT16),
+                ModbusField(
+                    address=500,
+                    register_type=SimpleModbusRegisterType.UINT16,
+                    table=ModbusTable.INPUT_REGISTER,
+                ),
+                ModbusField(address=3, table=ModbusTable.COIL),
+            ),
+            value_fn=value_fn,
+        ),
+    )
+    coordinator.async_add_listener(
+        composite._async_update_attrs, composite.coordinator_context
+    )
+
+    await coordinator.async_refresh()
+
+    assert len(coordinator.read_plan.batches) == 3
+    assert device.requests == 3
+    assert composite.native_value == 1010 + 1500 + 0
+    assert combined == [(1010, 1500, False)]
+
+    # the entity is updated, but its values didn't change
+    device.set(1, "holding_register", 11, 0)
+    await coordinator.async_refresh()
+    assert combined == [(1010, 1500, False)]
+
+    device.set(1, "input_register", 500, 2)
+    await coordinator.async_refresh()
+    assert composite.native_value == 1010 + 2 + 0
+    assert combined == [(1010, 1500, False), (1010, 2, False)]
+
+    await coordinator.async_shutdown()
+
+
+async def test_add_modbus_entities_when_refresh_fails(hass: HomeAssistant) -> None:
+    """Test that the entities are added unavailable when the device can't be read."""
+    coordinator = await _coordinator(hass, SimulatedModbusDevice())
+    coordinator.modbus_hub._client.close()
+    sensor = SimpleModbusSensorEntity(
+        coordinator,
+        SimpleModbusSensorEntityDescription(
+            key="sensor",
+            modbus_address=10,
+            modbus_register_type=SimpleModbusRegisterType.UINT16,
+        ),
+    )
+    switch = SimpleModbusSwitchEntity(
+        coordinator,
+        SimpleModbusSwitchEntityDescription(
+            key="switch", modbus_address=3, modbus_table=ModbusTable.COIL
+        ),
+    )
+    added: list[BaseModbusEntity] = []
+
+    await async_add_modbus_entities(coordinator, added.extend, [sensor, switch])
+
+    assert added == [sensor, switch]
+    assert not coordinator.last_update_success
+    assert not sensor.available
+    assert sensor.native_value is None
+    assert not switch.available
+    assert switch.is_on is None
+    assert not coordinator._listeners
+
+
+async def test_stats_sensors_unique_id(hass: HomeAssistant) -> None:
+    """Test that the statistics sensors of a config entry have a unique ID."""
+    entry = MockConfigEntry(domain="modbus_demo")
+    client = SimulatedModbusClient(SimulatedModbusDevice())
+    coordinator = BaseModbusUpdateCoordinator(
+        hass, _LOGGER, ModbusHub(hass, client), "test", config_entry=entry
+    )
+
+    sensors = [
+        ModbusStatsSensorEntity(coordinator, description)
+        for description in MODBUS_STATS_SENSORS
+    ]
+
+    assert sensors[0].unique_id == f"{entry.entry_id}_modbus_read_requests"
+    assert len({sensor.unique_id for sensor in sensors}) == len(sensors)
+    assert not sensors[0].entity_registry_enabled_default
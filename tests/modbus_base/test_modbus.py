@@ -0,0 +1,423 @@
+"""Tests for the Modbus hub."""
+
+import asyncio
+import logging
+from typing import Any
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import BaseModbusUpdateCoordinator, ModbusHub
+from homeassistant.components.modbus_base.const import MODBUS_REGISTERS, ModbusTable
+from homeassistant.components.modbus_base.pacing import AdaptivePacing
+from homeassistant.components.modbus_base.planner import RegisterBlock
+from homeassistant.components.modbus_base.profile import DeviceProfile
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+HOLDING_REGISTER = ModbusTable.HOLDING_REGISTER
+
+
+class _UnresponsiveClient(SimulatedModbusClient):
+    """Simulated client which gets no response to reads at some addresses."""
+
+    def __init__(
+        self,
+        device: SimulatedModbusDevice,
+        addresses: set[int],
+        error: Exception | None = None,
+    ) -> None:
+        super().__init__(device)
+        self.addresses = addresses
+        self.error = error or ModbusIOException("No response received")
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        if address in self.addresses:
+            raise self.error
+        return await super().read_holding_registers(address, count=count, slave=slave)
+
+
+class _ShortResponseClient(SimulatedModbusClient):
+    """Simulated client which gets short responses to reads at some addresses."""
+
+    def __init__(self, device: SimulatedModbusDevice, addresses: set[int]) -> None:
+        super().__init__(device)
+        self.addresses = addresses
+
+    async def read_holding_registers(
+        self, address: int, *, count: int = 1, slave: int = 1
+    ) -> Any:
+        response = await super().read_holding_registers(
+            address, count=count, slave=slave
+        )
+        if address in self.addresses and not response.isError():
+            response.registers = response.registers[:-1]
+        return response
+
+    async def read_coils(self, address: int, *, count: int = 1, slave: int = 1) -> Any:
+        response = await super().read_coils(address, count=count, slave=slave)
+        if address in self.addresses and not response.isError():
+            response.bits = []
+        return response
+
+
+async def _connected_hub(
+    hass: HomeAssistant, device: SimulatedModbusDevice, **kwargs
+) -> ModbusHub:
+    """Return a hub connected to a simulated device."""
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    return ModbusHub(hass, client, **kwargs)
+
+
+async def test_read_cache_is_bounded(hass: HomeAssistant) -> None:
+    """Test that polls without ad-hoc reads don't grow the read cache."""
+    hub = await _connected_hub(hass, SimulatedModbusDevice())
+    coordinator = BaseModbusUpdateCoordinator(hass, _LOGGER, hub, "test")
+    coordinator.async_add_listener(
+        lambda: None,
+        {
+            MODBUS_REGISTERS: RegisterBlock(
+                1, ModbusTable.HOLDING_REGISTER, range(10, 20)
+            )
+        },
+    )
+
+    for _ in range(500):
+        await coordinator.async_refresh()
+
+    assert len(hub._cached_layers) == 1
+    assert await hub.read(1, ModbusTable.HOLDING_REGISTER, 12) == [1012]
+    assert hub.stats.cache_hits == 1
+
+
+async def test_read_cache_disabled(hass: HomeAssistant) -> None:
+    """Test that nothing is cached without a read cache TTL."""
+    hub = await _connected_hub(hass, SimulatedModbusDevice(), read_cache_ttl=0)
+
+    for _ in range(3):
+        assert await hub.read(1, ModbusTable.HOLDING_REGISTER, 12) == [1012]
+
+    assert not hub._cached_layers
+
+
+async def test_read_during_write_is_not_cached(hass: HomeAssistant) -> None:
+    """Test that a poll which may hold values from before a write isn't cached."""
+    device = SimulatedModbusDevice()
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    hub = ModbusHub(hass, client)
+    writes: list[asyncio.Task[float]] = []
+    read_holding_registers = client.read_holding_registers
+
+    async def read_then_write(address: int, *, count: int = 1, slave: int = 1) -> Any:
+        response = await read_holding_registers(address, count=count, slave=slave)
+        if address == 10:
+            writes.append(asyncio.create_task(hub.write(1, HOLDING_REGISTER, 10, [42])))
+            await asyncio.sleep(0)
+        return response
+
+    client.read_holding_registers = read_then_write  # type: ignore[method-assign]
+    plan = hub.compile_read_plan(
+        RegisterBlock(1, HOLDING_REGISTER, range(address, address + 2))
+        for address in (10, 1000)
+    )
+    assert len(plan.batches) == 2
+
+    snapshot = await hub.execute_read_plan(plan)
+
+    # the write was performed between the two requests of the poll
+    assert hub.stats.write_requests == 1
+    await writes[0]
+    assert snapshot[1, HOLDING_REGISTER, 10] == 1010
+    assert not hub._cached_layers
+    assert await hub.read(1, HOLDING_REGISTER, 10) == [42]
+    assert hub.stats.cache_misses == 1
+
+
+async def test_timeout_only_affects_its_batch(hass: HomeAssistant) -> None:
+    """Test that a batch without response doesn't fail the whole read."""
+    client = _UnresponsiveClient(SimulatedModbusDevice(), {500})
+    await client.connect()
+    hub = ModbusHub(hass, client)
+    plan = hub.compile_read_plan(
+        [
+            RegisterBlock(1, HOLDING_REGISTER, range(10, 12)),
+            RegisterBlock(1, HOLDING_REGISTER, range(500, 502)),
+            RegisterBlock(1, HOLDING_REGISTER, range(1000, 1002)),
+        ]
+    )
+    assert len(plan.batches) == 3
+
+    snapshot = await hub.execute_read_plan(plan)
+
+    assert snapshot[1, HOLDING_REGISTER, 10] == 1010
+    assert snapshot[1, HOLDING_REGISTER, 1001] == 2001
+    assert (1, HOLDING_REGISTER, 500) not in snapshot
+    assert hub.stats.timeouts == 1
+
+
+async def test_unreachable_device_fails_the_read(hass: HomeAssistant) -> None:
+    """Test that a read without any response is aborted."""
+    client = _UnresponsiveClient(SimulatedModbusDevice(), {10, 500, 1000})
+    await client.connect()
+    hub = ModbusHub(hass, client)
+    plan = hub.compile_read_plan(
+        RegisterBlock(1, HOLDING_REGISTER, range(address, address + 2))
+        for address in (10, 500, 1000)
+    )
+
+    with pytest.raises(ModbusIOException):
+        await hub.execute_read_plan(plan)
+    assert hub.stats.timeouts == 2
+
+
+async def test_short_response_only_affects_its_batch(hass: HomeAssistant) -> None:
+    """Test that a response with less values than requested is like an error."""
+    client = _ShortResponseClient(SimulatedModbusDevice(), {3, 10})
+    await client.connect()
+    hub = ModbusHub(hass, client)
+    plan = hub.compile_read_plan(
+        [
+            RegisterBlock(1, ModbusTable.COIL, range(3, 4)),
+            RegisterBlock(1, HOLDING_REGISTER, range(10, 12)),
+            RegisterBlock(1, HOLDING_REGISTER, range(1000, 1002)),
+        ]
+    )
+    assert len(plan.batches) == 3
+
+    snapshot = await hub.execute_read_plan(plan)
+
+    assert (1, ModbusTable.COIL, 3) not in snapshot
+    assert (1, HOLDING_REGISTER, 10) not in snapshot
+    assert snapshot[1, HOLDING_REGISTER, 1001] == 2001
+
+
+async def test_short_response_during_bisection(hass: HomeAssistant) -> None:
+    """Test that a short response to a part of a bisected batch leaves it out."""
+    device = SimulatedModbusDevice(
+        illegal_ranges={(1, "holding_register"): [range(13, 14)]}
+    )
+    client = _ShortResponseClient(device, {10})
+    await client.connect()
+    hub = ModbusHub(hass, client)
+
+    snapshot = await hub.execute_read_plan(
+        hub.compile_read_plan([RegisterBlock(1, HOLDING_REGISTER, range(10, 16))])
+    )
+
+    assert sorted(key[2] for key in snapshot) == [14, 15]
+    assert list(hub.excluded_ranges[1, HOLDING_REGISTER]) == [range(13, 14)]
+
+
+@pytest.mark.parametrize(
+    "error", [ModbusIOException("No response"), ConnectionException("Lost")]
+)
+async def test_bisection_keeps_illegal_addresses(
+    hass: HomeAssistant, error: Exception
+) -> None:
+    """Test that illegal addresses found before a failure are excluded."""
+    device = SimulatedModbusDevice(
+        illegal_ranges={(1, "holding_register"): [range(12, 13)]}
+    )
+    # the second half of the batch is read after the first one was bisected
+    client = _UnresponsiveClient(device, {18}, error)
+    await client.connect()
+    hub = ModbusHub(hass, client)
+    plan = hub.compile_read_plan([RegisterBlock(1, HOLDING_REGISTER, range(10, 26))])
+
+    if isinstance(error, ModbusIOException):
+        snapshot = await hub.execute_read_plan(plan)
+        assert snapshot[1, HOLDING_REGISTER, 10] == 1010
+        assert (1, HOLDING_REGISTER, 12) not in snapshot
+        assert (1, HOLDING_REGISTER, 20) not in snapshot
+    else:
+        with pytest.raises(ConnectionException):
+            await hub.execute_read_plan(plan)
+
+    assert list(hub.excluded_ranges[1, HOLDING_REGISTER]) == [range(12, 13)]
+
+
+async def test_profiles_of_units_sharing_a_hub(hass: HomeAssistant) -> None:
+    """Test that the read sizes of a unit don't override those of other units."""
+    hub = await _connected_hub(
+        hass, SimulatedModbusDevice(), pacing=AdaptivePacing(0.0, 1.0)
+    )
+    hub.apply_profile(DeviceProfile(max_read_count=4, pacing_wait=0.5), unit=1)
+    hub.apply_profile(DeviceProfile(max_read_count=100, pacing_wait=0.1), unit=2)
+
+    plan = hub.compile_read_plan(
+        RegisterBlock(unit, HOLDING_REGISTER, range(8)) for unit in (1, 2, 3)
+    )
+
+    assert sorted((batch.unit, batch.count) for batch in plan.batches) == [
+        (1, 4),
+        (1, 4),
+        (2, 8),
+        (3, 8),
+    ]
+    assert hub.export_profile(1).max_read_count == 4
+    assert hub.export_profile(2).max_read_count == 100
+    # the pacing is shared, so the slowest unit sets the pace
+    assert hub.pacing.wait == 0.5
+
+
+async def test_probe_max_read_count_per_unit(hass: HomeAssistant) -> None:
+    """Test that probing a unit only changes the read size of that unit."""
+    hub = await _connected_hub(hass, SimulatedModbusDevice(max_read_count=20))
+
+    assert await hub.probe_max_read_count(0, unit=2) == 20
+
+    assert hub.export_profile(2).max_read_count == 20
+    assert hub.export_profile(2).max_bit_read_count != 20
+    assert (
+        hub.export_profile(1).max_read_count
+        == hub.read_cost_models[HOLDING_REGISTER].max_count
+    )
+
+
+async def test_cancelled_write_does_not_cancel_superseding_write(
+    hass: HomeAssistant,
+) -> None:
+    """Test that cancelling a superseded write still completes the newer one."""
+    device = SimulatedModbusDevice()
+    hub = await _connected_hub(hass, device)
+
+    async with hub._lock:
+        first = asyncio.create_task(hub.write(1, HOLDING_REGISTER, 10, [1]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hub.write(1, HOLDING_REGISTER, 10, [2]))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+
+    await second
+    assert first.cancelled()
+    assert await hub.read(1, HOLDING_REGISTER, 10) == [2]
+
+
+async def test_adjacent_writes_are_coalesced(hass: HomeAssistant) -> None:
+    """Test that queued writes to adjacent addresses share a request."""
+    device = SimulatedModbusDevice()
+    hub = await _connected_hub(hass, device)
+
+    async with hub._lock:
+        writes = [
+            asyncio.create_task(hub.write(1, HOLDING_REGISTER, 10, [1, 2])),
+            asyncio.create_task(hub.write(1, HOLDING_REGISTER, 12, [3])),
+        ]
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*writes)
+    assert hub.stats.write_requests == 1
+    assert [device.get(1, "holding_register", address) for address in (10, 11, 12)] == [
+        1,
+        2,
+        3,
+    ]
+
+
+async def test_write_supersedes_queued_write(hass: HomeAssistant) -> None:
+    """Test that a write including all addresses of a queued write supersedes it."""
+    device = SimulatedModbusDevice()
+    hub = await _connected_hub(hass, device)
+
+    async with hub._lock:
+        writes = [
+            asyncio.create_task(hub.write(1, HOLDING_REGISTER, 10, [1, 2])),
+            asyncio.create_task(hub.write(1, HOLDING_REGISTER, 10, [3, 4])),
+            asyncio.create_task(hub.write(1, HOLDING_REGISTER, 9, [5, 6, 7])),
+        ]
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*writes)
+    assert hub.stats.write_requests == 1
+    assert hub.stats.values_written == 3
+    assert [device.get(1, "holding_register", address) for address in (9, 10, 11)] == [
+        5,
+        6,
+        7,
+    ]
+
+
+async def test_partially_overlapping_write_is_rejected(hass: HomeAssistant) -> None:
+    """Test that a write can't replace a part of the values of a queued write."""
+    device = SimulatedModbusDevice()
+    hub = await _connected_hub(hass, device)
+
+    async with hub._lock:
+        write = asyncio.create_task(hub.write(1, HOLDING_REGISTER, 100, [1, 2]))
+        await asyncio.sleep(0)
+        with pytest.raises(ValueError):
+            await hub.write(1, HOLDING_REGISTER, 101, [3, 4])
+        with pytest.raises(ValueError):
+            await hub.write(1, HOLDING_REGISTER, 101, [3])
+
+    await write
+    assert hub.stats.write_requests == 1
+    assert [
+        device.get(1, "holding_register", address) for address in (100, 101, 102)
+    ] == [1, 2, 1102]
+
+
+async def test_writes_wait_for_pipelined_reads(hass: HomeAssistant) -> None:
+    """Test that writes are performed during a pipelined poll, between its reads."""
+    device = SimulatedModbusDevice(latency=0.005)
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    hub = ModbusHub(hass, client, pipeline_window=2)
+    events: list[str] = []
+    in_flight = 0
+    writes: list[asyncio.Task[float]] = []
+    read_holding_registers = client.read_holding_registers
+    write_register = client.write_register
+
+    async def read(address: int, *, count: int = 1, slave: int = 1) -> Any:
+        nonlocal in_flight
+        in_flight += 1
+        if not writes:
+            writes.append(asyncio.create_task(hub.write(1, HOLDING_REGISTER, 5, [1])))
+        try:
+            return await read_holding_registers(address, count=count, slave=slave)
+        finally:
+            in_flight -= 1
+            events.append(f"read {address}")
+
+    async def write(address: int, value: int, *, slave: int = 1) -> Any:
+        assert in_flight == 0
+        events.append(f"write {address}")
+        return await write_register(address, value, slave=slave)
+
+    client.read_holding_registers = read  # type: ignore[method-assign]
+    client.write_register = write  # type: ignore[method-assign]
+    plan = hub.compile_read_plan(
+        RegisterBlock(1, HOLDING_REGISTER, range(address, address + 1))
+        for address in (100, 200, 300, 400)
+    )
+    assert len(plan.batches) == 4
+
+    await hub.execute_read_plan(plan)
+    await writes[0]
+
+    # the reads sent before the write was queued are answered first, but the
+    # write doesn't wait for the end of the poll
+    assert events == ["read 100", "read 200", "write 5", "read 300", "read 400"]
+
+
+async def test_wait_after_failed_read(hass: HomeAssistant) -> None:
+    """Test that the wait between requests also follows a failed read."""
+    client = _UnresponsiveClient(
+        SimulatedModbusDevice(), {10}, ConnectionException("Lost")
+    )
+    await client.connect()
+    hub = ModbusHub(hass, client, 0.05)
+
+    with pytest.raises(ConnectionException):
+        await hub.read(1, HOLDING_REGISTER, 10)
+    assert await hub.read(1, HOLDING_REGISTER, 20) == [1020]
+
+    assert hub.stats.cooldown.count == 1
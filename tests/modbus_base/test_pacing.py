@@ -0,0 +1,61 @@
+"""Tests for the adaptive pacing."""
+
+import pytest
+
+from homeassistant.components.modbus_base.pacing import AdaptivePacing
+
+
+def test_responses_decrease_the_wait() -> None:
+    """Test that every response decreases the wait by a fixed step."""
+    pacing = AdaptivePacing(0.0, 1.0, initial_wait=0.1, decrease=0.01)
+
+    pacing.record_response(0.1)
+    assert pacing.wait == pytest.approx(0.09)
+    assert pacing.latency == 0.1
+
+    pacing.record_response(0.2)
+    assert pacing.wait == pytest.approx(0.08)
+    # the latency is smoothed
+    assert pacing.latency == pytest.approx(0.12)
+    assert pacing.responses == 2
+
+
+def test_congestions_increase_the_wait() -> None:
+    """Test that congestions multiply the wait, to at least the latency."""
+    pacing = AdaptivePacing(0.0, 1.0, initial_wait=0.1, increase_factor=2.0)
+
+    pacing.record_congestion()
+    assert pacing.wait == pytest.approx(0.2)
+
+    pacing.record_response(0.5)
+    pacing.record_congestion()
+    assert pacing.wait == pytest.approx(0.5)
+    assert pacing.congestions == 2
+
+
+def test_wait_stays_within_bounds() -> None:
+    """Test that the wait never leaves [min_wait, max_wait]."""
+    pacing = AdaptivePacing(0.05, 0.3, initial_wait=1.0, decrease=0.1)
+    assert pacing.wait == 0.3
+
+    for _ in range(5):
+        pacing.record_congestion()
+    assert pacing.wait == 0.3
+
+    for _ in range(5):
+        pacing.record_response(0.01)
+    assert pacing.wait == 0.05
+
+    with pytest.raises(ValueError):
+        AdaptivePacing(0.5, 0.1)
+
+
+def test_restore() -> None:
+    """Test that a restored wait is clamped, and the latency restored as is."""
+    pacing = AdaptivePacing(0.05, 0.3)
+
+    pacing.restore(0.2, 0.15)
+    assert (pacing.wait, pacing.latency) == (0.2, 0.15)
+
+    pacing.restore(5.0)
+    assert (pacing.wait, pacing.latency) == (0.3, None)
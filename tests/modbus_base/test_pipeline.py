@@ -0,0 +1,63 @@
+"""Tests for the pipelined Modbus TCP client."""
+
+import asyncio
+
+from pymodbus.exceptions import ConnectionException
+import pytest
+
+from benchmarks.simulator import SimulatedModbusDevice
+from homeassistant.components.modbus_base import PipelinedModbusTcpClient
+
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+
+async def test_pipelined_requests() -> None:
+    """Test that several outstanding requests get their own response."""
+    device = SimulatedModbusDevice(latency=0.01, jitter=0.01, seed=1)
+    port = await device.start_server()
+    client = PipelinedModbusTcpClient("127.0.0.1", port)
+    assert await client.connect()
+
+    responses = await asyncio.gather(
+        *(client.read_holding_registers(address, count=2) for address in range(8))
+    )
+
+    assert [response.registers for response in responses] == [
+        [1000 + address, 1001 + address] for address in range(8)
+    ]
+    client.close()
+    await device.stop_server()
+
+
+async def test_reconnect_with_backoff() -> None:
+    """Test that the client reconnects after the connection was lost."""
+    device = SimulatedModbusDevice()
+    port = await device.start_server()
+    client = PipelinedModbusTcpClient(
+        "127.0.0.1", port, reconnect_delay=0.05, reconnect_delay_max=0.1
+    )
+    assert await client.connect()
+    assert (await client.read_holding_registers(1)).registers == [1001]
+
+    await device.stop_server()
+    await asyncio.sleep(0.01)
+    assert not client.connected
+
+    # the first attempt fails, and the next ones wait for the backoff
+    with pytest.raises(ConnectionException):
+        await client.read_holding_registers(1)
+    requests = device.requests
+    await device.start_server(port=port)
+    with pytest.raises(ConnectionException):
+        await client.read_holding_registers(1)
+    assert device.requests == requests
+
+    await asyncio.sleep(0.06)
+    assert (await client.read_holding_registers(2)).registers == [1002]
+    assert client.connected
+
+    # no reconnection after close()
+    client.close()
+    with pytest.raises(ConnectionException):
+        await client.read_holding_registers(1)
+    await device.stop_server()
@@ -0,0 +1,137 @@
+"""Tests for the read planner."""
+
+from itertools import product
+import random
+
+import pytest
+
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.planner import (
+    ExcludedRanges,
+    ReadBatch,
+    ReadCostModel,
+    RegisterBlock,
+    compile_read_plan,
+    plan_reads,
+)
+
+HOLDING_REGISTER = ModbusTable.HOLDING_REGISTER
+
+
+def _cost(batches: list[ReadBatch], cost_model: ReadCostModel) -> float:
+    """Return the total cost of reading batches."""
+    return sum(cost_model.cost(batch.count) for batch in batches)
+
+
+def _brute_force_cost(blocks: list[range], cost_model: ReadCostModel) -> float:
+    """Return the cost of the cheapest split of sorted blocks into batches."""
+    best = float("inf")
+    for splits in product((False, True), repeat=len(blocks) - 1):
+        cost = 0.0
+        start = blocks[0].start
+        for idx, block in enumerate(blocks):
+            if idx == len(blocks) - 1 or splits[idx]:
+                if block.stop - start > cost_model.max_count:
+                    break
+                cost += cost_model.cost(block.stop - start)
+                if idx < len(blocks) - 1:
+                    start = blocks[idx + 1].start
+        else:
+            best = min(best, cost)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_plan_is_optimal(seed: int) -> None:
+    """Test that the plan is as cheap as the best of all possible splits."""
+    rnd = random.Random(seed)
+    cost_model = ReadCostModel(
+        request_cost=rnd.uniform(0.005, 0.05),
+        register_cost=rnd.uniform(0.0005, 0.005),
+        max_count=rnd.randint(8, 40),
+    )
+    blocks: list[range] = []
+    address = 0
+    for _ in range(rnd.randint(1, 10)):
+        address += rnd.randint(0, 30)
+        blocks.append(range(address, address + rnd.randint(1, 4)))
+        address = blocks[-1].stop
+
+    batches = plan_reads(blocks, cost_model)
+
+    assert _cost(batches, cost_model) == pytest.approx(
+        _brute_force_cost(blocks, cost_model)
+    )
+    for block in blocks:
+        assert any(
+            block.start >= batch.address and block.stop <= batch.registers.stop
+            for batch in batches
+        )
+
+
+def test_gap_is_bridged_only_when_cheaper() -> None:
+    """Test that unused registers are only read when it saves a request."""
+    # a request costs as much as reading 10 registers
+    cost_model = ReadCostModel(request_cost=0.01, register_cost=0.001, max_count=100)
+
+    assert plan_reads([range(2), range(11, 13)], cost_model) == [
+        ReadBatch(1, HOLDING_REGISTER, 0, 13)
+    ]
+    assert plan_reads([range(2), range(13, 15)], cost_model) == [
+        ReadBatch(1, HOLDING_REGISTER, 0, 2),
+        ReadBatch(1, HOLDING_REGISTER, 13, 2),
+    ]
+
+
+def test_batches_respect_max_count() -> None:
+    """Test that batches never exceed the maximum read size."""
+    cost_model = ReadCostModel(request_cost=1.0, register_cost=0.0, max_count=10)
+
+    assert plan_reads([range(4), range(6, 10), range(12, 14)], cost_model) == [
+        ReadBatch(1, HOLDING_REGISTER, 0, 10),
+        ReadBatch(1, HOLDING_REGISTER, 12, 2),
+    ]
+    # blocks larger than the maximum are split
+    assert plan_reads([range(25)], cost_model) == [
+        ReadBatch(1, HOLDING_REGISTER, 0, 10),
+        ReadBatch(1, HOLDING_REGISTER, 10, 10),
+        ReadBatch(1, HOLDING_REGISTER, 20, 5),
+    ]
+
+
+def test_gaps_never_span_excluded_ranges() -> None:
+    """Test that excluded registers are never read, even to save a request."""
+    cost_model = ReadCostModel(request_cost=1.0, register_cost=0.0, max_count=100)
+    excluded = ExcludedRanges([range(5, 6), range(12, 20)])
+
+    assert plan_reads([range(10), range(20, 22)], cost_model, excluded) == [
+        ReadBatch(1, HOLDING_REGISTER, 0, 5),
+        ReadBatch(1, HOLDING_REGISTER, 6, 4),
+        ReadBatch(1, HOLDING_REGISTER, 20, 2),
+    ]
+
+
+def test_compile_read_plan() -> None:
+    """Test the locations of the blocks, and the interleaving of the units."""
+    cost_model = ReadCostModel(request_cost=1.0, register_cost=0.0, max_count=10)
+    cost_models = dict.fromkeys(ModbusTable, cost_model)
+    blocks = [
+        RegisterBlock(1, HOLDING_REGISTER, range(2)),
+        RegisterBlock(1, HOLDING_REGISTER, range(4, 6)),
+        RegisterBlock(1, HOLDING_REGISTER, range(50, 51)),
+        RegisterBlock(2, HOLDING_REGISTER, range(1)),
+        RegisterBlock(1, ModbusTable.COIL, range(3, 4)),
+    ]
+
+    plan = compile_read_plan(blocks, cost_models)
+
+    assert [(batch.unit, batch.table, batch.address) for batch in plan.batches] == [
+        (1, ModbusTable.COIL, 3),
+        (2, HOLDING_REGISTER, 0),
+        (1, HOLDING_REGISTER, 0),
+        (1, HOLDING_REGISTER, 50),
+    ]
+    assert plan.locations[blocks[1]] == (2, 4)
+    assert plan.locations[blocks[2]] == (3, 0)
+    assert plan.locations[blocks[3]] == (1, 0)
+    assert plan.register_count == 6 + 1 + 1 + 1
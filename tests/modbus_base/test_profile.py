@@ -0,0 +1,20 @@
+"""Tests for the device profiles."""
+
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.profile import DeviceProfile
+
+
+def test_profile_round_trip() -> None:
+    """Test that a profile is restored from its dict, ignoring unknown keys."""
+    profile = DeviceProfile(
+        fingerprint="V100R001",
+        max_read_count=64,
+        excluded_ranges={ModbusTable.HOLDING_REGISTER: [range(10, 12)]},
+        pacing_wait=0.05,
+        identity={"serial_number": "ABC123"},
+    )
+    data = profile.as_dict()
+
+    assert DeviceProfile.from_dict(data) == profile
+    assert DeviceProfile.from_dict(data | {"added_later": 1}) == profile
+    assert DeviceProfile.from_dict({}) == DeviceProfile()
@@ -0,0 +1,111 @@
+"""Tests for the registry of shared Modbus hubs."""
+
+import asyncio
+
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import (
+    ModbusHub,
+    async_acquire_shared_hub,
+    async_release_shared_hub,
+    tcp_endpoint,
+)
+from homeassistant.components.modbus_base.registry import ModbusHubRegistry
+from homeassistant.core import HomeAssistant
+
+
+async def test_entries_share_a_hub(hass: HomeAssistant) -> None:
+    """Test that the entries of one endpoint share a hub until the last release."""
+    clients: list[SimulatedModbusClient] = []
+
+    async def create_hub() -> ModbusHub:
+        client = SimulatedModbusClient(SimulatedModbusDevice())
+        await client.connect()
+        clients.append(client)
+        return ModbusHub(hass, client)
+
+    first = await async_acquire_shared_hub(
+        hass, tcp_endpoint("Gateway.local", 502), create_hub
+    )
+    second = await async_acquire_shared_hub(
+        hass, tcp_endpoint("gateway.local", 502), create_hub
+    )
+    other = await async_acquire_shared_hub(
+        hass, tcp_endpoint("gateway.local", 503), create_hub
+    )
+
+    assert first is second
+    assert other is not first
+    assert len(clients) == 2
+
+    await async_release_shared_hub(hass, tcp_endpoint("gateway.local", 502))
+    assert clients[0].connected
+    await async_release_shared_hub(hass, tcp_endpoint("gateway.local", 502))
+    assert not clients[0].connected
+    assert clients[1].connected
+
+    # a new entry for the endpoint gets a new hub
+    third = await async_acquire_shared_hub(
+        hass, tcp_endpoint("gateway.local", 502), create_hub
+    )
+    assert third is not first
+    assert len(clients) == 3
+
+    await async_release_shared_hub(hass, tcp_endpoint("gateway.local", 502))
+    await async_release_shared_hub(hass, tcp_endpoint("gateway.local", 503))
+
+
+async def test_hubs_are_created_per_endpoint(hass: HomeAssistant) -> None:
+    """Test that connecting to an endpoint only delays the callers of that endpoint."""
+    registry = ModbusHubRegistry()
+    connected = asyncio.Event()
+    created: list[str] = []
+
+    def create_hub(name: str, event: asyncio.Event | None = None):
+        async def create() -> ModbusHub:
+            if event is not None:
+                await event.wait()
+            created.append(name)
+            return ModbusHub(hass, SimulatedModbusClient(SimulatedModbusDevice()))
+
+        return create
+
+    slow = [
+        asyncio.create_task(
+            registry.async_acquire("slow", create_hub("slow", connected))
+        )
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0)
+
+    fast = await registry.async_acquire("fast", create_hub("fast"))
+    assert created == ["fast"]
+
+    connected.set()
+    first, second = await asyncio.gather(*slow)
+    assert first is second
+    assert created == ["fast", "slow"]
+    assert len(registry) == 2
+
+    await registry.async_release("fast")
+    assert len(registry) == 1
+    assert fast is not first
+
+
+async def test_failed_creation_registers_nothing(hass: HomeAssistant) -> None:
+    """Test that a hub which can't be created is created again by the next caller."""
+    registry = ModbusHubRegistry()
+
+    async def fail() -> ModbusHub:
+        raise ConnectionError("Could not connect")
+
+    async def create_hub() -> ModbusHub:
+        return ModbusHub(hass, SimulatedModbusClient(SimulatedModbusDevice()))
+
+    with pytest.raises(ConnectionError):
+        await registry.async_acquire("gateway", fail)
+    assert len(registry) == 0
+
+    assert await registry.async_acquire("gateway", create_hub)
+    assert len(registry) == 1
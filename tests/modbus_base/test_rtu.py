@@ -0,0 +1,112 @@
+"""Tests for the timing of Modbus RTU frames."""
+
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import ModbusHub
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.planner import RegisterBlock
+from homeassistant.components.modbus_base.rtu import SerialLine
+from homeassistant.core import HomeAssistant
+
+HOLDING_REGISTER = ModbusTable.HOLDING_REGISTER
+
+
+@pytest.mark.parametrize(
+    ("line", "bits"),
+    [
+        (SerialLine(baudrate=9600), 10),
+        (SerialLine(baudrate=9600, parity="E"), 11),
+        (SerialLine(baudrate=9600, parity="O"), 11),
+        (SerialLine(baudrate=9600, stopbits=2), 11),
+        (SerialLine(baudrate=9600, bytesize=7, parity="E", stopbits=2), 11),
+        (SerialLine(baudrate=115200), 10),
+        (SerialLine(baudrate=115200, parity="E"), 11),
+    ],
+)
+def test_character_time(line: SerialLine, bits: int) -> None:
+    """Test that a character has a start bit, the data, parity and stop bits."""
+    assert line.character_time == pytest.approx(bits / line.baudrate)
+
+
+@pytest.mark.parametrize(
+    ("line", "frame_gap"),
+    [
+        (SerialLine(baudrate=9600), 3.5 * 10 / 9600),
+        (SerialLine(baudrate=9600, parity="E"), 3.5 * 11 / 9600),
+        (SerialLine(baudrate=19200, stopbits=2), 3.5 * 11 / 19200),
+        (SerialLine(baudrate=38400), 0.00175),
+        (SerialLine(baudrate=115200, parity="E"), 0.00175),
+    ],
+)
+def test_frame_gap(line: SerialLine, frame_gap: float) -> None:
+    """Test the gap of 3.5 characters, fixed to 1.75 ms above 19200 baud."""
+    assert line.frame_gap == pytest.approx(frame_gap)
+
+
+def test_read_time() -> None:
+    """Test the duration of reads of registers and of coils."""
+    line = SerialLine(baudrate=9600, turnaround=0.01)
+    character_time = 10 / 9600
+    frame_gap = 3.5 * character_time
+
+    # request of 8 bytes, response of 5 bytes and 2 bytes per register
+    assert line.read_time(HOLDING_REGISTER, 10) == pytest.approx(
+        (8 + 5 + 20) * character_time + 0.01 + 2 * frame_gap
+    )
+    # 8 coils per byte
+    assert line.read_time(ModbusTable.COIL, 10) == pytest.approx(
+        (8 + 5 + 2) * character_time + 0.01 + 2 * frame_gap
+    )
+
+
+async def test_hub_for_serial_line(hass: HomeAssistant) -> None:
+    """Test that a hub plans and paces its requests after the timing of the line."""
+    line = SerialLine(baudrate=9600, turnaround=0.01)
+    client = SimulatedModbusClient(
+        SimulatedModbusDevice(), character_time=line.character_time
+    )
+    await client.connect()
+    hub = ModbusHub.for_serial_line(hass, client, line)
+
+    cost_model = hub.read_cost_model(1, HOLDING_REGISTER)
+    assert cost_model.request_cost == pytest.approx(line.read_time(HOLDING_REGISTER, 0))
+    assert cost_model.register_cost == pytest.approx(2 * line.character_time)
+    assert hub.read_cost_model(1, ModbusTable.COIL).register_cost == pytest.approx(
+        2 * line.character_time / 16
+    )
+    assert hub._msg_wait == line.frame_gap
+    # the options of the line can be overridden
+    assert (
+        ModbusHub.for_serial_line(hass, client, line, request_cost=1.0)
+        .read_cost_model(1, HOLDING_REGISTER)
+        .request_cost
+        == 1.0
+    )
+
+    # a request costs as much as reading about 14 registers
+    bridged = hub.compile_read_plan(
+        [
+            RegisterBlock(1, HOLDING_REGISTER, range(2)),
+            RegisterBlock(1, HOLDING_REGISTER, range(14, 16)),
+        ]
+    )
+    assert len(bridged.batches) == 1
+    plan = hub.compile_read_plan(
+        [
+            RegisterBlock(1, HOLDING_REGISTER, range(2)),
+            RegisterBlock(1, HOLDING_REGISTER, range(30, 32)),
+        ]
+    )
+    assert len(plan.batches) == 2
+
+    await hub.execute_read_plan(plan)
+
+    # the wait between the requests is the gap between frames
+    assert client.frame_gap_violations == 0
+    assert hub.stats.cooldown.count == 1
+    assert hub.stats.cooldown.max <= line.frame_gap
+
+    # without it, the device can't tell the frames apart
+    await ModbusHub(hass, client).execute_read_plan(plan)
+    assert client.frame_gap_violations == 2
@@ -0,0 +1,160 @@
+"""Tests for the poll scheduler."""
+
+import asyncio
+from datetime import timedelta
+import logging
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import BaseModbusUpdateCoordinator, ModbusHub
+from homeassistant.components.modbus_base.const import (
+    MODBUS_REGISTERS,
+    ModbusTable,
+    OverrunPolicy,
+)
+from homeassistant.components.modbus_base.planner import RegisterBlock
+from homeassistant.components.modbus_base.scheduler import ModbusPollScheduler
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+EPOCH = 1000.0
+INTERVAL = 10.0
+
+
+def _scheduler(
+    hass: HomeAssistant, overrun_policy: OverrunPolicy = OverrunPolicy.SKIP
+) -> ModbusPollScheduler:
+    """Return a scheduler whose epoch is EPOCH."""
+    with patch.object(hass.loop, "time", return_value=EPOCH):
+        return ModbusPollScheduler(hass, overrun_policy=overrun_policy)
+
+
+def _next_poll_at(
+    hass: HomeAssistant,
+    scheduler: ModbusPollScheduler,
+    now: float,
+    previous_poll_at: float | None,
+    phase: float = 0.25,
+) -> float:
+    """Return the next poll of a coordinator, with the loop clock frozen at now."""
+    with patch.object(hass.loop, "time", return_value=now):
+        return scheduler.next_poll_at(phase, INTERVAL, previous_poll_at)
+
+
+def test_phases_are_spread(hass: HomeAssistant) -> None:
+    """Test that the phases of any number of coordinators are evenly spread."""
+    scheduler = _scheduler(hass)
+    phases: list[float] = []
+    for _ in range(8):
+        phases.append(scheduler.allocate_phase())
+        points = sorted(phases)
+        gaps = [b - a for a, b in zip(points, [*points[1:], points[0] + 1])]
+        # no gap is more than 3 times as large as the smallest one
+        assert max(gaps) <= 3 * min(gaps) or len(phases) == 1
+
+
+def test_polls_stay_on_the_grid(hass: HomeAssistant) -> None:
+    """Test that polls start on the grid of their phase, without drifting."""
+    scheduler = _scheduler(hass)
+
+    poll_at = _next_poll_at(hass, scheduler, EPOCH + 1, None)
+    assert poll_at == EPOCH + 2.5
+
+    for slot in range(1, 1001):
+        # every poll starts a bit late and takes some time
+        poll_at = _next_poll_at(hass, scheduler, poll_at + 0.3, poll_at)
+        assert poll_at == pytest.approx(EPOCH + 2.5 + slot * INTERVAL, abs=1e-6)
+
+    # a timer firing a bit early doesn't poll twice in the same slot
+    assert _next_poll_at(hass, scheduler, poll_at - 1e-9, poll_at) == pytest.approx(
+        poll_at + INTERVAL
+    )
+    assert scheduler.stats.skipped_polls == 0
+
+
+@pytest.mark.parametrize(
+    ("overrun_policy", "expected_poll_at", "skipped", "merged"),
+    [
+        (OverrunPolicy.SKIP, EPOCH + 2.5 + 3 * INTERVAL, 2, 0),
+        (OverrunPolicy.MERGE, EPOCH + 2.5 + 2.5 * INTERVAL, 0, 1),
+    ],
+)
+def test_overrun(
+    hass: HomeAssistant,
+    overrun_policy: OverrunPolicy,
+    expected_poll_at: float,
+    skipped: int,
+    merged: int,
+) -> None:
+    """Test that the slots missed by a long poll are skipped or merged."""
+    scheduler = _scheduler(hass, overrun_policy)
+
+    # the poll of slot 0 ends after the slots 1 and 2
+    poll_at = _next_poll_at(hass, scheduler, EPOCH + 2.5 + 2.5 * INTERVAL, EPOCH + 2.5)
+
+    assert poll_at == pytest.approx(expected_poll_at)
+    assert scheduler.stats.skipped_polls == skipped
+    assert scheduler.stats.merged_polls == merged
+
+
+async def test_concurrent_polls_are_limited(hass: HomeAssistant) -> None:
+    """Test that at most max_concurrent_polls polls run at the same time."""
+    scheduler = ModbusPollScheduler(hass, max_concurrent_polls=2)
+    running = 0
+    max_running = 0
+
+    async def poll() -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    now = hass.loop.time()
+    await asyncio.gather(*(scheduler.async_run_poll(now, poll) for _ in range(5)))
+
+    assert max_running == 2
+    assert scheduler.stats.polls == 5
+    # the last poll waited for two polls before it
+    assert scheduler.stats.poll_lag.max >= 0.02
+
+
+async def test_manual_refresh_keeps_the_grid(hass: HomeAssistant) -> None:
+    """Test that a refresh between two slots doesn't shift the next polls."""
+    client = SimulatedModbusClient(SimulatedModbusDevice())
+    await client.connect()
+    scheduler = ModbusPollScheduler(hass)
+    coordinator = BaseModbusUpdateCoordinator(
+        hass,
+        _LOGGER,
+        ModbusHub(hass, client),
+        "test",
+        update_interval=timedelta(seconds=INTERVAL),
+        scheduler=scheduler,
+    )
+    coordinator.async_add_listener(
+        lambda: None,
+        {MODBUS_REGISTERS: RegisterBlock(1, ModbusTable.HOLDING_REGISTER, range(10))},
+    )
+
+    with patch.object(hass.loop, "call_at", wraps=hass.loop.call_at) as call_at:
+        await coordinator.async_refresh()
+        first_poll_at, start_poll, _ = call_at.call_args.args
+        phase = (first_poll_at - scheduler._epoch) / INTERVAL % 1
+        assert phase == pytest.approx(coordinator._poll_phase)
+
+        # the scheduled poll runs, then a manual refresh before the next slot
+        coordinator._async_unsub_refresh()
+        start_poll(first_poll_at)
+        await hass.async_block_till_done()
+        await coordinator.async_refresh()
+
+    assert [call.args[0] for call in call_at.call_args_list[1:]] == [
+        pytest.approx(first_poll_at + INTERVAL),
+        pytest.approx(first_poll_at + INTERVAL),
+    ]
+    assert scheduler.stats.polls == 1
+    await coordinator.async_shutdown()
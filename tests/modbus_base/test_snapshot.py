@@ -0,0 +1,147 @@
+"""Tests for the register snapshot."""
+
+import struct
+
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.decoder import ModbusDecoder
+from homeassistant.components.modbus_base.entity import SimpleModbusRegisterType
+from homeassistant.components.modbus_base.planner import (
+    ReadCostModel,
+    ReadPlan,
+    RegisterBlock,
+    compile_read_plan,
+)
+from homeassistant.components.modbus_base.snapshot import (
+    RegisterSnapshot,
+    SnapshotLayer,
+)
+
+HOLDING_REGISTER = ModbusTable.HOLDING_REGISTER
+COST_MODELS = dict.fromkeys(
+    ModbusTable, ReadCostModel(request_cost=1.0, register_cost=0.0, max_count=4)
+)
+
+
+def _plan(*blocks: RegisterBlock) -> ReadPlan:
+    """Return a plan reading blocks, in batches of at most 4 registers."""
+    return compile_read_plan(blocks, COST_MODELS)
+
+
+def _layer(
+    plan: ReadPlan, offset: int = 0, missing: int | None = None
+) -> SnapshotLayer:
+    """Return a layer with address + offset as value of every register."""
+    return SnapshotLayer(
+        plan,
+        [
+            None
+            if idx == missing
+            else bytearray(
+                struct.pack(
+                    f">{batch.count}H",
+                    *(address + offset for address in batch.registers),
+                )
+            )
+            for idx, batch in enumerate(plan.batches)
+        ],
+    )
+
+
+def test_newer_layers_take_precedence() -> None:
+    """Test that values are looked up in the newest layer having them."""
+    fast = _plan(RegisterBlock(1, HOLDING_REGISTER, range(10, 12)))
+    slow = _plan(
+        RegisterBlock(1, HOLDING_REGISTER, range(10, 12)),
+        RegisterBlock(1, HOLDING_REGISTER, range(20, 22)),
+    )
+    snapshot = RegisterSnapshot([_layer(fast, 100), _layer(slow, missing=0)])
+
+    assert snapshot[1, HOLDING_REGISTER, 10] == 110
+    assert snapshot[1, HOLDING_REGISTER, 21] == 21
+    assert (1, HOLDING_REGISTER, 12) not in snapshot
+    assert sorted(snapshot) == [
+        (1, HOLDING_REGISTER, address) for address in (10, 11, 20, 21)
+    ]
+
+    # the failed batch of the newest layer falls back to older layers
+    snapshot = RegisterSnapshot([_layer(fast, missing=0), _layer(slow, 100)])
+    assert snapshot[1, HOLDING_REGISTER, 10] == 110
+
+
+def test_view_and_decode() -> None:
+    """Test views of blocks, even when they span several batches."""
+    block = RegisterBlock(1, HOLDING_REGISTER, range(2, 4))
+    split = _plan(RegisterBlock(1, HOLDING_REGISTER, range(6)))
+    snapshot = RegisterSnapshot([_layer(split)])
+    decoder = ModbusDecoder(HOLDING_REGISTER, SimpleModbusRegisterType.UINT32, 2)
+
+    # the batches are 0-3 and 4-5, so the block is in a single batch
+    assert bytes(snapshot.view(block)) == b"\x00\x02\x00\x03"
+    assert snapshot.decode(block, decoder) == 0x00020003
+
+    spanning = RegisterBlock(1, HOLDING_REGISTER, range(3, 5))
+    assert bytes(snapshot.view(spanning)) == b"\x00\x03\x00\x04"
+    assert snapshot.view(RegisterBlock(1, HOLDING_REGISTER, range(5, 7))) is None
+    assert (
+        snapshot.decode(RegisterBlock(1, HOLDING_REGISTER, range(5, 7)), decoder)
+        is None
+    )
+
+
+def test_setitem_clears_decoded_values() -> None:
+    """Test that overwriting a register is visible in decoded values."""
+    block = RegisterBlock(1, HOLDING_REGISTER, range(10, 11))
+    snapshot = RegisterSnapshot([_layer(_plan(block))])
+    decoder = ModbusDecoder(HOLDING_REGISTER, SimpleModbusRegisterType.UINT16, 1)
+    assert snapshot.decode(block, decoder) == 10
+
+    snapshot[1, HOLDING_REGISTER, 10] = 42
+
+    assert snapshot.decode(block, decoder) == 42
+
+
+def test_changed_registers_of_same_plan() -> None:
+    """Test the changed registers between two reads of the same plan."""
+    plan = _plan(RegisterBlock(1, HOLDING_REGISTER, range(8)))
+    previous = RegisterSnapshot([_layer(plan)])
+
+    assert RegisterSnapshot([_layer(plan)]).changed_registers(previous) == set()
+
+    current = RegisterSnapshot([_layer(plan)])
+    current[1, HOLDING_REGISTER, 5] = 0
+    assert current.changed_registers(previous) == {(1, HOLDING_REGISTER, 5)}
+
+    # registers which could not be read anymore, or again, changed
+    failed = RegisterSnapshot([_layer(plan, missing=0)])
+    assert failed.changed_registers(previous) == {
+        (1, HOLDING_REGISTER, address) for address in range(4)
+    }
+    assert previous.changed_registers(failed) == {
+        (1, HOLDING_REGISTER, address) for address in range(4)
+    }
+
+
+def test_changed_registers_of_other_plan() -> None:
+    """Test the changed registers when the plan of the newest layer changed."""
+    block = RegisterBlock(1, HOLDING_REGISTER, range(4))
+    previous = RegisterSnapshot([_layer(_plan(block))])
+    current = RegisterSnapshot(
+        [
+            _layer(
+                _plan(
+                    RegisterBlock(1, HOLDING_REGISTER, range(2)),
+                    RegisterBlock(1, HOLDING_REGISTER, range(8, 10)),
+                ),
+                missing=1,
+            )
+        ]
+    )
+    current[1, HOLDING_REGISTER, 1] = 0
+
+    # registers 2 and 3 are not read anymore, 8 and 9 are still missing
+    assert current.changed_registers(previous) == {
+        (1, HOLDING_REGISTER, 1),
+        (1, HOLDING_REGISTER, 2),
+        (1, HOLDING_REGISTER, 3),
+    }
+    assert RegisterSnapshot().changed_registers(previous) == set(previous)
@@ -0,0 +1,174 @@
+"""Tests for the Modbus streamer."""
+
+import asyncio
+from datetime import timedelta
+from typing import Any
+from unittest.mock import patch
+
+from pymodbus.exceptions import ModbusException
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base import ModbusHub, ModbusStreamer
+from homeassistant.components.modbus_base.const import ModbusTable
+from homeassistant.components.modbus_base.entity import (
+    ModbusField,
+    SimpleModbusRegisterType,
+)
+from homeassistant.components.modbus_base.stream import SampleRingBuffer
+from homeassistant.core import HomeAssistant
+
+FIELDS = (
+    ModbusField(address=10, register_type=SimpleModbusRegisterType.UINT16),
+    ModbusField(
+        address=20, register_type=SimpleModbusRegisterType.INT32, count=2, scale=10
+    ),
+)
+
+
+def test_ring_buffer_wraps() -> None:
+    """Test that the ring buffer keeps the latest samples, oldest first."""
+    buffer = SampleRingBuffer(4, 2)
+    for idx in range(6):
+        buffer.append(float(idx), (idx, 10 * idx))
+
+    assert len(buffer) == 4
+    timestamps, values = buffer.window()
+    assert list(timestamps) == [2, 3, 4, 5]
+    assert list(values) == [2, 20, 3, 30, 4, 40, 5, 50]
+    timestamps, values = buffer.window(2)
+    assert list(timestamps) == [4, 5]
+    assert list(values) == [4, 40, 5, 50]
+
+
+async def _streamer(
+    hass: HomeAssistant, device: SimulatedModbusDevice
+) -> ModbusStreamer:
+    """Return a streamer sampling FIELDS from a simulated device."""
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    return ModbusStreamer(
+        hass,
+        ModbusHub(hass, client),
+        FIELDS,
+        interval=timedelta(milliseconds=5),
+        window=timedelta(milliseconds=30),
+        capacity=5,
+    )
+
+
+async def test_streamer_aggregates(hass: HomeAssistant) -> None:
+    """Test that samples bypass the read cache and are aggregated per window."""
+    device = SimulatedModbusDevice()
+    device.set(1, ModbusTable.HOLDING_REGISTER, 20, 0xFFFF)
+    device.set(1, ModbusTable.HOLDING_REGISTER, 21, 0xFFF6)
+    streamer = await _streamer(hass, device)
+    aggregates = []
+    streamer.async_add_listener(lambda: aggregates.append(streamer.latest))
+
+    streamer.async_start()
+    await asyncio.sleep(0.1)
+    await streamer.async_stop()
+
+    assert streamer.samples >= 5
+    assert len(streamer.buffer) == 5
+    assert not streamer.hub._cached_layers
+    assert aggregates
+    assert aggregates[0].mean == (1010, -1)
+    assert aggregates[0].minimum == (1010, -1)
+    assert aggregates[0].count >= 2
+
+
+async def test_streamer_survives_errors(hass: HomeAssistant) -> None:
+    """Test that unexpected errors are counted, and sampling goes on."""
+    streamer = await _streamer(hass, SimulatedModbusDevice())
+    read_plan_into = streamer.hub.read_plan_into
+    calls = 0
+
+    async def _failing_once(*args):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("boom")
+        return await read_plan_into(*args)
+
+    with patch.object(streamer.hub, "read_plan_into", _failing_once):
+        streamer.async_start()
+        await asyncio.sleep(0.05)
+        await streamer.async_stop()
+
+    assert streamer.missed_samples == 1
+    assert streamer.samples >= 1
+
+
+class _ShortCoilsClient(SimulatedModbusClient):
+    """Simulated client which gets responses without bits to coil reads."""
+
+    async def read_coils(self, address: int, *, count: int = 1, slave: int = 1) -> Any:
+        response = await super().read_coils(address, count=count, slave=slave)
+        response.bits = []
+        return response
+
+
+async def test_streamer_short_response(
+    hass: HomeAssistant, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that a short response is a missed sample."""
+    client = _ShortCoilsClient(SimulatedModbusDevice())
+    await client.connect()
+    streamer = ModbusStreamer(
+        hass,
+        ModbusHub(hass, client),
+        [ModbusField(address=3, table=ModbusTable.COIL)],
+        interval=timedelta(milliseconds=5),
+    )
+
+    streamer.async_start()
+    await asyncio.sleep(0.02)
+    await streamer.async_stop()
+
+    assert streamer.samples == 0
+    assert streamer.missed_samples >= 1
+    assert "Unexpected error" not in caplog.text
+
+
+async def test_streamer_backs_off_after_missed_samples(hass: HomeAssistant) -> None:
+    """Test that the wait between samples grows while samples are missed."""
+    streamer = await _streamer(hass, SimulatedModbusDevice())
+
+    async def _failing(*args):
+        return False
+
+    with patch.object(streamer.hub, "read_plan_into", _failing):
+        streamer.async_start()
+        await asyncio.sleep(0.1)
+        await streamer.async_stop()
+
+    # 20 samples are due, but the waits are 10, 20, 40 and 80 ms
+    assert 2 <= streamer.missed_samples <= 5
+
+
+async def test_streamer_configuration_errors(
+    hass: HomeAssistant, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that fields which can't be sampled are reported once."""
+    client = SimulatedModbusClient(SimulatedModbusDevice())
+    await client.connect()
+    hub = ModbusHub(hass, client)
+
+    with pytest.raises(ValueError):
+        ModbusStreamer(hass, hub, FIELDS, interval=timedelta(0))
+
+    streamer = ModbusStreamer(hass, ModbusHub(hass, client, max_read_count=1), FIELDS)
+    with pytest.raises(ModbusException):
+        streamer.async_start()
+
+    streamer = ModbusStreamer(hass, hub, FIELDS, interval=timedelta(milliseconds=5))
+    streamer.async_start()
+    await asyncio.sleep(0.01)
+    hub._exclude_addresses(1, ModbusTable.HOLDING_REGISTER, [21])
+    await asyncio.sleep(0.01)
+
+    assert streamer._task is None
+    assert caplog.text.count("Stopped sampling") == 1
+    await streamer.async_stop()
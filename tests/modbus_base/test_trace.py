@@ -0,0 +1,97 @@
+"""Tests for the recording and replay of Modbus traffic."""
+
+import asyncio
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+import pytest
+
+from benchmarks.simulator import SimulatedModbusClient, SimulatedModbusDevice
+from homeassistant.components.modbus_base.trace import (
+    CONNECTION_ERROR,
+    NO_RESPONSE,
+    ModbusTrace,
+    RecordingModbusClient,
+    ReplayModbusClient,
+    TraceRecord,
+)
+
+
+def _record(
+    started_at: float, address: int, exception_code: int = 0, duration: float = 0.01
+) -> TraceRecord:
+    """Return a record of a read of a single holding register."""
+    return TraceRecord(
+        started_at=started_at,
+        duration=duration,
+        function_code=0x03,
+        unit=1,
+        address=address,
+        count=1,
+        exception_code=exception_code,
+        payload=b"" if exception_code else address.to_bytes(2, "big"),
+    )
+
+
+async def test_record_and_replay_failures() -> None:
+    """Test that error responses, timeouts and connection errors are replayed."""
+    device = SimulatedModbusDevice(
+        illegal_ranges={(1, "holding_register"): [range(5, 6)]}
+    )
+    client = SimulatedModbusClient(device)
+    await client.connect()
+    trace = ModbusTrace()
+    recorder = RecordingModbusClient(client, trace)
+
+    assert (await recorder.read_holding_registers(10, count=2)).registers == [
+        1010,
+        1011,
+    ]
+    assert (await recorder.read_holding_registers(5)).isError()
+    client.close()
+    with pytest.raises(ConnectionException):
+        await recorder.read_holding_registers(10, count=2)
+
+    trace = ModbusTrace.from_bytes(trace.to_bytes())
+    assert [record.exception_code for record in trace.records] == [
+        0,
+        2,
+        CONNECTION_ERROR,
+    ]
+
+    replay = ReplayModbusClient(trace, realtime=False)
+    assert (await replay.read_holding_registers(10, count=2)).registers == [
+        1010,
+        1011,
+    ]
+    assert (await replay.read_holding_registers(5)).exception_code == 2
+    with pytest.raises(ConnectionException):
+        await replay.read_holding_registers(10, count=2)
+    with pytest.raises(ModbusIOException):
+        await replay.read_holding_registers(10, count=2)
+    assert replay.unmatched_requests == 1
+
+
+async def test_realtime_replay_keeps_gaps() -> None:
+    """Test that a realtime replay waits for the recorded gaps between requests."""
+    trace = ModbusTrace(
+        [
+            _record(0.0, 1),
+            _record(0.2, 2, NO_RESPONSE),
+            _record(0.3, 3),
+        ]
+    )
+    replay = ReplayModbusClient(trace)
+    loop = asyncio.get_running_loop()
+
+    started_at = loop.time()
+    await replay.read_holding_registers(1)
+    with pytest.raises(ModbusIOException):
+        await replay.read_holding_registers(2)
+    second_at = loop.time()
+    assert (await replay.read_holding_registers(3)).registers == [3]
+    finished_at = loop.time()
+
+    # the second request waits for the gap of 0.2 seconds, then its duration
+    assert second_at - started_at == pytest.approx(0.21, abs=0.05)
+    # the gap to the third request already elapsed partly during the second one
+    assert finished_at - second_at == pytest.approx(0.1, abs=0.05)